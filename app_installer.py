@@ -0,0 +1,578 @@
+"""Incremental, side-by-side installs of a game .app from a mounted DMG.
+
+Each build gets its own directory, <channel>/builds/<tag>/<name>.app, and
+<channel>/current is a symlink to the active one, swapped with a single
+atomic rename. A few previous builds are kept so switching back is instant,
+and an interrupted install never touches the build that is playable.
+
+A new build is assembled in a staging directory. Every file is cloned or
+hardlinked from a content-addressed object store shared by all channels, so
+only contents no install has had before are written. Each build has a
+manifest of every file's size, mtime, SHA-256 and mode, so the next update
+can skip hashing files whose size and mtime haven't changed, and
+verify_build() only has to read the files that have.
+
+Save data doesn't live in any build: the game is started with --userdir
+pointing at a per-channel user directory, and save folders still found
+inside an app (from older installs, or a start without --userdir) are
+renamed out into it before the app is replaced.
+"""
+import errno
+import hashlib
+import json
+import os
+import shutil
+import stat
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from copy_engine import COPY_WORKERS, ProgressCounter, copy_tree, parallel_map, walk_tree
+
+MANIFEST_NAME = ".manifest.json"
+BUILDS_NAME = "builds"
+CURRENT_NAME = "current"
+STAGING_SUFFIX = ".staging"
+DEFAULT_KEEP_BUILDS = 3  # The active build plus two to roll back to
+COPY_CHUNK_SIZE = 1024 * 1024
+USER_DATA_PATH = os.path.join('Contents', 'Resources', 'data')
+USER_DATA_FOLDERS = ('save', 'save_backups', 'graveyard', 'memorial', 'templates')
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+def copy_file(src, dst):
+    """Copy contents and metadata of src to dst, returning the SHA-256 of the contents."""
+    digest = hashlib.sha256()
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        for data in iter(lambda: fsrc.read(COPY_CHUNK_SIZE), b''):
+            digest.update(data)
+            fdst.write(data)
+    shutil.copystat(src, dst)
+    return digest.hexdigest()
+
+def find_installed_app(target_dir):
+    try:
+        apps = sorted(name for name in os.listdir(target_dir) if name.endswith('.app'))
+    except OSError:
+        return None
+    return os.path.join(target_dir, apps[0]) if apps else None
+
+def load_manifest(target_dir):
+    try:
+        with open(os.path.join(target_dir, MANIFEST_NAME), 'r') as f:
+            manifest = json.load(f)
+        if isinstance(manifest.get('files'), dict):
+            return manifest
+    except (json.JSONDecodeError, IOError, AttributeError):
+        pass
+    return {'app': None, 'files': {}}
+
+def save_manifest(target_dir, manifest):
+    manifest_file = os.path.join(target_dir, MANIFEST_NAME)
+    temp_file = manifest_file + ".tmp"
+    with open(temp_file, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_file, manifest_file)
+
+def active_build(channel_dir):
+    """The build directory `current` points at, or None."""
+    try:
+        target = os.readlink(os.path.join(channel_dir, CURRENT_NAME))
+    except OSError:
+        return None
+    path = os.path.join(channel_dir, target)
+    return path if os.path.isdir(path) else None
+
+def find_active_app(channel_dir):
+    """The .app that launches for a channel: the current build's, or one installed before builds/ existed."""
+    build = active_build(channel_dir)
+    return find_installed_app(build) if build else find_installed_app(channel_dir)
+
+def activate(channel_dir, build_dir):
+    """Point `current` at build_dir; os.replace makes the switch atomic."""
+    temp_link = os.path.join(channel_dir, CURRENT_NAME + ".tmp")
+    if os.path.lexists(temp_link):
+        os.remove(temp_link)
+    os.symlink(os.path.relpath(build_dir, channel_dir), temp_link)
+    os.replace(temp_link, os.path.join(channel_dir, CURRENT_NAME))
+
+def new_build_dir(channel_dir, tag):
+    name = (tag or "build").replace(os.sep, "_")
+    path = os.path.join(channel_dir, BUILDS_NAME, name)
+    suffix = 2
+    while os.path.lexists(path) or os.path.lexists(path + STAGING_SUFFIX):
+        path = os.path.join(channel_dir, BUILDS_NAME, f"{name}.{suffix}")  # Reinstall of a kept tag
+        suffix += 1
+    return path
+
+def migrate_legacy(channel_dir, tag=None):
+    """Move an app installed directly in channel_dir into builds/ and make it current."""
+    app = find_installed_app(channel_dir)
+    if app is None:
+        return
+    build = new_build_dir(channel_dir, tag or "previous")
+    os.makedirs(build)
+    os.rename(app, os.path.join(build, os.path.basename(app)))
+    if os.path.exists(os.path.join(channel_dir, MANIFEST_NAME)):
+        os.rename(os.path.join(channel_dir, MANIFEST_NAME), os.path.join(build, MANIFEST_NAME))
+    activate(channel_dir, build)
+
+def recover(channel_dir):
+    """Drop what an interrupted install left behind; the active build is never affected."""
+    builds = os.path.join(channel_dir, BUILDS_NAME)
+    try:
+        staged = [entry.path for entry in os.scandir(builds) if entry.name.endswith(STAGING_SUFFIX)]
+    except OSError:
+        staged = []
+    for path in staged:
+        shutil.rmtree(path, ignore_errors=True)
+    temp_link = os.path.join(channel_dir, CURRENT_NAME + ".tmp")
+    if os.path.lexists(temp_link):
+        os.remove(temp_link)
+
+def list_builds(channel_dir):
+    """Installed builds of a channel as dicts, newest first."""
+    builds = os.path.join(channel_dir, BUILDS_NAME)
+    active = active_build(channel_dir)
+    try:
+        entries = [entry for entry in os.scandir(builds)
+                   if entry.is_dir(follow_symlinks=False) and not entry.name.endswith(STAGING_SUFFIX)]
+    except OSError:
+        return []
+    result = []
+    for entry in entries:
+        manifest = load_manifest(entry.path)
+        result.append({
+            'name': entry.name,
+            'tag': manifest.get('tag') or entry.name,
+            'installed_at': manifest.get('installed_at') or 0,
+            'active': active is not None and os.path.samefile(entry.path, active),
+            'path': entry.path,
+        })
+    result.sort(key=lambda build: build['installed_at'], reverse=True)
+    return result
+
+def prune_builds(channel_dir, keep=DEFAULT_KEEP_BUILDS):
+    """Delete all but the active build and the newest others, keep builds in total."""
+    removed = []
+    kept = 0
+    for build in list_builds(channel_dir):
+        if build['active'] or kept < keep - 1:
+            kept += not build['active']
+            continue
+        shutil.rmtree(build['path'], ignore_errors=True)
+        removed.append(build['name'])
+    return removed
+
+def switch_build(channel_dir, name, user_dir):
+    """Make builds/<name> the active build, first moving saves left in the current app to user_dir; returns its tag."""
+    build = os.path.join(channel_dir, BUILDS_NAME, name)
+    if find_installed_app(build) is None:
+        raise FileNotFoundError(f"No installed build named {name}")
+    current_app = find_active_app(channel_dir)
+    if current_app:
+        adopt_user_data(current_app, user_dir)
+    activate(channel_dir, build)
+    return load_manifest(build).get('tag') or name
+
+class ObjectStore:
+    """Content-addressed store of installed files, shared by every channel.
+
+    Each distinct file content is kept once as objects/<sha[:2]>/<sha256>.
+    Installed files are clones of the object where the filesystem supports
+    copy-on-write clones (APFS, Btrfs, XFS) and hardlinks to it otherwise,
+    so identical files across channels and builds cost one copy on disk and
+    installing them only writes metadata.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        self.can_clone = True  # Until the first clone fails with "not supported"
+
+    def path(self, sha256):
+        return os.path.join(self.store_dir, sha256[:2], sha256)
+
+    def has(self, sha256):
+        return os.path.exists(self.path(sha256))
+
+    def add_copy(self, src, sha256=None):
+        """Copy src into the store; returns its SHA-256."""
+        temp_file = os.path.join(self.store_dir, f"tmp-{os.getpid()}-{threading.get_ident()}")
+        os.makedirs(self.store_dir, exist_ok=True)
+        try:
+            digest = copy_file(src, temp_file)
+            if sha256 and digest != sha256:
+                raise IOError(f"{src} changed while it was being installed")
+            self._commit(temp_file, digest)
+        finally:
+            if os.path.lexists(temp_file):
+                os.remove(temp_file)
+        return digest
+
+    def adopt(self, path, sha256):
+        """Make an existing file with known contents an object by hardlinking it, if possible."""
+        try:
+            os.makedirs(os.path.dirname(self.path(sha256)), exist_ok=True)
+            os.link(path, self.path(sha256))
+            return True
+        except FileExistsError:
+            return True
+        except OSError:
+            return False
+
+    def _commit(self, temp_file, sha256):
+        os.makedirs(os.path.dirname(self.path(sha256)), exist_ok=True)
+        os.replace(temp_file, self.path(sha256))
+
+    def materialize(self, sha256, dst, st):
+        """Create dst from an object with st's mode and mtime. Returns "cloned", "linked" or "copied"."""
+        obj = self.path(sha256)
+        if self.can_clone:
+            if clone_file(obj, dst):
+                os.chmod(dst, stat.S_IMODE(st.st_mode))
+                os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+                return "cloned"
+            self.can_clone = False
+        # A hardlink shares the object's metadata, so only use one if the mode already matches
+        if stat.S_IMODE(os.stat(obj).st_mode) == stat.S_IMODE(st.st_mode):
+            try:
+                os.link(obj, dst)
+                return "linked"
+            except OSError:
+                pass
+        shutil.copyfile(obj, dst)
+        os.chmod(dst, stat.S_IMODE(st.st_mode))
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+        return "copied"
+
+    def gc(self, referenced):
+        """Delete objects whose hash isn't in referenced; returns the bytes freed."""
+        freed = 0
+        try:
+            buckets = list(os.scandir(self.store_dir))
+        except OSError:
+            return 0
+        for bucket in buckets:
+            if not bucket.is_dir(follow_symlinks=False):
+                if bucket.name.startswith("tmp-"):
+                    os.remove(bucket.path)  # Left behind by a crash
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name not in referenced:
+                    try:
+                        size = entry.stat(follow_symlinks=False).st_size
+                        os.remove(entry.path)
+                        freed += size
+                    except OSError:
+                        pass
+        return freed
+
+    def total_bytes(self):
+        """Disk space the objects take, counting each object once."""
+        total = 0
+        try:
+            buckets = [entry.path for entry in os.scandir(self.store_dir) if entry.is_dir()]
+        except OSError:
+            return 0
+        for bucket in buckets:
+            total += sum(entry.stat().st_size for entry in os.scandir(bucket))
+        return total
+
+def clone_file(src, dst):
+    """Make dst a copy-on-write clone of src; returns False where that isn't supported."""
+    if _clonefile is not None:
+        return _clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+    if sys.platform.startswith('linux'):
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                return True
+            except OSError:
+                pass
+        os.remove(dst)
+    return False
+
+def _load_clonefile():
+    # clonefile(2) exists on macOS 10.12+ and works on APFS volumes
+    if sys.platform != 'darwin':
+        return None
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        clonefile = libc.clonefile
+        clonefile.argtypes = (ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32)
+        clonefile.restype = ctypes.c_int
+        return clonefile
+    except (OSError, AttributeError):
+        return None
+
+FICLONE = 0x40049409  # Linux ioctl for Btrfs/XFS reflinks
+_clonefile = _load_clonefile()
+
+class TreeBuilder:
+    """Builds a copy of source at dest from the object store.
+
+    A file's hash comes from the previous manifest when the source file's
+    size and mtime match what was recorded, and from reading it otherwise.
+    Contents the store doesn't have yet are copied in once (or, from a
+    scratch_source that is deleted afterwards, hardlinked in); everything is
+    then cloned or linked from the store. Directories are created up front
+    and files are processed on a thread pool.
+    """
+
+    def __init__(self, source, dest, store, installed=None, manifest_files=None,
+                 workers=COPY_WORKERS, on_progress=None, scratch_source=False):
+        self.source = source
+        self.scratch_source = scratch_source
+        self.dest = dest
+        self.store = store
+        self.installed = installed
+        self.manifest_files = manifest_files or {}
+        self.workers = workers
+        self.on_progress = on_progress
+        self.lock = threading.Lock()
+        self.files = {}  # rel -> [size, installed mtime_ns, sha256, source mtime_ns, mode]
+        self.stats = {'copied': 0, 'copied_bytes': 0, 'linked': 0, 'linked_bytes': 0}
+
+    def build(self):
+        os.makedirs(self.dest)
+        dirs = []
+        files = []
+        for rel, entry in walk_tree(self.source):
+            dst = os.path.join(self.dest, rel)
+            if entry.is_symlink():
+                os.symlink(os.readlink(entry.path), dst)
+            elif entry.is_dir():
+                os.mkdir(dst)
+                dirs.append((entry.path, dst))
+            else:
+                files.append((rel, entry.path, entry.stat(follow_symlinks=False), dst))
+        progress = ProgressCounter(sum(st.st_size for _, _, st, _ in files), self.on_progress)
+
+        def add(item):
+            self.add_file(*item)
+            progress.add(item[2].st_size)
+
+        parallel_map(add, files, self.workers)
+        # Directory times are set last, after their contents stop changing
+        for src, dst in reversed(dirs):
+            shutil.copystat(src, dst, follow_symlinks=False)
+        shutil.copystat(self.source, self.dest, follow_symlinks=False)
+        return self.files
+
+    def source_sha256(self, rel, st):
+        recorded = self.manifest_files.get(rel)
+        if recorded and len(recorded) > 3 and recorded[0] == st.st_size and recorded[3] == st.st_mtime_ns:
+            return recorded[2]  # Same file as last install: nothing to read
+        return None
+
+    def adopt_installed(self, rel, st, sha256):
+        """Put a matching file of an install from before the store into the store without copying."""
+        if self.installed is None:
+            return False
+        old_path = os.path.join(self.installed, rel)
+        try:
+            old = os.lstat(old_path)
+        except OSError:
+            return False
+        if not stat.S_ISREG(old.st_mode) or old.st_size != st.st_size:
+            return False
+        return file_sha256(old_path) == sha256 and self.store.adopt(old_path, sha256)
+
+    def add_file(self, rel, src, st, dst):
+        sha256 = self.source_sha256(rel, st) or file_sha256(src)
+        if self.store.has(sha256) or self.adopt_installed(rel, st, sha256):
+            kind = 'linked'
+        elif self.scratch_source and self.store.adopt(src, sha256):
+            kind = 'copied'  # Written once already, by whatever produced the source
+        else:
+            self.store.add_copy(src, sha256)
+            kind = 'copied'
+        self.store.materialize(sha256, dst, st)
+        entry = [st.st_size, os.lstat(dst).st_mtime_ns, sha256, st.st_mtime_ns, stat.S_IMODE(st.st_mode)]
+        with self.lock:
+            self.stats[kind] += 1
+            self.stats[kind + '_bytes'] += st.st_size
+            self.files[rel] = entry
+
+def verify_build(build_dir, workers=COPY_WORKERS, on_progress=None):
+    """Check a build's files against its manifest.
+
+    A file whose size, mode and mtime still match is taken as intact; only
+    the rest are hashed, on a thread pool. Returns a dict with how many
+    files were checked and hashed, and the sorted paths (relative to the
+    .app) of the damaged or missing ones. on_progress(done_bytes,
+    total_bytes) counts the bytes hashed.
+    """
+    manifest = load_manifest(build_dir)
+    if not manifest.get('app'):
+        raise FileNotFoundError(f"{build_dir} has no install manifest")
+    app = os.path.join(build_dir, manifest['app'])
+    damaged = []
+    suspicious = []
+    for rel, entry in manifest['files'].items():
+        try:
+            st = os.lstat(os.path.join(app, rel))
+        except OSError:
+            damaged.append(rel)
+            continue
+        mode_changed = len(entry) > 4 and stat.S_IMODE(st.st_mode) != entry[4]
+        if not stat.S_ISREG(st.st_mode) or st.st_size != entry[0] or mode_changed:
+            damaged.append(rel)
+        elif st.st_mtime_ns != entry[1]:
+            suspicious.append((rel, entry[2], st.st_size))
+    progress = ProgressCounter(sum(size for _, _, size in suspicious), on_progress)
+    lock = threading.Lock()
+
+    def check(item):
+        rel, sha256, size = item
+        try:
+            intact = file_sha256(os.path.join(app, rel)) == sha256
+        except OSError:
+            intact = False
+        if not intact:
+            with lock:
+                damaged.append(rel)
+        progress.add(size)
+
+    parallel_map(check, suspicious, workers)
+    return {'files': len(manifest['files']), 'hashed': len(suspicious), 'damaged': sorted(damaged)}
+
+def usable_object(store, sha256):
+    """Whether the store holds an intact copy of sha256; a damaged one is deleted."""
+    path = store.path(sha256)
+    try:
+        if file_sha256(path) == sha256:
+            return True
+    except OSError:
+        return False
+    # Hardlinked into a damaged install, it was damaged along with it
+    os.remove(path)
+    return False
+
+def repair_build(build_dir, damaged, store, source_app=None):
+    """Rewrite the damaged files of a build; returns the paths that could not be repaired.
+
+    Each file is restored from the object store when it still holds the
+    recorded contents, and otherwise from the same path in source_app (a
+    fresh extraction of the build) if that has them. Other files are left
+    alone.
+    """
+    manifest = load_manifest(build_dir)
+    app = os.path.join(build_dir, manifest['app'])
+    remaining = []
+    for rel in damaged:
+        entry = manifest['files'][rel]
+        sha256 = entry[2]
+        source_mtime_ns = entry[3] if len(entry) > 3 else entry[1]
+        if not usable_object(store, sha256):
+            if source_app is None:
+                remaining.append(rel)
+                continue
+            try:
+                store.add_copy(os.path.join(source_app, rel), sha256)  # Raises unless the contents match
+            except IOError:
+                remaining.append(rel)
+                continue
+        mode = entry[4] if len(entry) > 4 else stat.S_IMODE(os.stat(store.path(sha256)).st_mode)
+        dst = os.path.join(app, rel)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        store.materialize(sha256, dst, SimpleNamespace(st_mode=mode, st_atime_ns=source_mtime_ns,
+                                                       st_mtime_ns=source_mtime_ns))
+        entry[1] = os.lstat(dst).st_mtime_ns
+    save_manifest(build_dir, manifest)
+    return remaining
+
+def move_path(src, dst):
+    """Rename src to dst, falling back to copy and delete when they are on different volumes."""
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        if os.path.isdir(src) and not os.path.islink(src):
+            copy_tree(src, dst)
+            shutil.rmtree(src)
+        else:
+            shutil.copy2(src, dst, follow_symlinks=False)
+            os.remove(src)
+
+def adopt_user_data(app, user_dir):
+    """Move the save folders found inside an app into user_dir; returns how many entries were moved.
+
+    A folder user_dir doesn't have yet is renamed across whole. Otherwise
+    its entries are moved one by one, and a name user_dir already has is
+    left in the app rather than overwriting the user's copy.
+    """
+    moved = 0
+    for folder in USER_DATA_FOLDERS:
+        src = os.path.join(app, USER_DATA_PATH, folder)
+        if os.path.islink(src) or not os.path.isdir(src):
+            continue
+        dst = os.path.join(user_dir, folder)
+        if not os.path.lexists(dst):
+            os.makedirs(user_dir, exist_ok=True)
+            move_path(src, dst)
+            moved += 1
+            continue
+        for entry in os.listdir(src):
+            if not os.path.lexists(os.path.join(dst, entry)):
+                move_path(os.path.join(src, entry), os.path.join(dst, entry))
+                moved += 1
+    return moved
+
+def referenced_objects(channel_dirs):
+    """Hashes used by every kept build of the given channels, for ObjectStore.gc()."""
+    build_dirs = []
+    for channel_dir in channel_dirs:
+        build_dirs.append(channel_dir)  # An install from before builds/ existed
+        build_dirs.extend(build['path'] for build in list_builds(channel_dir))
+    return {entry[2] for build_dir in build_dirs for entry in load_manifest(build_dir)['files'].values()}
+
+def install_app(source_app, channel_dir, tag, store, user_dir, keep=DEFAULT_KEEP_BUILDS, legacy_tag=None,
+                scratch_source=False, on_progress=None, source_url=None):
+    """Install source_app as a new build of the channel and make it current.
+
+    Saves still inside the current app are moved to user_dir first. Only
+    contents the store doesn't have are written; pass scratch_source=True
+    when source_app is a throwaway extraction on the same volume, so even
+    those are hardlinked in instead of copied. Builds beyond `keep`
+    are deleted afterwards. on_progress(done_bytes, total_bytes) is called
+    from the copy threads. source_url, where the build was downloaded from,
+    is recorded in the manifest for repairs. Returns a dict of how many
+    files (and bytes) were copied into the store or linked from it.
+    """
+    os.makedirs(os.path.join(channel_dir, BUILDS_NAME), exist_ok=True)
+    recover(channel_dir)
+    migrate_legacy(channel_dir, legacy_tag)
+    current = active_build(channel_dir)
+    installed_app = find_installed_app(current) if current else None
+    if installed_app:
+        adopt_user_data(installed_app, user_dir)
+    manifest_files = load_manifest(current)['files'] if installed_app else {}
+
+    app_name = os.path.basename(source_app)
+    build = new_build_dir(channel_dir, tag)
+    staging_dir = build + STAGING_SUFFIX
+    builder = TreeBuilder(source_app, os.path.join(staging_dir, app_name), store, installed_app, manifest_files,
+                          on_progress=on_progress, scratch_source=scratch_source)
+    try:
+        files = builder.build()
+        save_manifest(staging_dir, {'app': app_name, 'tag': tag, 'url': source_url, 'installed_at': time.time(),
+                                    'files': files})
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    os.rename(staging_dir, build)
+    activate(channel_dir, build)
+    prune_builds(channel_dir, keep)
+    return builder.stats
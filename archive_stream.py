@@ -0,0 +1,295 @@
+"""Extract .tar.gz and .zip release assets from a stream, in one pass.
+
+Both readers only ever call read() on the file object they are given, so
+the archive can come straight from a DownloadStream without being saved
+first. tarfile's stream mode handles tar; zip is read entry by entry from
+its local headers, and the unix modes and symlinks that only the central
+directory at the end records are applied once it arrives.
+
+Member names are checked so nothing is written outside the destination,
+including through a symlink the archive created earlier.
+"""
+import os
+import shutil
+import stat
+import struct
+import tarfile
+import time
+import zlib
+
+COPY_CHUNK_SIZE = 1024 * 1024
+ARCHIVE_SUFFIXES = {
+    '.tar.gz': 'tar',
+    '.tgz': 'tar',
+    '.tar.bz2': 'tar',
+    '.tar.xz': 'tar',
+    '.zip': 'zip',
+}
+ZIP_LOCAL_HEADER = 0x04034b50
+ZIP_CENTRAL_HEADER = 0x02014b50
+ZIP_DATA_DESCRIPTOR = 0x08074b50
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP_HAS_DESCRIPTOR = 0x08  # Sizes and CRC follow the data instead of preceding it
+ZIP64_EXTRA = 0x0001
+ZIP_UNIX = 3  # "Version made by" host system whose external attributes hold st_mode
+
+class ArchiveError(Exception):
+    pass
+
+def archive_kind(name):
+    """'tar' or 'zip' for an archive file name or URL, None for anything else."""
+    name = name.lower()
+    for suffix, kind in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return kind
+    return None
+
+def member_path(name):
+    """A member name as "a/b/c", without "." parts or a trailing slash."""
+    return '/'.join(part for part in name.replace('\\', '/').split('/') if part not in ('', '.'))
+
+def safe_path(dest_dir, name):
+    """The path a member called name extracts to, or ArchiveError if it would leave dest_dir."""
+    parts = member_path(name).split('/')
+    if not parts[0] or name.startswith('/') or '..' in parts:
+        raise ArchiveError(f"Unsafe path in archive: {name}")
+    path = os.path.join(dest_dir, *parts)
+    # A symlink extracted earlier must not redirect later members elsewhere
+    parent = os.path.realpath(os.path.dirname(path))
+    root = os.path.realpath(dest_dir)
+    if parent != root and not parent.startswith(root + os.sep):
+        raise ArchiveError(f"Unsafe path in archive: {name}")
+    return path
+
+def safe_link_target(dest_dir, name):
+    """The file a hardlink member links to, or ArchiveError if it resolves outside dest_dir.
+
+    os.link follows a symlink an earlier member left at name, so the
+    resolved path is checked as well as the name.
+    """
+    path = safe_path(dest_dir, name)
+    target = os.path.realpath(path)
+    root = os.path.realpath(dest_dir)
+    if not target.startswith(root + os.sep):
+        raise ArchiveError(f"Unsafe link in archive: {name}")
+    return path
+
+def prepare_file(path):
+    """Make room for a new file, symlink or hardlink at path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Never write through a symlink an earlier member left at the same name
+    if os.path.islink(path) or os.path.isfile(path):
+        os.remove(path)
+
+def extract_tar(fileobj, dest_dir, select=None):
+    dirs = []
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|*') as tar:
+            for member in tar:
+                path = safe_path(dest_dir, member.name)
+                if select is not None and not select(member_path(member.name)):
+                    continue  # The stream skips its data on the way to the next member
+                if member.isdir():
+                    os.makedirs(path, exist_ok=True)
+                    dirs.append((path, member))
+                    continue
+                prepare_file(path)
+                if member.issym():
+                    os.symlink(member.linkname, path)
+                elif member.islnk():
+                    os.link(safe_link_target(dest_dir, member.linkname), path)
+                elif member.isreg():
+                    with tar.extractfile(member) as src, open(path, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+                    os.chmod(path, member.mode & 0o7777)
+                    os.utime(path, (member.mtime, member.mtime))
+                # Devices and fifos have no place in a game build
+    except (tarfile.TarError, EOFError, zlib.error) as e:
+        raise ArchiveError(f"Could not read archive: {e}")
+    # Directory times are set last, after their contents stop changing
+    for path, member in reversed(dirs):
+        os.chmod(path, member.mode & 0o7777)
+        os.utime(path, (member.mtime, member.mtime))
+
+class PushbackReader:
+    """read() with exact lengths and a way to give back bytes read too far."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.pending = b''
+
+    def read(self, size):
+        data = self.pending[:size]
+        self.pending = self.pending[size:]
+        if len(data) < size:
+            data += self.fileobj.read(size - len(data))
+        return data
+
+    def read_exact(self, size):
+        data = self.read(size)
+        while len(data) < size:
+            more = self.fileobj.read(size - len(data))
+            if not more:
+                raise ArchiveError("Archive ends unexpectedly")
+            data += more
+        return data
+
+    def unread(self, data):
+        self.pending = data + self.pending
+
+def dos_time(date, clock):
+    try:
+        return time.mktime(((date >> 9) + 1980, (date >> 5) & 0xf, date & 0x1f,
+                            clock >> 11, (clock >> 5) & 0x3f, (clock & 0x1f) * 2, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return time.time()
+
+def zip64_extra(extra):
+    """The payload of the zip64 extended information field in extra, or None."""
+    offset = 0
+    while offset + 4 <= len(extra):
+        tag, length = struct.unpack_from('<HH', extra, offset)
+        if tag == ZIP64_EXTRA:
+            return extra[offset + 4:offset + 4 + length]
+        offset += 4 + length
+    return None
+
+def zip64_sizes(extra, compressed, size):
+    # The zip64 extra field only holds the values that overflowed, uncompressed size first
+    values = zip64_extra(extra)
+    if values is not None:
+        index = 0
+        if size == 0xffffffff:
+            size, = struct.unpack_from('<Q', values, index)
+            index += 8
+        if compressed == 0xffffffff:
+            compressed, = struct.unpack_from('<Q', values, index)
+    return compressed, size
+
+def extract_zip(fileobj, dest_dir, select=None):
+    reader = PushbackReader(fileobj)
+    extracted = {}
+    while True:
+        signature = reader.read(4)
+        if len(signature) < 4:
+            raise ArchiveError("Archive ends unexpectedly")
+        kind, = struct.unpack('<I', signature)
+        if kind == ZIP_LOCAL_HEADER:
+            name, path = extract_zip_entry(reader, dest_dir, select)
+            if path is not None:
+                extracted[name] = path
+        elif kind == ZIP_CENTRAL_HEADER:
+            apply_zip_attributes(reader, extracted)
+        else:
+            break  # End of central directory records; the stream's owner reads the rest
+
+def extract_zip_entry(reader, dest_dir, select=None):
+    (_, flags, method, clock, date, crc, compressed, size,
+     name_length, extra_length) = struct.unpack('<HHHHHIIIHH', reader.read_exact(26))
+    raw_name = reader.read_exact(name_length)
+    name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+    extra = reader.read_exact(extra_length)
+    # A local header with a zip64 field means the data descriptor carries 8-byte sizes
+    zip64 = zip64_extra(extra) is not None or 0xffffffff in (compressed, size)
+    compressed, size = zip64_sizes(extra, compressed, size)
+    path = safe_path(dest_dir, name)
+    if method not in (ZIP_STORED, ZIP_DEFLATED):
+        raise ArchiveError(f"Unsupported zip compression method {method} for {name}")
+    selected = select is None or select(member_path(name))
+    if name.endswith('/'):
+        if selected:
+            os.makedirs(path, exist_ok=True)
+        return name, path if selected else None
+    if selected:
+        prepare_file(path)
+
+    actual_crc = 0
+    # An entry that isn't wanted still has to be read through to find the next one
+    with open(path if selected else os.devnull, 'wb') as f:
+        if method == ZIP_DEFLATED:
+            decompressor = zlib.decompressobj(-15)
+            remaining = None if flags & ZIP_HAS_DESCRIPTOR else compressed
+            while not decompressor.eof:
+                data = reader.read(COPY_CHUNK_SIZE if remaining is None else min(COPY_CHUNK_SIZE, remaining))
+                if not data:
+                    raise ArchiveError("Archive ends unexpectedly")
+                if remaining is not None:
+                    remaining -= len(data)
+                try:
+                    out = decompressor.decompress(data)
+                except zlib.error as e:
+                    raise ArchiveError(f"Could not read archive: {e}")
+                actual_crc = zlib.crc32(out, actual_crc)
+                f.write(out)
+            reader.unread(decompressor.unused_data)
+        elif flags & ZIP_HAS_DESCRIPTOR:
+            raise ArchiveError(f"Cannot stream stored zip entry {name} without its size")
+        else:
+            remaining = compressed
+            while remaining:
+                data = reader.read_exact(min(COPY_CHUNK_SIZE, remaining))
+                remaining -= len(data)
+                actual_crc = zlib.crc32(data, actual_crc)
+                f.write(data)
+
+    if flags & ZIP_HAS_DESCRIPTOR:
+        descriptor = reader.read_exact(4)
+        if struct.unpack('<I', descriptor)[0] == ZIP_DATA_DESCRIPTOR:
+            descriptor = reader.read_exact(4)
+        crc, = struct.unpack('<I', descriptor)
+        # The sizes that follow are 4 or 8 bytes each; they aren't needed, the data is already read
+        reader.read_exact(16 if zip64 else 8)
+    if actual_crc != crc:
+        raise ArchiveError(f"CRC mismatch in archive for {name}")
+    if not selected:
+        return name, None
+    mtime = dos_time(date, clock)
+    os.utime(path, (mtime, mtime))
+    return name, path
+
+def apply_zip_attributes(reader, extracted):
+    (made_by, _, _, _, _, _, _, _, _, name_length, extra_length, comment_length,
+     _, _, external, _) = struct.unpack('<HHHHHHIIIHHHHHII', reader.read_exact(42))
+    name = reader.read_exact(name_length)
+    reader.read_exact(extra_length + comment_length)
+    path = extracted.get(name.decode('utf-8', 'replace')) or extracted.get(name.decode('cp437'))
+    mode = external >> 16
+    if path is None or made_by >> 8 != ZIP_UNIX or not mode:
+        return
+    if stat.S_ISLNK(mode):
+        # Zip stores a symlink as a file holding its target
+        with open(path, 'rb') as f:
+            target = f.read().decode('utf-8')
+        os.remove(path)
+        os.symlink(target, path)
+    elif not os.path.islink(path):
+        os.chmod(path, stat.S_IMODE(mode))
+
+def extract_archive(fileobj, kind, dest_dir, select=None):
+    """Extract a 'tar' or 'zip' archive read from fileobj into dest_dir.
+
+    select(member_path) can limit extraction to the members it returns True for.
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    if kind == 'zip':
+        extract_zip(fileobj, dest_dir, select)
+    else:
+        extract_tar(fileobj, dest_dir, select)
+
+def find_app(dest_dir, depth=2):
+    """The first .app bundle at most `depth` folders down, or None."""
+    try:
+        entries = sorted(os.scandir(dest_dir), key=lambda entry: entry.name)
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False) and entry.name.endswith('.app'):
+            return entry.path
+    if depth > 1:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                found = find_app(entry.path, depth - 1)
+                if found:
+                    return found
+    return None
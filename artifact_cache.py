@@ -0,0 +1,212 @@
+"""Persistent, content-addressed cache of downloaded release assets.
+
+Finished downloads are moved into the cache under their SHA-256, so a
+reinstall, a rollback or two channels pointing at the same build come from
+local disk instead of the network. URLs map to digests, and identical files
+reached through different URLs are stored once. The cache has a byte budget;
+when it is exceeded, the least recently used artifacts are evicted.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_CACHE_MB = 4096  # Room for a few game builds
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+def parse_digest(digest):
+    """Return the hex SHA-256 from a GitHub "sha256:<hex>" asset digest, or None."""
+    if digest and digest.startswith('sha256:'):
+        return digest[len('sha256:'):].lower()
+    return None
+
+class ArtifactCache:
+    """Downloaded files stored as <cache_dir>/<sha256><ext>, indexed in index.json.
+
+    The index maps each URL to a digest and each digest to its size, a
+    display name and when it was last used. A max_bytes of 0 disables
+    caching: add() then leaves the file where it is.
+
+    lookup() and add() can pin the artifact they return, so an eviction
+    triggered by another channel's install doesn't delete a file that is
+    still being extracted; unpin() releases it.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.index_file = os.path.join(cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.urls = {}
+        self.objects = {}
+        self.pins = {}  # sha256 -> installs still reading it; never evicted while > 0
+        self.load()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def load(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r') as f:
+                    index = json.load(f)
+                self.urls = dict(index['urls'])
+                self.objects = dict(index['objects'])
+            except (json.JSONDecodeError, IOError, KeyError, TypeError, ValueError):
+                self.urls = {}
+                self.objects = {}  # Files without an index entry are removed by prune()
+
+    def save(self):
+        # Callers hold self.lock
+        temp_file = self.index_file + ".tmp"
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump({'urls': self.urls, 'objects': self.objects}, f)
+            os.replace(temp_file, self.index_file)
+        except IOError:
+            pass
+
+    def object_path(self, sha256):
+        return os.path.join(self.cache_dir, sha256 + self.objects[sha256].get('ext', ''))
+
+    def lookup(self, url, digest=None, pin=False):
+        """Return the cached file for url (or for a "sha256:..." digest), or None."""
+        with self.lock:
+            sha256 = self.urls.get(url)
+            if sha256 not in self.objects:
+                sha256 = parse_digest(digest)
+            entry = self.objects.get(sha256)
+            if entry is None:
+                return None
+            path = self.object_path(sha256)
+            try:
+                if os.path.getsize(path) != entry['size']:
+                    raise OSError(path)
+            except OSError:
+                # Deleted or damaged behind our back
+                self._forget(sha256)
+                self.save()
+                return None
+            entry['last_used'] = time.time()
+            self.urls[url] = sha256
+            if pin:
+                self.pins[sha256] = self.pins.get(sha256, 0) + 1
+            self.save()
+            return path
+
+    def add(self, url, path, sha256=None, pin=False):
+        """Move a finished download into the cache and return its new path.
+
+        Pass sha256 if it is already known to skip hashing the file again.
+        """
+        if not self.enabled:
+            return path
+        sha256 = sha256 or file_sha256(path)
+        name = os.path.basename(urlparse(url).path)
+        ext = os.path.splitext(name)[1]
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self.lock:
+            if sha256 in self.objects and os.path.exists(self.object_path(sha256)):
+                os.remove(path)  # Same bytes as an artifact we already have
+            else:
+                self.objects[sha256] = {'size': os.path.getsize(path), 'name': name, 'ext': ext}
+                os.replace(path, self.object_path(sha256))
+            self.objects[sha256]['last_used'] = time.time()
+            self.urls[url] = sha256
+            if pin:
+                self.pins[sha256] = self.pins.get(sha256, 0) + 1
+            self._evict(self.max_bytes, keep=sha256)
+            self.save()
+            return self.object_path(sha256)
+
+    def unpin(self, path):
+        """Release a pin taken by lookup() or add(); paths outside the cache are ignored."""
+        if not self.contains(path):
+            return
+        sha256 = os.path.splitext(os.path.basename(path))[0]
+        with self.lock:
+            if self.pins.get(sha256, 0) > 1:
+                self.pins[sha256] -= 1
+            else:
+                self.pins.pop(sha256, None)
+
+    def contains(self, path):
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.cache_dir)
+
+    def entries(self):
+        """Cached artifacts as dicts, most recently used first."""
+        with self.lock:
+            entries = [
+                {
+                    'sha256': sha256,
+                    'name': entry.get('name', ''),
+                    'size': entry['size'],
+                    'last_used': entry.get('last_used', 0),
+                    'urls': sorted(url for url, digest in self.urls.items() if digest == sha256),
+                }
+                for sha256, entry in self.objects.items()
+            ]
+        entries.sort(key=lambda entry: entry['last_used'], reverse=True)
+        return entries
+
+    def total_bytes(self):
+        with self.lock:
+            return sum(entry['size'] for entry in self.objects.values())
+
+    def prune(self, max_bytes=None):
+        """Evict down to max_bytes (default: the configured budget) and remove stray files.
+
+        Returns the number of bytes freed.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self.lock:
+            freed = self._evict(max_bytes)
+            known = {os.path.basename(self.object_path(sha256)) for sha256 in self.objects}
+            try:
+                strays = [entry for entry in os.scandir(self.cache_dir)
+                          if entry.is_file() and entry.name != "index.json" and entry.name not in known]
+            except OSError:
+                strays = []
+            for entry in strays:
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    freed += size
+                except OSError:
+                    pass
+            self.save()
+        return freed
+
+    def _evict(self, max_bytes, keep=None):
+        # Callers hold self.lock. Least recently used first; `keep` and pinned artifacts are never evicted.
+        total = sum(entry['size'] for entry in self.objects.values())
+        freed = 0
+        for sha256 in sorted(self.objects, key=lambda sha256: self.objects[sha256].get('last_used', 0)):
+            if total <= max_bytes:
+                break
+            if sha256 == keep or self.pins.get(sha256):
+                continue
+            size = self.objects[sha256]['size']
+            self._forget(sha256)
+            total -= size
+            freed += size
+        return freed
+
+    def _forget(self, sha256):
+        # Callers hold self.lock
+        try:
+            os.remove(self.object_path(sha256))
+        except OSError:
+            pass
+        del self.objects[sha256]
+        self.urls = {url: digest for url, digest in self.urls.items() if digest != sha256}
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""Time extracting a .app from a synthetic UDZO disk image with dmg_reader.
+
+Builds an image of JSON-like data files and a few larger binaries (the
+shape of a game build), then extracts it with one worker and with the
+default worker count, so the gain from parallel decompression shows.
+
+    python benchmarks/bench_dmg.py [--files 3000] [--chunk-sectors 2048]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+import dmg_reader
+from copy_engine import walk_tree
+from dmg_builder import File, build_dmg
+
+def make_tree(files, rng):
+    data = {}
+    for index in range(files):
+        folder = data.setdefault(f"dir{index % 50}", {})
+        words = [rng.choice(['"id"', '"rock"', '"type"', '"GENERIC"', '"weight"', '"250 g"']) for _ in range(800)]
+        folder[f"file{index}.json"] = ', '.join(words).encode()
+    binaries = {f"lib{index}.dylib": File(rng.randbytes(4 * 1024 * 1024), mode=0o755) for index in range(4)}
+    return {'Cataclysm.app': {'Contents': {'Resources': {'data': data}, 'Frameworks': binaries}}}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=3000)
+    parser.add_argument('--chunk-sectors', type=int, default=2048)  # 1 MiB, what hdiutil uses
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        dmg = os.path.join(root, 'game.dmg')
+        build_dmg(dmg, make_tree(args.files, random.Random(0)), chunk_sectors=args.chunk_sectors)
+        print(f"{args.files + 4} files, image {os.path.getsize(dmg) / 1048576:.1f} MiB")
+        for workers in (1, dmg_reader.DECOMPRESS_WORKERS):
+            dest = os.path.join(root, f"out-{workers}")
+            start = time.perf_counter()
+            app = dmg_reader.extract_app(dmg, dest, workers=workers)
+            seconds = time.perf_counter() - start
+            size = sum(entry.stat().st_size for _, entry in walk_tree(app) if entry.is_file())
+            print(f"{workers:2} workers: {seconds:6.2f} s, {size / 1048576 / seconds:7.1f} MiB/s extracted")
+            shutil.rmtree(dest)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Benchmark segmented downloads against a local range-capable HTTP server.
+
+The server caps each connection's throughput (as CDNs effectively do per
+TCP stream), so the gain from extra connections is visible on loopback.
+
+    python benchmarks/bench_download.py [--size-mb 64] [--per-connection-mbps 80] [--limit-mbps 0]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import downloader
+import launcher_core
+
+class RangeHandler(BaseHTTPRequestHandler):
+    payload = b""
+    bytes_per_second = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = self.payload
+        start, end = 0, len(body)
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ""))
+        if_range = self.headers.get('If-Range')
+        if match and if_range in (None, '"bench"'):
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else len(body)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end - 1}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('ETag', '"bench"')
+        self.end_headers()
+        self.send_throttled(memoryview(body)[start:end])
+
+    def send_throttled(self, view):
+        chunk = 64 * 1024
+        began = time.monotonic()
+        for offset in range(0, len(view), chunk):
+            self.wfile.write(view[offset:offset + chunk])
+            if self.bytes_per_second:
+                ahead = (offset + chunk) / self.bytes_per_second - (time.monotonic() - began)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=64)
+    parser.add_argument('--per-connection-mbps', type=float, default=80,
+                        help="Throughput cap per connection in megabits/s (0 for none)")
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--limit-mbps', type=float, default=0,
+                        help="Client-side bandwidth limit in megabits/s, like download_limit_mbps (0 for none)")
+    args = parser.parse_args()
+
+    RangeHandler.payload = os.urandom(args.size_mb * 1024 * 1024)
+    RangeHandler.bytes_per_second = args.per_connection_mbps * 1e6 / 8
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/cdda-osx-graphics-universal.dmg"
+    session = launcher_core.create_session()
+
+    print(f"{args.size_mb} MiB asset, {args.per_connection_mbps:g} Mbit/s per connection")
+    try:
+        for connections in args.connections:
+            with tempfile.TemporaryDirectory() as staging_dir:
+                fetcher = downloader.Downloader(staging_dir, lambda: session, connections,
+                                                downloader.Throttle(args.limit_mbps * 1e6 / 8))
+                start = time.perf_counter()
+                path, _ = fetcher.download(url)
+                seconds = time.perf_counter() - start
+                assert os.path.getsize(path) == len(RangeHandler.payload)
+            print(f"{connections:>2} connection(s): {seconds:6.2f} s, {args.size_mb / seconds:7.1f} MiB/s")
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
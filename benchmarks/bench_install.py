@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare a nightly-style update via app_installer against rmtree + copytree.
+
+Builds two synthetic .app trees that share most of their files (like two
+consecutive experimental builds), installs the first, then times updating
+to the second both ways and reports how many bytes each had to write.
+
+    python benchmarks/bench_install.py [--files 10000] [--changed-percent 3]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app_installer
+
+def make_build(root, files, size, changed, seed):
+    rng = random.Random(seed)
+    app = os.path.join(root, 'Cataclysm.app')
+    for index in range(files):
+        rel = os.path.join('Contents', 'Resources', 'data', f"dir{index % 200}", f"file{index}.json")
+        path = os.path.join(app, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Files in `changed` get build-specific content, the rest are identical across builds
+        content = random.Random(index).randbytes(size) if index not in changed else rng.randbytes(size)
+        with open(path, 'wb') as f:
+            f.write(content)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--file-kb', type=int, default=16)
+    parser.add_argument('--changed-percent', type=float, default=3)
+    args = parser.parse_args()
+
+    changed = set(random.Random(0).sample(range(args.files), int(args.files * args.changed_percent / 100)))
+    total_mb = args.files * args.file_kb / 1024
+    with tempfile.TemporaryDirectory() as root:
+        old = make_build(os.path.join(root, 'old'), args.files, args.file_kb * 1024, changed, 1)
+        new = make_build(os.path.join(root, 'new'), args.files, args.file_kb * 1024, changed, 2)
+        print(f"{args.files} files, {total_mb:.0f} MiB, {len(changed)} changed between builds")
+
+        target = os.path.join(root, 'copytree')
+        shutil.copytree(old, os.path.join(target, 'Cataclysm.app'), symlinks=True)
+        start = time.perf_counter()
+        shutil.rmtree(target)
+        shutil.copytree(new, os.path.join(target, 'Cataclysm.app'), symlinks=True)
+        seconds = time.perf_counter() - start
+        print(f"rmtree + copytree: {seconds:6.2f} s, {total_mb:8.1f} MiB written")
+
+        target = os.path.join(root, 'incremental')
+        store = app_installer.ObjectStore(os.path.join(root, 'objects'))
+        app_installer.install_app(old, target, 'old', store, os.path.join(root, 'userdata'))
+        start = time.perf_counter()
+        stats = app_installer.install_app(new, target, 'new', store, os.path.join(root, 'userdata'))
+        seconds = time.perf_counter() - start
+        print(f"install_app:       {seconds:6.2f} s, {stats['copied_bytes'] / 1048576:8.1f} MiB written "
+              f"({stats['copied']} copied, {stats['linked']} linked)")
+
+        # A second channel on the same build only needs links into the object store
+        start = time.perf_counter()
+        stats = app_installer.install_app(new, os.path.join(root, 'second-channel'), 'new', store,
+                                          os.path.join(root, 'userdata'))
+        seconds = time.perf_counter() - start
+        print(f"second channel:    {seconds:6.2f} s, {stats['copied_bytes'] / 1048576:8.1f} MiB written")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Compare whole-page json.loads against streaming iter_json_array for release scans.
+
+Builds a synthetic /releases page with long bodies, places the first Mac
+build at a given position, and reports time-to-first-result and peak
+allocated memory for both approaches.
+
+    python benchmarks/bench_release_scan.py [--releases 100] [--mac-at 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import launcher_core
+
+def make_page(count, mac_at, body_size):
+    releases = []
+    for n in range(count):
+        assets = [{'name': f'cdda-linux-tiles-x64-{n}.tar.gz', 'browser_download_url': f'https://dl/{n}.tar.gz', 'size': 1}
+                  for _ in range(12)]
+        if n >= mac_at:
+            assets.append({'name': f'cdda-osx-graphics-universal-{n}.dmg',
+                           'browser_download_url': f'https://dl/{n}.dmg', 'size': 2})
+        releases.append({'tag_name': f'cdda-experimental-{n}', 'published_at': '2024-01-01T00:00:00Z',
+                         'body': 'x' * body_size, 'assets': assets})
+    return json.dumps(releases).encode('utf-8')
+
+def chunked(payload):
+    size = launcher_core.STREAM_CHUNK_SIZE
+    for i in range(0, len(payload), size):
+        yield payload[i:i + size]
+
+def scan_whole(payload):
+    # What check_versions did before: read everything, decode everything, then scan
+    text = b"".join(chunked(payload)).decode('utf-8')
+    for release in json.loads(text):
+        if launcher_core.find_mac_asset(launcher_core.Release.from_github(release)):
+            return release['tag_name']
+
+def scan_streaming(payload):
+    for release in launcher_core.iter_json_array(chunked(payload)):
+        if launcher_core.find_mac_asset(launcher_core.Release.from_github(release)):
+            return release['tag_name']
+
+def measure(scan, payload, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        scan(payload)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    scan(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--releases', type=int, default=100)
+    parser.add_argument('--mac-at', type=int, default=5)
+    parser.add_argument('--body-size', type=int, default=8000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    payload = make_page(args.releases, args.mac_at, args.body_size)
+    print(f"Page: {args.releases} releases, {len(payload) / 1024:.0f} KiB, first Mac build at #{args.mac_at}")
+    for name, scan in [("json.loads", scan_whole), ("streaming", scan_streaming)]:
+        seconds, peak = measure(scan, payload, args.repeat)
+        print(f"{name:>12}: first result {seconds * 1000:7.2f} ms, peak {peak / 1024:8.0f} KiB")
+
+if __name__ == "__main__":
+    main()
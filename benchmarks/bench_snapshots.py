@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Measure what save snapshots cost against a plain copy of the save folder.
+
+Builds a synthetic world of JSON-like map files, snapshots it, changes a few
+percent of the maps (like an hour of play) and snapshots it again, reporting
+time and bytes stored for each, next to copying the whole tree each time.
+
+    python benchmarks/bench_snapshots.py [--maps 5000] [--changed-percent 2] [--compression zlib]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import save_snapshots
+
+def write_map(path, rng):
+    # Map files are mostly repeated terrain ids with a few items and monsters
+    terrain = [rng.choice(['t_grass', 't_dirt', 't_tree', 't_floor', 't_wall']) for _ in range(144)]
+    items = [[rng.randrange(12), rng.randrange(12), {'typeid': rng.choice(['rock', 'stick', 'can'])}]
+             for _ in range(rng.randrange(10))]
+    with open(path, 'w') as f:
+        json.dump([{'version': 33, 'coordinates': [0, 0, 0], 'terrain': terrain, 'items': items}] * 4, f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--maps', type=int, default=5000)
+    parser.add_argument('--changed-percent', type=float, default=2)
+    parser.add_argument('--compression', choices=sorted(save_snapshots.COMPRESSORS), default='zlib')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as root:
+        world = os.path.join(root, 'userdata', 'save', 'World', 'maps')
+        os.makedirs(world)
+        for index in range(args.maps):
+            write_map(os.path.join(world, f"{index}.map"), rng)
+        total_mb = sum(entry.stat().st_size for entry in os.scandir(world)) / 1048576
+        print(f"{args.maps} map files, {total_mb:.1f} MiB")
+
+        store = save_snapshots.SnapshotStore(os.path.join(root, 'snapshots'), args.compression)
+        for run in ('first', 'after play'):
+            if run != 'first':
+                for index in rng.sample(range(args.maps), int(args.maps * args.changed_percent / 100)):
+                    write_map(os.path.join(world, f"{index}.map"), rng)
+            start = time.perf_counter()
+            shutil.copytree(os.path.join(root, 'userdata'), os.path.join(root, 'copy-' + run))
+            copy_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            summary = store.take(os.path.join(root, 'userdata'), run)
+            seconds = time.perf_counter() - start
+            print(f"{run:<11} copytree: {copy_seconds:6.2f} s, {total_mb:7.1f} MiB   "
+                  f"snapshot: {seconds:6.2f} s, {summary['new_bytes'] / 1048576:7.2f} MiB stored")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Compare startup time and peak RSS of the headless CLI against the GUI import path.
+
+Each variant runs in a fresh interpreter several times; the best wall time
+and the peak resident set size are reported. The GUI variant only imports
+cdda_launcher (customtkinter, Tk and the window class) without opening a
+window, so it understates the real GUI cost.
+
+    python benchmarks/bench_startup.py [--repeat 5]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs the command in a child and reports its wall time and peak RSS in KiB
+MEASURE = """
+import resource, subprocess, sys, time
+start = time.perf_counter()
+subprocess.run(sys.argv[1:], check=True, stdout=subprocess.DEVNULL)
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+if sys.platform == 'darwin':
+    rss //= 1024  # macOS reports bytes, Linux KiB
+print(elapsed, rss)
+"""
+
+def measure(command, repeat):
+    best = float('inf')
+    peak = 0
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', MEASURE] + command, cwd=ROOT,
+                                check=True, capture_output=True, text=True).stdout
+        elapsed, rss = output.split()
+        best = min(best, float(elapsed))
+        peak = max(peak, int(rss))
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as base_path:
+        variants = [
+            ("cli status", [sys.executable, 'cdda_cli.py', '--base-path', base_path, 'status']),
+            ("gui import", [sys.executable, '-c', 'import cdda_launcher']),
+        ]
+        for name, command in variants:
+            seconds, rss = measure(command, args.repeat)
+            print(f"{name:>12}: {seconds * 1000:7.1f} ms, peak RSS {rss / 1024:6.1f} MiB")
+
+if __name__ == "__main__":
+    main()
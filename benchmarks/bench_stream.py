@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Time downloading then extracting a .tar.gz build against extracting it as it arrives.
+
+The "network" is an in-memory response limited by the downloader's Throttle,
+so the numbers show how much of the extraction hides behind the download.
+
+    python benchmarks/bench_stream.py [--files 3000] [--mbps 200]
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+import archive_stream
+import downloader
+from test_downloader import FakeSession
+
+URL = 'https://example.com/releases/download/x/cdda-osx.tar.gz'
+
+def make_archive(files, rng):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for index in range(files):
+            words = [rng.choice(['"id"', '"rock"', '"type"', '"GENERIC"', '"weight"', '"250 g"']) for _ in range(800)]
+            data = ', '.join(words).encode()
+            info = tarfile.TarInfo(f"Cataclysm.app/Contents/Resources/data/dir{index % 50}/file{index}.json")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        for index in range(4):
+            data = rng.randbytes(4 * 1024 * 1024)
+            info = tarfile.TarInfo(f"Cataclysm.app/Contents/Frameworks/lib{index}.dylib")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=3000)
+    parser.add_argument('--mbps', type=float, default=200)
+    args = parser.parse_args()
+
+    body = make_archive(args.files, random.Random(0))
+    rate = args.mbps * 1000000 / 8
+    print(f"{args.files + 4} files, archive {len(body) / 1048576:.1f} MiB, "
+          f"network {args.mbps:g} Mbit/s ({len(body) / rate:.2f} s to download)")
+    with tempfile.TemporaryDirectory() as root:
+        loader = downloader.Downloader(os.path.join(root, 'downloads'), lambda: FakeSession(body),
+                                       connections=1, throttle=downloader.Throttle(rate))
+        start = time.perf_counter()
+        path, _ = loader.download(URL)
+        downloaded = time.perf_counter() - start
+        with open(path, 'rb') as f:
+            archive_stream.extract_archive(f, 'tar', os.path.join(root, 'sequential'))
+        sequential = time.perf_counter() - start
+        print(f"download, then extract: {sequential:6.2f} s ({downloaded:.2f} s downloading)")
+        shutil.rmtree(os.path.join(root, 'sequential'))
+
+        loader.throttle = downloader.Throttle(rate)
+        start = time.perf_counter()
+        with loader.open_stream(URL) as stream:
+            archive_stream.extract_archive(stream, 'tar', os.path.join(root, 'streamed'))
+            stream.finish()
+        print(f"extract while downloading: {time.perf_counter() - start:6.2f} s")
+
+if __name__ == "__main__":
+    main()
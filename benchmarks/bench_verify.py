@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Time verifying an installed build against its manifest.
+
+Installs a synthetic .app, then verifies it untouched (size and mtime only)
+and with a few files deleted, repairs those from the store, and verifies
+again after touching every file (everything hashed, on the pool and on
+one thread).
+
+    python benchmarks/bench_verify.py [--files 10000] [--file-kb 16]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app_installer
+from bench_install import make_build
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<34} {time.perf_counter() - start:6.2f} s")
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--file-kb', type=int, default=16)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        source = make_build(os.path.join(root, 'source'), args.files, args.file_kb * 1024, set(), 1)
+        store = app_installer.ObjectStore(os.path.join(root, 'objects'))
+        target = os.path.join(root, 'channel')
+        app_installer.install_app(source, target, 'build', store, os.path.join(root, 'userdata'))
+        build = app_installer.active_build(target)
+        app = app_installer.find_active_app(target)
+        print(f"{args.files} files, {args.files * args.file_kb / 1024:.0f} MiB")
+
+        timed("verify, untouched:", lambda: app_installer.verify_build(build))
+        paths = [os.path.join(app, rel) for rel in app_installer.load_manifest(build)['files']]
+        for path in random.Random(0).sample(paths, 20):
+            os.remove(path)
+        report = timed("verify, 20 files deleted:", lambda: app_installer.verify_build(build))
+        timed("repair from the store:", lambda: app_installer.repair_build(build, report['damaged'], store))
+
+        for path in paths:
+            os.utime(path, (1, 1))
+        timed("verify, all touched (1 thread):", lambda: app_installer.verify_build(build, workers=1))
+        timed("verify, all touched (pool):", lambda: app_installer.verify_build(build))
+
+if __name__ == "__main__":
+    main()
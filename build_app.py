@@ -7,6 +7,20 @@ import urllib.request
 import sys
 import tempfile
 
+# Python files the launcher needs at runtime, copied into Contents/Resources
+APP_MODULES = [
+    'cdda_launcher.py',
+    'cdda_cli.py',
+    'launcher_core.py',
+    'archive_stream.py',
+    'artifact_cache.py',
+    'app_installer.py',
+    'copy_engine.py',
+    'downloader.py',
+    'dmg_reader.py',
+    'save_snapshots.py',
+]
+
 def convert_ico_to_icns():
     if not os.path.exists("AppIcon.ico"):
         return None
@@ -128,7 +142,8 @@ python3 "${DIR}/../Resources/cdda_launcher.py"
     os.chmod(os.path.join(macos_dir, 'launcher'), 0o755)
     
     # Copy necessary files to Resources
-    shutil.copy('cdda_launcher.py', resources_dir)
+    for module in APP_MODULES:
+        shutil.copy(module, resources_dir)
     shutil.copy('requirements.txt', resources_dir)
     
     print(f"Created {app_name}")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Headless command-line front end for the CDDA Mac launcher.
+
+Runs the same checks, installs and launches as the GUI without importing
+customtkinter, so it is cheap enough for cron jobs and login hooks:
+
+    python cdda_cli.py check
+    python cdda_cli.py status
+    python cdda_cli.py install experimental
+    python cdda_cli.py launch stable
+    python cdda_cli.py notes bn
+    python cdda_cli.py watch --install experimental
+    python cdda_cli.py builds experimental
+    python cdda_cli.py rollback experimental
+    python cdda_cli.py cache --prune
+    python cdda_cli.py snapshots experimental --take
+    python cdda_cli.py restore experimental
+    python cdda_cli.py verify stable --repair
+"""
+import argparse
+import sys
+import threading
+from datetime import datetime
+
+from archive_stream import ArchiveError
+from dmg_reader import DmgError
+from downloader import DownloadError
+from launcher_core import LauncherCore, LauncherError, RateLimitError, RefreshScheduler, VERSION_TYPES
+from save_snapshots import SnapshotError
+
+# What a command can fail with short of a bug; requests.RequestException is an OSError
+COMMAND_ERRORS = (LauncherError, DownloadError, ArchiveError, DmgError, SnapshotError, RateLimitError, OSError)
+
+def print_status(core):
+    for version_type in VERSION_TYPES:
+        installed = core.get_installed_version(version_type)
+        latest = core.get_latest_version(version_type)
+        if installed and installed == latest:
+            state = "up to date"
+        elif latest:
+            state = "update available"
+        else:
+            state = "unknown"
+        print(f"{version_type:<13} latest: {latest or 'Unavailable':<40} "
+              f"installed: {installed or 'Not installed':<40} {state}")
+
+def print_errors(errors):
+    for channel, error in errors.items():
+        print(f"Error checking {channel}: {error}", file=sys.stderr)
+
+def install(core, version_type, quiet=False):
+    url, version_tag = core.resolve_download(version_type)
+    if core.get_installed_version(version_type) == version_tag:
+        print(f"{version_type} is already at {version_tag}")
+        return
+    progress = None
+    def on_progress(downloaded, total):
+        nonlocal progress
+        if quiet:
+            return
+        if progress is None:
+            # tqdm is only needed for interactive progress
+            from tqdm import tqdm
+            progress = tqdm(total=total or None, unit='B', unit_scale=True, unit_divisor=1024)
+        progress.update(downloaded - progress.n)
+    try:
+        core.install_version(version_type, url, version_tag,
+                             on_status=None if quiet else print, on_progress=on_progress)
+    finally:
+        if progress is not None:
+            progress.close()
+
+def cmd_check(core, args):
+    errors = core.fetch_releases()
+    print_errors(errors)
+    print_status(core)
+    return 1 if errors else 0
+
+def cmd_status(core, args):
+    # Offline: only what the release index and versions.json already know
+    print_status(core)
+    return 0
+
+def cmd_install(core, args):
+    errors = core.fetch_releases()
+    print_errors(errors)
+    install(core, args.channel, args.quiet)
+    return 0
+
+def cmd_launch(core, args):
+    app_path = core.launch(args.channel, on_status=lambda text: print(text, file=sys.stderr))
+    print(f"Launching {app_path}")
+    return 0
+
+def cmd_notes(core, args):
+    print(core.get_patch_notes(args.channel))
+    return 0
+
+def cmd_watch(core, args):
+    def refresh():
+        print_errors(core.fetch_releases())
+        for version_type in args.install or []:
+            try:
+                install(core, version_type, quiet=True)
+            except Exception as e:
+                print(f"Error installing {version_type}: {e}", file=sys.stderr)
+    interval = args.interval * 60 if args.interval is not None else core.settings['refresh_interval_minutes'] * 60
+    if interval <= 0:
+        print("Refresh interval is 0; set --interval or refresh_interval_minutes in config.json", file=sys.stderr)
+        return 2
+    scheduler = RefreshScheduler(refresh, interval, core.api_cache)
+    scheduler.request()
+    scheduler.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    return 0
+
+def cmd_builds(core, args):
+    builds = core.list_builds(args.channel)
+    if not builds:
+        print(f"No {args.channel} builds installed")
+    for build in builds:
+        installed_at = datetime.fromtimestamp(build['installed_at']).strftime('%Y-%m-%d %H:%M') \
+            if build['installed_at'] else "unknown"
+        print(f"{'*' if build['active'] else ' '} {build['name']:<45} installed {installed_at}")
+    return 0
+
+def cmd_rollback(core, args):
+    print(f"{args.channel} is now at {core.switch_build(args.channel, args.build)}")
+    return 0
+
+def cmd_snapshots(core, args):
+    if args.take:
+        summary = core.snapshot_saves(args.channel, "manual")
+        if summary is None:
+            print("Nothing to snapshot: no saves, no changes since the last snapshot, or save_snapshots is off")
+        else:
+            print(f"Took {summary['id']}: {summary['new_bytes'] / 1048576:.1f} MiB added "
+                  f"for {summary['bytes'] / 1048576:.1f} MiB of saves")
+    snapshots = core.list_snapshots(args.channel)
+    if not snapshots:
+        print(f"No {args.channel} save snapshots")
+    for snapshot in snapshots:
+        created = datetime.fromtimestamp(snapshot['created']).strftime('%Y-%m-%d %H:%M')
+        print(f"{snapshot['id']:<20} {created}  {snapshot['files']:>7} files {snapshot['bytes'] / 1048576:>9.1f} MiB  "
+              f"{snapshot['label']}")
+    store = core.snapshot_stores[args.channel]
+    print(f"Stored: {store.total_bytes() / 1048576:.1f} MiB in {store.root}")
+    return 0
+
+def cmd_restore(core, args):
+    print(f"Restored {args.channel} saves from {core.restore_snapshot(args.channel, args.snapshot)}")
+    return 0
+
+def cmd_verify(core, args):
+    if args.repair:
+        core.repair_install(args.channel, on_status=print)
+        return 0
+    report = core.verify_install(args.channel)
+    print(f"Checked {report['files']} files, hashed {report['hashed']} that changed on disk")
+    for path in report['damaged']:
+        print(f"  damaged: {path}")
+    if report['damaged']:
+        print(f"Run 'verify {args.channel} --repair' to fix them")
+        return 1
+    print("All files are intact")
+    return 0
+
+def cmd_cache(core, args):
+    artifacts = core.artifacts
+    if args.clear:
+        freed = artifacts.prune(0)
+        print(f"Removed {freed / 1048576:.1f} MiB of cached downloads")
+    elif args.prune or args.max_mb is not None:
+        freed = artifacts.prune(None if args.max_mb is None else int(args.max_mb * 1048576))
+        print(f"Removed {freed / 1048576:.1f} MiB of cached downloads")
+    if args.prune or args.clear:
+        freed = core.collect_objects()
+        print(f"Removed {freed / 1048576:.1f} MiB of files no installed build uses")
+    for entry in artifacts.entries():
+        last_used = datetime.fromtimestamp(entry['last_used']).strftime('%Y-%m-%d %H:%M')
+        print(f"{entry['name']:<50} {entry['size'] / 1048576:>9.1f} MiB  last used {last_used}  "
+              f"{entry['sha256'][:12]}")
+    print(f"Total: {artifacts.total_bytes() / 1048576:.1f} of {artifacts.max_bytes / 1048576:.0f} MiB "
+          f"in {artifacts.cache_dir}")
+    print(f"Installed game files: {core.object_store.total_bytes() / 1048576:.1f} MiB "
+          f"shared by all channels in {core.object_store.store_dir}")
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Check, install and launch CDDA and Bright Nights without the GUI.")
+    parser.add_argument('--base-path', help="Install root (default: ~/Library/Application Support/Cataclysm)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('check', help="Fetch the latest releases and show what is installed").set_defaults(func=cmd_check)
+    commands.add_parser('status', help="Show installed and last known versions without network access").set_defaults(func=cmd_status)
+
+    install_parser = commands.add_parser('install', help="Download and install the latest build of a channel")
+    install_parser.add_argument('channel', choices=VERSION_TYPES)
+    install_parser.add_argument('-q', '--quiet', action='store_true', help="No progress output")
+    install_parser.set_defaults(func=cmd_install)
+
+    launch_parser = commands.add_parser('launch', help="Launch an installed channel")
+    launch_parser.add_argument('channel', choices=VERSION_TYPES)
+    launch_parser.set_defaults(func=cmd_launch)
+
+    notes_parser = commands.add_parser('notes', help="Print the patch notes for a channel")
+    notes_parser.add_argument('channel', choices=VERSION_TYPES)
+    notes_parser.set_defaults(func=cmd_notes)
+
+    watch_parser = commands.add_parser('watch', help="Keep running and refresh on an interval")
+    watch_parser.add_argument('--interval', type=float, help="Minutes between refreshes (default: from config.json)")
+    watch_parser.add_argument('--install', action='append', choices=VERSION_TYPES,
+                              help="Install new builds of this channel as they appear (repeatable)")
+    watch_parser.set_defaults(func=cmd_watch)
+
+    builds_parser = commands.add_parser('builds', help="List the installed builds of a channel (* is active)")
+    builds_parser.add_argument('channel', choices=VERSION_TYPES)
+    builds_parser.set_defaults(func=cmd_builds)
+
+    rollback_parser = commands.add_parser('rollback', help="Switch a channel to another installed build")
+    rollback_parser.add_argument('channel', choices=VERSION_TYPES)
+    rollback_parser.add_argument('build', nargs='?', help="Build name from 'builds' (default: the newest inactive one)")
+    rollback_parser.set_defaults(func=cmd_rollback)
+
+    snapshots_parser = commands.add_parser('snapshots', help="List the save snapshots of a channel")
+    snapshots_parser.add_argument('channel', choices=VERSION_TYPES)
+    snapshots_parser.add_argument('--take', action='store_true', help="Take a snapshot first")
+    snapshots_parser.set_defaults(func=cmd_snapshots)
+
+    restore_parser = commands.add_parser('restore', help="Replace a channel's saves with a snapshot")
+    restore_parser.add_argument('channel', choices=VERSION_TYPES)
+    restore_parser.add_argument('snapshot', nargs='?', help="Snapshot id from 'snapshots' (default: the newest)")
+    restore_parser.set_defaults(func=cmd_restore)
+
+    verify_parser = commands.add_parser('verify', help="Check an installed channel's files against its install manifest")
+    verify_parser.add_argument('channel', choices=VERSION_TYPES)
+    verify_parser.add_argument('--repair', action='store_true', help="Rewrite damaged or missing files")
+    verify_parser.set_defaults(func=cmd_verify)
+
+    cache_parser = commands.add_parser('cache', help="List, prune or clear cached downloads and unused game files")
+    cache_parser.add_argument('--prune', action='store_true', help="Evict down to artifact_cache_mb and remove stray files")
+    cache_parser.add_argument('--max-mb', type=float, help="Evict least recently used downloads down to this size")
+    cache_parser.add_argument('--clear', action='store_true', help="Remove every cached download")
+    cache_parser.set_defaults(func=cmd_cache)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    core = LauncherCore(args.base_path)
+    try:
+        return args.func(core, args)
+    except COMMAND_ERRORS as e:
+        # One line on stderr instead of a traceback in a cron mail
+        print(e, file=sys.stderr)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
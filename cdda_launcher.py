@@ -1,19 +1,51 @@
 import customtkinter as ctk
-import requests
-import json
 import os
-import shutil
-from datetime import datetime
 import threading
 import webbrowser
 import subprocess
-from pathlib import Path
-import tempfile
-from urllib.parse import urlparse
-from tqdm import tqdm
-import time
 import socket
 import sys
+from launcher_core import LauncherCore, LauncherError, ProgressBus, RefreshScheduler, ViewDispatcher
+
+PROGRESS_FRAME_MS = 100  # How often the main loop applies queued status/progress updates
+VERSION_LABELS = (("experimental", "exp"), ("stable", "stable"), ("bn", "bn"))
+
+def render_view(state):
+    """Widget values for a view state: text and color per version label, plain values elsewhere."""
+    widgets = {}
+    for version_type, prefix in VERSION_LABELS:
+        latest = state.get(f"latest_{version_type}")
+        installed = state.get(f"installed_{version_type}")
+        is_latest = installed == latest
+        latest_text = f"Latest:        {latest or 'Unavailable'}"
+        installed_text = f"Installed:     {installed if installed else 'Not installed'}"
+        if installed and is_latest:
+            installed_text += " ✓"
+        if version_type == "experimental":
+            # Mac builds can lag behind the newest experimental
+            latest_text = (f"Latest:        {state.get('experimental_tag') or 'Unavailable'}\n"
+                           f"Mac build:     {latest or 'Unavailable'}")
+            if state.get('experimental_tag') != latest:
+                installed_text += "\nLatest Mac Build and Latest Build do not match,\nupdate coming soon"
+        widgets[f"{prefix}_latest_label"] = (latest_text, "white" if is_latest else "yellow")
+        widgets[f"{prefix}_installed_label"] = (installed_text, "green" if is_latest else "white")
+        widgets[f"{version_type}_download_button"] = \
+            "Cancel" if state.get(f"job_{version_type}") else "Download Latest"
+
+    notes = state.get('notes', "experimental")
+    if state.get('game') == "bn":
+        widgets['patch_notes_label'] = "Latest Patch Notes:"
+        widgets['patch_notes'] = state.get('notes_bn') or ""
+    else:
+        widgets['patch_notes_label'] = f"Latest {notes.capitalize()} Patch Notes:"
+        widgets['patch_notes'] = state.get(f"notes_{notes}") or ""
+    widgets['toggle_button'] = "View Stable Notes" if notes == "experimental" else "View Experimental Notes"
+    widgets['status_text'] = state.get('status', "Ready")
+    if state.get('progress') is not None:
+        widgets['progress_bar'] = state['progress']
+    if state.get('show_requests'):
+        widgets['window'] = state['show_requests']
+    return widgets
 
 class SingleInstance:
     def __init__(self):
@@ -48,18 +80,16 @@ class SingleInstance:
 
     def start_listener(self):
         def listen():
+            show_requests = 0
             while True:
                 try:
                     client, _ = self.sock.accept()
                     data = client.recv(1024)
                     if data == b'show':
-                        # Bring window to front
+                        # The main loop brings the window to front; Tk must not be called from here
                         if hasattr(self, 'app'):
-                            self.app.lift()
-                            self.app.focus_force()
-                            if hasattr(self.app, 'attributes'):  # Check if running in a window system
-                                self.app.attributes('-topmost', True)  # Bring to front
-                                self.app.attributes('-topmost', False)  # Allow other windows to go in front again
+                            show_requests += 1
+                            self.app.view.post(show_requests=show_requests)
                     client.close()
                 except:
                     break
@@ -78,9 +108,11 @@ class SingleInstance:
         except:
             pass
 
-class CDDALauncher(ctk.CTk):
-    def __init__(self):
+class CDDALauncher(ctk.CTk, LauncherCore):
+    def __init__(self, base_path=None):
         super().__init__()
+        # The only way other threads change what the window shows; see apply_view
+        self.view = ViewDispatcher(render_view)
         
         # Store reference to SingleInstance
         self.single_instance = SingleInstance()
@@ -103,65 +135,25 @@ class CDDALauncher(ctk.CTk):
         self.stable_version = ctk.StringVar(value="Checking...")
         self.download_progress = ctk.DoubleVar(value=0)
         self.status_text = ctk.StringVar(value="Ready")
+        # Worker threads publish here; only the main loop touches the widgets
+        self.progress_bus = ProgressBus()
+        self.job_snapshots = {}  # version_type -> latest progress of its install job
+        self.job_states = {}
         self.showing_cdda = True  # Track which game page we're showing
-        self.latest_experimental_mac_tag = None  # New variable to track last available Mac build
         
-        # Setup paths
-        self.base_path = os.path.expanduser("~/Library/Application Support/Cataclysm")
-        self.experimental_path = os.path.join(self.base_path, "experimental")
-        self.stable_path = os.path.join(self.base_path, "stable")
-        self.bn_path = os.path.join(self.base_path, "bn")
-        self.version_file = os.path.join(self.base_path, "versions.json")
+        # Paths, saved versions, config and the release index
+        LauncherCore.__init__(self, base_path)
         
-        # Create directories if they don't exist
-        for path in [self.base_path, self.experimental_path, self.stable_path, self.bn_path]:
-            os.makedirs(path, exist_ok=True)
-        
-        # Load saved versions
-        self.load_versions()
+        self.refresh_scheduler = RefreshScheduler(
+            self.refresh_releases, self.settings['refresh_interval_minutes'] * 60, self.api_cache)
         
         self._create_ui()
         self.check_versions()
-
-    def load_versions(self):
-        # Initialize with None
-        self.installed_experimental_version = None
-        self.installed_stable_version = None
-        self.installed_bn_version = None
-        
-        # Try to load saved versions
-        if os.path.exists(self.version_file):
-            try:
-                with open(self.version_file, 'r') as f:
-                    versions = json.load(f)
-                    self.installed_experimental_version = versions.get('experimental')
-                    self.installed_stable_version = versions.get('stable')
-                    self.installed_bn_version = versions.get('bn')
-            except (json.JSONDecodeError, IOError):
-                pass  # If there's any error reading, keep the default None values
-
-    def save_versions(self):
-        versions = {
-            'experimental': self.installed_experimental_version,
-            'stable': self.installed_stable_version,
-            'bn': self.installed_bn_version
-        }
-        try:
-            with open(self.version_file, 'w') as f:
-                json.dump(versions, f)
-        except IOError:
-            pass  # If we can't save, just continue
-
-    def get_game_path(self, version_type):
-        """Return the filesystem path for a given game version."""
-        if version_type == "experimental":
-            return self.experimental_path
-        elif version_type == "stable":
-            return self.stable_path
-        else:
-            return self.bn_path
+        self.refresh_scheduler.start()
+        self.after(PROGRESS_FRAME_MS, self.drain_progress)
 
     def _create_ui(self):
+        self.download_buttons = {}  # Become "Cancel" while the channel has a queued install
         # Header with game selector
         header_frame = ctk.CTkFrame(self)
         header_frame.grid(row=0, column=0, padx=15, pady=(5,2), sticky="ew")  # Slightly more horizontal padding
@@ -219,10 +211,11 @@ class CDDALauncher(ctk.CTk):
         button_frame = ctk.CTkFrame(exp_frame)
         button_frame.grid(row=1, column=0, columnspan=2, pady=2)  # Reduced padding
         
-        ctk.CTkButton(button_frame, text="Download Latest", 
+        self.download_buttons["experimental"] = ctk.CTkButton(button_frame, text="Download Latest", 
                      command=lambda: self.download_version("experimental"),
                      width=100,  # Smaller button width
-                     height=28).pack(side="left", padx=2)  # Reduced padding
+                     height=28)
+        self.download_buttons["experimental"].pack(side="left", padx=2)  # Reduced padding
         ctk.CTkButton(button_frame, text="Launch", 
                      command=lambda: self.launch_game("experimental"),
                      width=80,  # Smaller button width
@@ -261,10 +254,11 @@ class CDDALauncher(ctk.CTk):
         button_frame = ctk.CTkFrame(stable_frame)
         button_frame.grid(row=1, column=0, columnspan=2, pady=2)
         
-        ctk.CTkButton(button_frame, text="Download Latest", 
+        self.download_buttons["stable"] = ctk.CTkButton(button_frame, text="Download Latest", 
                      command=lambda: self.download_version("stable"),
                      width=100,
-                     height=28).pack(side="left", padx=2)
+                     height=28)
+        self.download_buttons["stable"].pack(side="left", padx=2)
         ctk.CTkButton(button_frame, text="Launch", 
                      command=lambda: self.launch_game("stable"),
                      width=80,
@@ -298,10 +292,11 @@ class CDDALauncher(ctk.CTk):
         button_frame = ctk.CTkFrame(bn_version_frame)
         button_frame.grid(row=1, column=0, columnspan=2, pady=2)
         
-        ctk.CTkButton(button_frame, text="Download Latest", 
+        self.download_buttons["bn"] = ctk.CTkButton(button_frame, text="Download Latest", 
                      command=lambda: self.download_version("bn"),
                      width=100,
-                     height=28).pack(side="left", padx=2)
+                     height=28)
+        self.download_buttons["bn"].pack(side="left", padx=2)
         ctk.CTkButton(button_frame, text="Launch", 
                      command=lambda: self.launch_game("bn"),
                      width=80,
@@ -364,9 +359,41 @@ class CDDALauncher(ctk.CTk):
         
         # Add variables for patch notes state
         self.showing_experimental_notes = True
-        self.stable_patch_notes = ""
-        self.experimental_patch_notes = ""
-        self.bn_patch_notes = ""
+        
+        # How apply_view puts each rendered value on screen
+        self.view_setters = {
+            'patch_notes': self.set_patch_notes,
+            'patch_notes_label': lambda text: self.patch_notes_label.configure(text=text),
+            'toggle_button': lambda text: self.toggle_button.configure(text=text),
+            'status_text': self.status_text.set,
+            'progress_bar': self.progress_bar.set,
+            'window': lambda _: self.show_window(),
+        }
+        for version_type, prefix in VERSION_LABELS:
+            for name in (f"{prefix}_latest_label", f"{prefix}_installed_label"):
+                self.view_setters[name] = lambda value, label=getattr(self, name): \
+                    label.configure(text=value[0], text_color=value[1])
+            self.view_setters[f"{version_type}_download_button"] = \
+                lambda text, button=self.download_buttons[version_type]: button.configure(text=text)
+        
+        # Paint the last known releases before any network traffic; check_versions refreshes them
+        self.view.post(**self.release_state())
+        self.apply_view()
+
+    def apply_view(self):
+        """Put the widget values that changed since the last call on screen (main thread only)."""
+        for key, value in self.view.drain().items():
+            self.view_setters[key](value)
+
+    def set_patch_notes(self, text):
+        self.patch_notes.delete("0.0", "end")
+        self.patch_notes.insert("0.0", text)
+
+    def show_window(self):
+        self.lift()
+        self.focus_force()
+        self.attributes('-topmost', True)  # Bring to front
+        self.attributes('-topmost', False)  # Allow other windows to go in front again
 
     def switch_game(self, game):
         if game == "cdda" and not self.showing_cdda:
@@ -378,14 +405,8 @@ class CDDALauncher(ctk.CTk):
             self.title("CDDA Mac Launcher")
             # Show CDDA patch notes toggle
             self.toggle_button.grid()
-            if self.showing_experimental_notes:
-                self.patch_notes_label.configure(text="Latest Experimental Patch Notes:")
-                self.patch_notes.delete("0.0", "end")
-                self.patch_notes.insert("0.0", self.experimental_patch_notes)
-            else:
-                self.patch_notes_label.configure(text="Latest Stable Patch Notes:")
-                self.patch_notes.delete("0.0", "end")
-                self.patch_notes.insert("0.0", self.stable_patch_notes)
+            self.view.post(game="cdda")
+            self.apply_view()
         elif game == "bn" and self.showing_cdda:
             self.showing_cdda = False
             self.cdda_frame.grid_remove()
@@ -395,365 +416,115 @@ class CDDALauncher(ctk.CTk):
             self.title("Bright Nights Mac Launcher")
             # Hide CDDA patch notes toggle and show BN notes
             self.toggle_button.grid_remove()
-            self.patch_notes_label.configure(text="Latest Patch Notes:")
-            self.patch_notes.delete("0.0", "end")
-            self.patch_notes.insert("0.0", self.bn_patch_notes)
+            self.view.post(game="bn")
+            self.apply_view()
 
     def toggle_patch_notes(self):
         self.showing_experimental_notes = not self.showing_experimental_notes
-        if self.showing_experimental_notes:
-            self.patch_notes_label.configure(text="Latest Experimental Patch Notes:")
-            self.toggle_button.configure(text="View Stable Notes")
-            self.patch_notes.delete("0.0", "end")
-            self.patch_notes.insert("0.0", self.experimental_patch_notes)
-        else:
-            self.patch_notes_label.configure(text="Latest Stable Patch Notes:")
-            self.toggle_button.configure(text="View Experimental Notes")
-            self.patch_notes.delete("0.0", "end")
-            self.patch_notes.insert("0.0", self.stable_patch_notes)
-
-    def get_version(self, path, tracked_version):
-        if not os.path.exists(path):
-            return None
-        
-        app_path = os.path.join(path, "Cataclysm.app")
-        if not os.path.exists(app_path):
-            return None
-
-        return tracked_version if tracked_version else "Unknown Version"
+        self.view.post(notes="experimental" if self.showing_experimental_notes else "stable")
+        self.apply_view()
 
     def check_versions(self):
-        def check():
-            try:
-                # Check experimental version
-                exp_response = requests.get("https://api.github.com/repos/CleverRaven/Cataclysm-DDA/releases")
-                releases = json.loads(exp_response.text)
-                
-                # Always set latest tag from the first experimental release
-                for release in releases:
-                    if "experimental" in release["tag_name"].lower():
-                        self.latest_experimental_tag = release['tag_name']
-                        break
-                
-                # Then find the newest Mac build by searching all releases
-                found_mac_build = False
-                self.latest_experimental_mac_tag = None
-                self.latest_experimental_url = None
-                
-                for release in releases:
-                    if "experimental" in release["tag_name"].lower():
-                        # Look for Mac build
-                        for asset in release["assets"]:
-                            name = asset["name"].lower()
-                            if "osx" in name and "graphics" in name and "universal" in name and name.endswith(".dmg"):
-                                if not found_mac_build:  # Only set these for the first Mac build found
-                                    self.latest_experimental_mac_tag = release['tag_name']
-                                    self.latest_experimental_url = asset["browser_download_url"]
-                                    self.experimental_patch_notes = release.get("body", "No patch notes available")
-                                    found_mac_build = True
-                                    break
-                        
-                        if found_mac_build:
-                            break
-                
-                # Update experimental version display
-                exp_version = self.get_version(self.experimental_path, self.installed_experimental_version)
-                # Compare against Mac build tag instead of latest experimental tag
-                is_exp_latest = exp_version == self.latest_experimental_mac_tag
-                
-                if self.latest_experimental_mac_tag and self.latest_experimental_tag != self.latest_experimental_mac_tag:
-                    latest_text = f"Latest: {self.latest_experimental_tag}\nMac build: {self.latest_experimental_mac_tag}"
-                    if exp_version != self.latest_experimental_mac_tag:
-                        latest_text += "\n(Newer Mac build may come soon)"
-                else:
-                    latest_text = f"Latest: {self.latest_experimental_tag}"
-                
-                installed_text = f"Installed: {exp_version if exp_version else 'Not installed'}"
-                if exp_version and is_exp_latest:
-                    installed_text += " ✓"
-                
-                self.exp_latest_label.configure(
-                    text=latest_text,
-                    text_color=("yellow" if not is_exp_latest else "white")
-                )
-                self.exp_installed_label.configure(
-                    text=installed_text,
-                    text_color="green" if is_exp_latest else "white"
-                )
-                
-                # Check stable version
-                stable_response = requests.get("https://api.github.com/repos/CleverRaven/Cataclysm-DDA/releases/latest")
-                stable_info = json.loads(stable_response.text)
-                self.latest_stable_tag = stable_info['tag_name']
-                
-                # Store stable patch notes
-                self.stable_patch_notes = stable_info.get("body", "No patch notes available")
-                
-                # Find Mac OS X stable build with tiles
-                self.latest_stable_url = None
-                for asset in stable_info["assets"]:
-                    name = asset["name"].lower()
-                    if "osx" in name and "graphics" in name and "universal" in name and name.endswith(".dmg"):
-                        self.latest_stable_url = asset["browser_download_url"]
-                        break
-
-                # Check Bright Nights version
-                bn_response = requests.get("https://api.github.com/repos/cataclysmbnteam/Cataclysm-BN/releases")
-                bn_releases = json.loads(bn_response.text)
-                
-                # Get the latest experimental release (first one in the list)
-                if bn_releases:
-                    bn_info = bn_releases[0]  # Latest release
-                    self.latest_bn_tag = bn_info['tag_name']
-                    
-                    # Store BN patch notes
-                    self.bn_patch_notes = bn_info.get("body", "No patch notes available")
-                    if not self.showing_cdda:
-                        self.patch_notes.delete("0.0", "end")
-                        self.patch_notes.insert("0.0", self.bn_patch_notes)
-                    
-                    # Find Mac OS X BN build with tiles
-                    self.latest_bn_url = None
-                    for asset in bn_info["assets"]:
-                        name = asset["name"].lower()
-                        if "osx" in name and ("tiles" in name or "graphics" in name) and name.endswith(".dmg"):
-                            self.latest_bn_url = asset["browser_download_url"]
-                            break
-                
-                # Update patch notes display based on current view
-                if self.showing_cdda:
-                    if self.showing_experimental_notes:
-                        self.patch_notes.delete("0.0", "end")
-                        self.patch_notes.insert("0.0", self.experimental_patch_notes)
-                    else:
-                        self.patch_notes.delete("0.0", "end")
-                        self.patch_notes.insert("0.0", self.stable_patch_notes)
-                
-                self.check_installed_versions()
-                
-            except Exception as e:
-                self.status_text.set(f"Error checking versions: {str(e)}")
-                print(f"Detailed error: {str(e)}")  # For debugging
-        
-        thread = threading.Thread(target=check)
-        thread.daemon = True
-        thread.start()
+        # Repeated clicks while a refresh is running join that refresh
+        self.refresh_scheduler.request()
 
-    def check_installed_versions(self):
-        exp_version = self.get_version(self.experimental_path, self.installed_experimental_version)
-        stable_version = self.get_version(self.stable_path, self.installed_stable_version)
-        bn_version = self.get_version(self.bn_path, self.installed_bn_version)
-        
-        # Update experimental version display
-        is_exp_latest = exp_version == self.latest_experimental_mac_tag
-        latest_text = f"Latest:        {self.latest_experimental_tag}\nMac build:     {self.latest_experimental_mac_tag}"
-        installed_text = f"Installed:     {exp_version if exp_version else 'Not installed'}"
-        
-        if exp_version and is_exp_latest:
-            installed_text += " ✓"
-        if self.latest_experimental_tag != self.latest_experimental_mac_tag:
-            installed_text += "\nLatest Mac Build and Latest Build do not match,\nupdate coming soon"
-        
-        self.exp_latest_label.configure(
-            text=latest_text,
-            text_color=("yellow" if not is_exp_latest else "white")
-        )
-        self.exp_installed_label.configure(
-            text=installed_text,
-            text_color="green" if is_exp_latest else "white"
-        )
-        
-        # Update stable version display
-        is_stable_latest = stable_version == self.latest_stable_tag
-        latest_text = f"Latest:        {self.latest_stable_tag}"
-        installed_text = f"Installed:     {stable_version if stable_version else 'Not installed'}"
-        if stable_version and is_stable_latest:
-            installed_text += " ✓"
-        
-        self.stable_latest_label.configure(
-            text=latest_text,
-            text_color=("yellow" if not is_stable_latest else "white")
-        )
-        self.stable_installed_label.configure(
-            text=installed_text,
-            text_color="green" if is_stable_latest else "white"
-        )
-        
-        # Update Bright Nights version display
-        is_bn_latest = bn_version == self.latest_bn_tag
-        latest_text = f"Latest:        {self.latest_bn_tag}"
-        installed_text = f"Installed:     {bn_version if bn_version else 'Not installed'}"
-        if bn_version and is_bn_latest:
-            installed_text += " ✓"
-        
-        self.bn_latest_label.configure(
-            text=latest_text,
-            text_color=("yellow" if not is_bn_latest else "white")
-        )
-        self.bn_installed_label.configure(
-            text=installed_text,
-            text_color="green" if is_bn_latest else "white"
-        )
+    def refresh_releases(self):
+        errors = self.fetch_releases()
+        try:
+            # Always post so a failed or timed-out channel stops showing "Checking...";
+            # this runs on the scheduler's thread, so the main loop does the drawing
+            self.view.post(**self.release_state())
+            
+            if errors:
+                failed = ", ".join(f"{channel}: {error}" for channel, error in errors.items())
+                last_checked = self.release_index.last_checked()
+                if last_checked:
+                    # Offline or rate limited: the saved release info is still usable
+                    self.progress_bus.publish_status(f"Could not check for updates, showing release info from "
+                                                     f"{last_checked:%Y-%m-%d %H:%M}")
+                else:
+                    self.progress_bus.publish_status(f"Error checking versions: {failed}")
+                print(f"Detailed error: {failed}")  # For debugging
+            
+        except Exception as e:
+            self.progress_bus.publish_status(f"Error checking versions: {str(e)}")
+            print(f"Detailed error: {str(e)}")  # For debugging
 
     def download_version(self, version_type):
-        if version_type == "experimental":
-            if not self.latest_experimental_url:
-                if self.latest_experimental_tag != self.latest_experimental_mac_tag:
-                    self.status_text.set(f"No Mac build yet for {self.latest_experimental_tag}. Latest Mac build: {self.latest_experimental_mac_tag}")
-                else:
-                    self.status_text.set(f"No Mac download found for {version_type} version")
-                return
-            url = self.latest_experimental_url
-            version_tag = self.latest_experimental_mac_tag
-        elif version_type == "stable":
-            url = self.latest_stable_url
-            version_tag = self.latest_stable_tag
-        else:  # bn
-            url = self.latest_bn_url
-            version_tag = self.latest_bn_tag
-        
-        if not url:
-            self.status_text.set(f"No Mac download found for {version_type} version")
+        # The same button cancels an install that is already queued or running
+        job = self.install_queue.get(version_type)
+        if job is not None and job.active:
+            job.cancel()
             return
-        
-        def download():
-            try:
-                self.status_text.set(f"Downloading {version_type} version...")
-                
-                # Create temporary directory for download
-                with tempfile.TemporaryDirectory() as temp_dir:
-                    # Download file
-                    response = requests.get(url, stream=True)
-                    total_size = int(response.headers.get('content-length', 0))
-                    
-                    dmg_path = os.path.join(temp_dir, os.path.basename(urlparse(url).path))
-                    
-                    with open(dmg_path, 'wb') as f:
-                        downloaded = 0
-                        for data in response.iter_content(chunk_size=4096):
-                            downloaded += len(data)
-                            f.write(data)
-                            progress = downloaded / total_size
-                            self.progress_bar.set(progress)
-                    
-                    self.status_text.set("Mounting DMG...")
-                    
-                    # Mount the DMG
-                    mount_process = subprocess.Popen(["hdiutil", "attach", dmg_path, "-nobrowse"], 
-                                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                    output, error = mount_process.communicate()
-                    
-                    if mount_process.returncode != 0:
-                        raise Exception(f"Failed to mount DMG: {error.decode()}")
-                    
-                    # Find the mount point
-                    mount_point = None
-                    for line in output.decode().split('\n'):
-                        if '/Volumes/' in line:
-                            mount_point = line.split('\t')[-1].strip()
-                            break
-                    
-                    if not mount_point:
-                        raise Exception("Could not find DMG mount point")
-                    
-                    # Find the .app in the mounted DMG
-                    app_name = None
-                    for item in os.listdir(mount_point):
-                        if item.endswith('.app'):
-                            app_name = item
-                            break
-                    
-                    if not app_name:
-                        raise Exception("Could not find .app in mounted DMG")
-                    
-                    target_path = self.get_game_path(version_type)
-                    
-                    # Backup important user data
-                    save_data = {}
-                    important_folders = ['save', 'save_backups', 'graveyard', 'memorial', 'templates']
-                    
-                    if os.path.exists(target_path):
-                        app_contents = [f for f in os.listdir(target_path) if f.endswith('.app')]
-                        if app_contents:
-                            current_app = os.path.join(target_path, app_contents[0])
-                            data_path = os.path.join(current_app, 'Contents/Resources/data')
-                            if os.path.exists(data_path):
-                                for folder in important_folders:
-                                    folder_path = os.path.join(data_path, folder)
-                                    if os.path.exists(folder_path):
-                                        save_data[folder] = folder_path
-                    
-                    # Clear existing installation
-                    if os.path.exists(target_path):
-                        self.status_text.set("Removing old version...")
-                        shutil.rmtree(target_path, ignore_errors=True)
-                    os.makedirs(target_path, exist_ok=True)
-                    
-                    # Copy the .app
-                    self.status_text.set("Installing new version...")
-                    source_app = os.path.join(mount_point, app_name)
-                    target_app = os.path.join(target_path, app_name)
-                    shutil.copytree(source_app, target_app, symlinks=True)
-                    
-                    # Restore user data
-                    if save_data:
-                        self.status_text.set("Restoring save data...")
-                        new_data_path = os.path.join(target_app, 'Contents/Resources/data')
-                        for folder, old_path in save_data.items():
-                            new_folder_path = os.path.join(new_data_path, folder)
-                            if os.path.exists(old_path):
-                                if os.path.exists(new_folder_path):
-                                    shutil.rmtree(new_folder_path)
-                                shutil.copytree(old_path, new_folder_path, symlinks=True)
-                    
-                    # Unmount the DMG
-                    self.status_text.set("Cleaning up...")
-                    subprocess.run(["hdiutil", "detach", mount_point], check=True)
-                    
-                    self.status_text.set(f"{version_type.capitalize()} version installed successfully!")
-                    self.progress_bar.set(1)
-                    
-                    # Update tracked version after successful installation
-                    if version_type == "experimental":
-                        self.installed_experimental_version = version_tag
-                    else:
-                        self.installed_stable_version = version_tag
-                    
-                    # Save versions after successful installation
-                    self.save_versions()
-                    
-                    self.check_installed_versions()
-                    
-            except Exception as e:
-                self.status_text.set(f"Error during download: {str(e)}")
-                self.progress_bar.set(0)
-                print(f"Detailed error: {str(e)}")  # For debugging
-        
-        thread = threading.Thread(target=download)
-        thread.daemon = True
-        thread.start()
+        try:
+            self.queue_install(version_type)
+        except LauncherError as e:
+            self.progress_bus.publish_status(str(e))
 
     def launch_game(self, version_type):
-        path = self.get_game_path(version_type)
-        
-        if not os.path.exists(path):
-            self.status_text.set(f"No {version_type} version installed")
-            return
-        
-        app_paths = [f for f in os.listdir(path) if f.endswith(".app")]
-        if not app_paths:
-            self.status_text.set(f"No .app found in {version_type} folder")
-            return
-        
-        app_path = os.path.join(path, app_paths[0])
-        subprocess.Popen(["open", app_path])
-        self.status_text.set(f"Launching {version_type} version...")
+        # The pre-launch save backup can take a while on a large world; keep it off the main loop
+        thread = threading.Thread(target=self.launch_in_background, args=(version_type,), daemon=True)
+        thread.start()
+        return thread
+
+    def launch_in_background(self, version_type):
+        try:
+            self.launch(version_type, on_status=self.progress_bus.publish_status,
+                        on_progress=self.progress_bus.publish_progress)
+        except LauncherError as e:
+            self.progress_bus.publish_status(str(e))
+
+    def drain_progress(self):
+        """Apply the latest coalesced status/progress to the widgets, once per frame."""
+        snapshot = self.progress_bus.drain()
+        if snapshot is not None:
+            self.view.post(status=snapshot.describe())
+            if snapshot.fraction is not None:
+                self.view.post(progress=snapshot.fraction)
+        changed = self.drain_jobs()
+        if changed is not None:
+            self.show_jobs(changed)
+        self.apply_view()
+        self.after(PROGRESS_FRAME_MS, self.drain_progress)
+
+    def drain_jobs(self):
+        """Collect install job progress and state changes; returns the last job that changed."""
+        changed = None
+        for job in self.install_queue.jobs():
+            snapshot = job.progress.drain()
+            if snapshot is not None:
+                self.job_snapshots[job.version_type] = snapshot
+                changed = job
+            if self.job_states.get(job.version_type) != job.state:
+                self.job_states[job.version_type] = job.state
+                changed = job
+                update = {f"job_{job.version_type}": job.active}
+                if job.state == 'done':
+                    update[f"installed_{job.version_type}"] = self.get_installed_version(job.version_type)
+                self.view.post(**update)
+        return changed
+
+    def show_jobs(self, changed):
+        # One status line for all running installs, or the outcome of the last one;
+        # the bar shows their combined bytes
+        jobs = [job for job in self.install_queue.jobs() if job.active] or [changed]
+        snapshots = [(job, self.job_snapshots.get(job.version_type)) for job in jobs]
+        self.view.post(status="; ".join(
+            f"{job.version_type.capitalize()}: {snapshot.describe() if snapshot else 'Queued'}"
+            for job, snapshot in snapshots))
+        totals = [snapshot for _, snapshot in snapshots if snapshot is not None and snapshot.total]
+        if len(snapshots) > 1 and totals:
+            self.view.post(progress=sum(s.downloaded for s in totals) / sum(s.total for s in totals))
+        elif len(snapshots) == 1 and snapshots[0][1] is not None and snapshots[0][1].fraction is not None:
+            self.view.post(progress=snapshots[0][1].fraction)
 
     def open_folder(self, version_type):
         path = self.get_game_path(version_type)
         subprocess.Popen(["open", path])
 
     def on_closing(self):
+        self.refresh_scheduler.stop()
+        self.install_queue.shutdown()
         self.single_instance.cleanup()
         self.quit()
 
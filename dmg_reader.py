@@ -0,0 +1,445 @@
+"""Read Apple UDIF disk images (.dmg) without mounting them.
+
+Release DMGs are UDIF images: an HFS+ volume cut into runs of sectors
+("chunks"), each stored zlib-compressed (UDZO), bzip2-compressed (UDBZ), raw
+or as a run of zeros. A 512-byte "koly" trailer at the end of the file points
+at an XML property list whose "blkx" entries hold each partition's chunk
+table.
+
+extract_app() reads the HFS+ catalog through that table and writes the .app
+tree straight to a directory. Every chunk that holds file data is read and
+decompressed exactly once, on a thread pool (zlib and bz2 release the GIL),
+and its bytes are written into the files they belong to. Nothing is mounted,
+so there is no attach/detach latency, no second copy out of a mounted
+volume, and it works off macOS too.
+
+Images it can't read (APFS, LZFSE/LZMA/ADC chunks, HFS+ compressed files)
+raise DmgError, so the caller can fall back to hdiutil.
+"""
+import bisect
+import bz2
+import os
+import plistlib
+import struct
+import threading
+import zlib
+from xml.parsers.expat import ExpatError
+from collections import OrderedDict
+
+from copy_engine import ProgressCounter, parallel_map
+
+SECTOR_SIZE = 512
+KOLY_SIZE = 512
+DECOMPRESS_WORKERS = max(2, os.cpu_count() or 1)
+CACHED_CHUNKS = 8  # Decompressed chunks kept for metadata reads
+HFS_EPOCH_OFFSET = 2082844800  # Seconds from 1904-01-01 (HFS+ dates) to 1970-01-01
+ROOT_FOLDER_ID = 2
+EXTENTS_FILE_ID = 3
+CATALOG_FILE_ID = 4
+UF_COMPRESSED = 0x20  # BSD owner flag of decmpfs (HFS+ compressed) files
+
+CHUNK_ZERO = 0x00000000
+CHUNK_RAW = 0x00000001
+CHUNK_IGNORE = 0x00000002  # Unallocated sectors, read as zeros
+CHUNK_ZLIB = 0x80000005
+CHUNK_BZIP2 = 0x80000006
+CHUNK_COMMENT = 0x7ffffffe
+CHUNK_END = 0xffffffff
+DECOMPRESSORS = {
+    CHUNK_RAW: lambda data: data,
+    CHUNK_ZLIB: zlib.decompress,
+    CHUNK_BZIP2: bz2.decompress,
+}
+
+# Catalog record types
+FOLDER_RECORD = 1
+FILE_RECORD = 2
+
+class DmgError(Exception):
+    pass
+
+# What a truncated or corrupted image makes the parsers raise; bz2 raises OSError
+DAMAGED_IMAGE_ERRORS = (ExpatError, plistlib.InvalidFileException, struct.error, zlib.error, OSError,
+                        UnicodeDecodeError, ValueError, IndexError, KeyError, TypeError, OverflowError)
+
+class Chunk:
+    """A run of a partition's bytes and where its (compressed) data is in the file."""
+    __slots__ = ('kind', 'start', 'length', 'offset', 'size')
+
+    def __init__(self, kind, start, length, offset, size):
+        self.kind = kind
+        self.start = start  # Byte offset in the partition
+        self.length = length  # Bytes once decompressed
+        self.offset = offset  # Byte offset of the stored data in the .dmg
+        self.size = size  # Bytes stored
+
+    @property
+    def zero(self):
+        return self.kind in (CHUNK_ZERO, CHUNK_IGNORE)
+
+def parse_blkx(data, data_fork_offset):
+    """Return the chunks of a "mish" block table; chunk offsets are relative to its partition."""
+    if data[:4] != b'mish':
+        raise DmgError("Bad block table in disk image")
+    count, = struct.unpack_from('>I', data, 200)
+    chunks = []
+    for index in range(count):
+        kind, _, sector, sectors, offset, size = struct.unpack_from('>IIQQQQ', data, 204 + 40 * index)
+        if kind == CHUNK_END:
+            break
+        if kind == CHUNK_COMMENT:
+            continue
+        if kind not in DECOMPRESSORS and kind not in (CHUNK_ZERO, CHUNK_IGNORE):
+            raise DmgError(f"Unsupported disk image compression (chunk type {kind:#x})")
+        chunks.append(Chunk(kind, sector * SECTOR_SIZE, sectors * SECTOR_SIZE, data_fork_offset + offset, size))
+    return chunks
+
+class UdifImage:
+    """Random access to the HFS+ partition of a UDIF image."""
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_RDONLY)
+        self.cache_lock = threading.Lock()
+        try:
+            self.load_partition()
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        os.close(self.fd)
+
+    def load_partition(self):
+        """Find the HFS+ partition and load its chunk table."""
+        file_size = os.fstat(self.fd).st_size
+        trailer = os.pread(self.fd, KOLY_SIZE, file_size - KOLY_SIZE) if file_size >= KOLY_SIZE else b''
+        if trailer[:4] != b'koly':
+            raise DmgError("Not a UDIF disk image (no koly trailer)")
+        data_fork_offset, = struct.unpack_from('>Q', trailer, 24)
+        xml_offset, xml_length = struct.unpack_from('>QQ', trailer, 216)
+        try:
+            plist = plistlib.loads(os.pread(self.fd, xml_length, xml_offset))
+            partitions = plist['resource-fork']['blkx']
+        except (ExpatError, plistlib.InvalidFileException, KeyError, TypeError, ValueError):
+            raise DmgError("Disk image has no readable partition map")
+        if any('Apple_APFS' in partition.get('Name', '') for partition in partitions):
+            raise DmgError("APFS disk images are not supported")
+        # Partitions named as HFS+ first, then the rest from largest to smallest
+        candidates = sorted(partitions, key=lambda partition: ('Apple_HFS' not in partition.get('Name', ''),
+                                                                -len(partition.get('Data', b''))))
+        for partition in candidates:
+            chunks = parse_blkx(partition.get('Data', b''), data_fork_offset)
+            chunks.sort(key=lambda chunk: chunk.start)
+            self.chunks = chunks
+            self.starts = [chunk.start for chunk in chunks]
+            self.cache = OrderedDict()
+            try:
+                if self.read(1024, 2) in (b'H+', b'HX'):
+                    return
+            except DmgError:
+                pass  # Too small to hold a volume header
+        raise DmgError("No HFS+ volume in disk image")
+
+    def decompress(self, chunk):
+        if chunk.zero:
+            return bytes(chunk.length)
+        data = os.pread(self.fd, chunk.size, chunk.offset)
+        try:
+            data = DECOMPRESSORS[chunk.kind](data)
+        except (zlib.error, OSError, ValueError):
+            raise DmgError("Disk image data is damaged")
+        if len(data) != chunk.length:
+            raise DmgError("Disk image data is damaged")
+        return data
+
+    def chunk_index(self, offset):
+        index = bisect.bisect_right(self.starts, offset) - 1
+        if index < 0 or offset >= self.chunks[index].start + self.chunks[index].length:
+            raise DmgError(f"Disk image has no data at offset {offset}")
+        return index
+
+    def cached_chunk(self, index):
+        with self.cache_lock:
+            data = self.cache.get(index)
+            if data is not None:
+                self.cache.move_to_end(index)
+                return data
+        data = self.decompress(self.chunks[index])
+        with self.cache_lock:
+            self.cache[index] = data
+            while len(self.cache) > CACHED_CHUNKS:
+                self.cache.popitem(last=False)
+        return data
+
+    def read(self, offset, length):
+        """Bytes of the partition, for metadata; file data goes through extract_app()."""
+        parts = []
+        while length > 0:
+            index = self.chunk_index(offset)
+            chunk = self.chunks[index]
+            start = offset - chunk.start
+            part = self.cached_chunk(index)[start:start + length]
+            parts.append(part)
+            offset += len(part)
+            length -= len(part)
+        return b''.join(parts)
+
+def parse_fork(data, offset):
+    """Return (logical size, total blocks, [(start block, block count)]) of an HFSPlusForkData."""
+    logical_size, _, total_blocks = struct.unpack_from('>QII', data, offset)
+    extents = []
+    for index in range(8):
+        start, count = struct.unpack_from('>II', data, offset + 16 + 8 * index)
+        if count:
+            extents.append((start, count))
+    return logical_size, total_blocks, extents
+
+def btree_leaf_records(read_node, header):
+    """Yield the raw records of every leaf node of an HFS+ B-tree, in key order."""
+    first_leaf, = struct.unpack_from('>I', header, 14 + 10)
+    node_size, = struct.unpack_from('>H', header, 14 + 18)
+    total_nodes, = struct.unpack_from('>I', header, 14 + 22)
+    node_number = first_leaf
+    visited = 0
+    while node_number:
+        visited += 1
+        if visited > total_nodes:
+            raise DmgError("Disk image catalog is damaged")
+        node = read_node(node_number, node_size)
+        forward, _, kind, _, count = struct.unpack_from('>IIbBH', node, 0)
+        if kind != -1:
+            raise DmgError("Disk image catalog is damaged")
+        offsets = [struct.unpack_from('>H', node, node_size - 2 * (index + 1))[0] for index in range(count + 1)]
+        for index in range(count):
+            yield node[offsets[index]:offsets[index + 1]]
+        node_number = forward
+
+class HfsEntry:
+    __slots__ = ('name', 'kind', 'record')
+
+    def __init__(self, name, kind, record):
+        self.name = name
+        self.kind = kind
+        self.record = record
+
+class HfsVolume:
+    """The catalog of an HFS+ (or HFSX) volume, read through a UdifImage."""
+
+    def __init__(self, image):
+        self.image = image
+        header = image.read(1024, 512)
+        self.block_size, = struct.unpack_from('>I', header, 40)
+        self.overflow = {}  # The extents file itself never overflows
+        extents_fork = parse_fork(header, 192)
+        self.overflow = self.load_overflow(extents_fork)
+        catalog_fork = parse_fork(header, 272)
+        self.catalog = self.read_fork(CATALOG_FILE_ID, catalog_fork)
+        self.children = self.load_catalog()
+
+    def fork_extents(self, file_id, fork):
+        """All extents of a data fork, including those in the extents overflow file."""
+        _, total_blocks, extents = fork
+        extents = list(extents)
+        if sum(count for _, count in extents) < total_blocks:
+            extents.extend(self.overflow.get(file_id, []))
+        return extents
+
+    def read_fork(self, file_id, fork):
+        logical_size = fork[0]
+        parts = [self.image.read(start * self.block_size, count * self.block_size)
+                 for start, count in self.fork_extents(file_id, fork)]
+        return b''.join(parts)[:logical_size]
+
+    def load_overflow(self, extents_fork):
+        if not extents_fork[0]:
+            return {}
+        data = self.read_fork(EXTENTS_FILE_ID, extents_fork)
+        overflow = {}
+
+        def read_node(number, size):
+            return data[number * size:(number + 1) * size]
+
+        for record in btree_leaf_records(read_node, data[:512]):
+            key_length, fork_type, file_id, start_block = struct.unpack_from('>HBxII', record, 0)
+            if fork_type != 0:
+                continue  # Resource forks aren't extracted
+            runs = [struct.unpack_from('>II', record, 2 + key_length + 8 * index) for index in range(8)]
+            overflow.setdefault(file_id, []).append((start_block, [run for run in runs if run[1]]))
+        # Records are keyed by the fork block they start at, so sort to get them in file order
+        return {file_id: [run for _, runs in sorted(records) for run in runs]
+                for file_id, records in overflow.items()}
+
+    def load_catalog(self):
+        """Map each folder id to its entries, from the catalog's folder and file records."""
+        children = {}
+
+        def read_node(number, size):
+            return self.catalog[number * size:(number + 1) * size]
+
+        for record in btree_leaf_records(read_node, self.catalog[:512]):
+            key_length, parent_id, name_length = struct.unpack_from('>HIH', record, 0)
+            body = record[2 + key_length:]
+            kind, = struct.unpack_from('>h', body, 0)
+            if kind not in (FOLDER_RECORD, FILE_RECORD):
+                continue  # Thread records
+            # POSIX names can contain ":" but not "/", which HFS+ stores them as
+            name = record[8:8 + 2 * name_length].decode('utf-16-be').replace('/', ':')
+            children.setdefault(parent_id, []).append(HfsEntry(name, kind, body))
+        return children
+
+    def find(self, parent_id, name):
+        for entry in self.children.get(parent_id, []):
+            if entry.name == name:
+                return entry
+        return None
+
+def entry_id(entry):
+    return struct.unpack_from('>I', entry.record, 8)[0]
+
+def entry_mode(entry, default):
+    mode, = struct.unpack_from('>H', entry.record, 42)
+    return mode & 0o7777 if mode else default
+
+def entry_mtime(entry):
+    modified, = struct.unpack_from('>I', entry.record, 16)
+    return max(0, modified - HFS_EPOCH_OFFSET)
+
+class Extraction:
+    """Plans and runs writing one folder of an HfsVolume to disk."""
+
+    def __init__(self, volume, workers=DECOMPRESS_WORKERS, on_progress=None, paths=None):
+        self.volume = volume
+        self.image = volume.image
+        self.workers = workers
+        self.on_progress = on_progress
+        self.paths = None if paths is None else set(paths)  # Relative file paths to write, or everything
+        self.folders = set()
+        for rel in self.paths or ():
+            while os.path.dirname(rel):
+                rel = os.path.dirname(rel)
+                self.folders.add(rel)
+        self.pieces = {}  # chunk index -> [(offset in chunk, length, path, offset in file)]
+        self.files = []  # (path, mode, mtime)
+        self.dirs = []
+        self.total = 0
+
+    def plan_folder(self, folder_id, path, entry, rel=""):
+        os.mkdir(path)
+        self.dirs.append((path, entry_mode(entry, 0o755), entry_mtime(entry)))
+        for child in self.volume.children.get(folder_id, []):
+            child_path = os.path.join(path, child.name)
+            child_rel = os.path.join(rel, child.name)
+            if child.kind == FOLDER_RECORD:
+                if self.paths is None or child_rel in self.folders:
+                    self.plan_folder(entry_id(child), child_path, child, child_rel)
+            elif self.paths is None or child_rel in self.paths:
+                self.plan_file(child, child_path)
+
+    def plan_file(self, entry, path):
+        record = entry.record
+        owner_flags = record[41]
+        file_type, creator = record[48:52], record[52:56]
+        if owner_flags & UF_COMPRESSED:
+            raise DmgError("HFS+ compressed files are not supported")
+        if file_type == b'slnk' and creator == b'rhap':
+            target = self.volume.read_fork(entry_id(entry), parse_fork(record, 88))
+            os.symlink(os.fsdecode(target), path)
+            return
+        if file_type == b'hlnk' and creator == b'hfs+':
+            entry = self.hardlink_target(entry)
+            record = entry.record
+        file_id = entry_id(entry)
+        fork = parse_fork(record, 88)
+        with open(path, 'wb') as f:
+            f.truncate(fork[0])  # Zero runs of the image need no writes
+        self.files.append((path, entry_mode(entry, 0o644), entry_mtime(entry)))
+        self.add_pieces(path, fork[0], self.volume.fork_extents(file_id, fork))
+
+    def hardlink_target(self, entry):
+        # Hardlinked files are "iNode<n>" entries in a hidden folder at the volume root
+        private = self.volume.find(ROOT_FOLDER_ID, "\0\0\0\0HFS+ Private Data")
+        link_id, = struct.unpack_from('>I', entry.record, 44)
+        target = private and self.volume.find(entry_id(private), f"iNode{link_id}")
+        if target is None:
+            raise DmgError(f"Disk image has a broken hardlink ({entry.name})")
+        return target
+
+    def add_pieces(self, path, size, extents):
+        block_size = self.volume.block_size
+        file_offset = 0
+        for start, count in extents:
+            offset = start * block_size
+            end = offset + min(count * block_size, size - file_offset)
+            while offset < end:
+                index = self.image.chunk_index(offset)
+                chunk = self.image.chunks[index]
+                length = min(end, chunk.start + chunk.length) - offset
+                if not chunk.zero:
+                    self.pieces.setdefault(index, []).append((offset - chunk.start, length, path, file_offset))
+                    self.total += length
+                offset += length
+                file_offset += length
+            if file_offset >= size:
+                break
+        if file_offset < size:
+            raise DmgError(f"Disk image is missing data for {path}")
+
+    def run(self):
+        progress = ProgressCounter(self.total, self.on_progress)
+
+        def write_chunk(index):
+            data = self.image.decompress(self.image.chunks[index])
+            written = 0
+            for start, length, path, file_offset in self.pieces[index]:
+                fd = os.open(path, os.O_WRONLY)
+                try:
+                    os.pwrite(fd, data[start:start + length], file_offset)
+                finally:
+                    os.close(fd)
+                written += length
+            progress.add(written)
+
+        # In image order, so the .dmg is read front to back
+        parallel_map(write_chunk, sorted(self.pieces), self.workers)
+        for path, mode, mtime in self.files:
+            os.chmod(path, mode)
+            os.utime(path, (mtime, mtime))
+        # Folders last, after their contents stop changing
+        for path, mode, mtime in reversed(self.dirs):
+            os.chmod(path, mode)
+            os.utime(path, (mtime, mtime))
+
+def extract_app(dmg_path, dest_dir, workers=DECOMPRESS_WORKERS, on_progress=None, paths=None):
+    """Extract the .app at the top of a DMG into dest_dir; returns the new .app's path.
+
+    With paths, only those files (relative to the .app) are written, and
+    only the chunks that hold them are decompressed. on_progress(done_bytes,
+    total_bytes) is called from the worker threads. Anything about the
+    image it can't read, damage included, raises DmgError.
+    """
+    try:
+        return _extract_app(dmg_path, dest_dir, workers, on_progress, paths)
+    except DmgError:
+        raise
+    except DAMAGED_IMAGE_ERRORS as e:
+        raise DmgError(f"Disk image is damaged: {e}")
+
+def _extract_app(dmg_path, dest_dir, workers, on_progress, paths):
+    with UdifImage(dmg_path) as image:
+        volume = HfsVolume(image)
+        apps = [entry for entry in volume.children.get(ROOT_FOLDER_ID, [])
+                if entry.kind == FOLDER_RECORD and entry.name.endswith('.app')]
+        if not apps:
+            raise DmgError("Could not find .app in disk image")
+        app_path = os.path.join(dest_dir, apps[0].name)
+        os.makedirs(dest_dir, exist_ok=True)
+        extraction = Extraction(volume, workers, on_progress, paths)
+        extraction.plan_folder(entry_id(apps[0]), app_path, apps[0])
+        extraction.run()
+        return app_path
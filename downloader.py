@@ -0,0 +1,520 @@
+"""Release asset downloads for the CDDA Mac launcher.
+
+Downloads go to a persistent staging directory instead of a temporary one,
+so an interrupted transfer (network blip, quit, crash) resumes with an HTTP
+Range request on the next attempt instead of starting over. Large assets
+from servers that support ranges are fetched as several segments in
+parallel, each written in place into a preallocated file.
+
+Every download is hashed with SHA-256 while it arrives and checked against
+the size and digest GitHub publishes for the asset before anyone uses it.
+
+Archives can instead be read as a DownloadStream and extracted while they
+arrive; those are checked when the stream ends, before the extracted files
+are used.
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+DOWNLOAD_TIMEOUT = (10, 60)  # Read timeout is per chunk, not for the whole file
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DEFAULT_CONNECTIONS = 4
+MAX_CONNECTIONS = 8  # Also the per-host pool size of the launcher session
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024  # Smaller files aren't worth splitting
+META_SAVE_INTERVAL = 1.0  # Seconds between segment progress checkpoints
+STALE_PARTIAL_DAYS = 7  # Partial downloads untouched this long are deleted
+THROTTLE_BURST = 0.25  # Seconds of unused bandwidth a throttled download may catch up on
+STREAM_QUEUE_CHUNKS = 256  # Chunks a DownloadStream buffers ahead of its reader (16 MiB)
+
+class DownloadError(Exception):
+    pass
+
+class AssetChanged(DownloadError):
+    """The server no longer has the file a partial download was started from."""
+
+class IntegrityError(DownloadError):
+    """The finished file does not match the size or digest published for it."""
+
+def parse_content_range_total(value):
+    match = re.match(r'bytes \d+-\d+/(\d+)', value or "")
+    return int(match.group(1)) if match else None
+
+def split_segments(total, connections):
+    """Split [0, total) into at most `connections` [start, end, done] segments."""
+    count = max(1, min(connections, total // MIN_SEGMENT_SIZE))
+    size = -(-total // count)  # Ceiling division
+    return [[start, min(start + size, total), 0] for start in range(0, total, size)]
+
+def contiguous_end(segments):
+    """End of the prefix of the file that every segment has written so far."""
+    end = 0
+    for start, segment_end, done in segments:
+        end = start + done
+        if end < segment_end:
+            break
+    return end
+
+class PrefixHasher:
+    """SHA-256 of a file that may be written out of order.
+
+    Chunks that continue the hashed prefix are hashed straight from memory.
+    Bytes that arrived ahead of it (a later segment, or a partial file from
+    an earlier attempt) are read back with pread once the prefix reaches
+    them, while they are still in the page cache.
+    """
+
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def update(self, data, offset):
+        """Hash data written at offset if it continues the prefix; returns whether it did."""
+        with self.lock:
+            return self._update(data, offset)
+
+    def feed(self, fd, data, offset, end):
+        """Like update(), then read back whatever else of [0, end) is already on disk."""
+        with self.lock:
+            self._update(data, offset)
+            self._read_to(fd, end)
+
+    def _update(self, data, offset):
+        # Callers hold self.lock
+        if offset != self.offset:
+            return False
+        self.sha256.update(data)
+        self.offset += len(data)
+        return True
+
+    def catch_up(self, path, end):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            with self.lock:
+                self._read_to(fd, end)
+        finally:
+            os.close(fd)
+
+    def _read_to(self, fd, end):
+        # Callers hold self.lock
+        while self.offset < end:
+            data = os.pread(fd, min(DOWNLOAD_CHUNK_SIZE, end - self.offset), self.offset)
+            if not data:
+                break
+            self.sha256.update(data)
+            self.offset += len(data)
+
+    def hexdigest(self):
+        with self.lock:
+            return self.sha256.hexdigest()
+
+class Throttle:
+    """Thread-safe byte-rate limit shared by every connection of every download.
+
+    Each chunk books its transfer time on a virtual clock; a reader that gets
+    ahead of the clock sleeps, which in turn lets the TCP window shrink and
+    slows the sender. A rate of 0 means unlimited.
+    """
+
+    def __init__(self, bytes_per_second=0):
+        self.bytes_per_second = bytes_per_second
+        self.lock = threading.Lock()
+        self.clock = time.monotonic() - THROTTLE_BURST
+
+    def consume(self, size):
+        if self.bytes_per_second <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.clock = max(self.clock, now - THROTTLE_BURST) + size / self.bytes_per_second
+            delay = self.clock - now
+        if delay > 0:
+            time.sleep(delay)
+
+class DownloadStream:
+    """A download read like a file, so an archive can be extracted as it arrives.
+
+    A thread pulls the response into a bounded queue, hashing it, reporting
+    progress and, with tee_path, writing a copy; the network keeps
+    receiving while the reader decompresses and writes files. Nothing is
+    resumable: a failed stream is simply started again. Call finish()
+    after extracting to read the rest and check the size and digest.
+    """
+
+    def __init__(self, response, throttle, on_progress=None, tee_path=None):
+        self.response = response
+        self.throttle = throttle
+        self.on_progress = on_progress or (lambda downloaded, total: None)
+        self.total = int(response.headers.get('content-length', 0))
+        self.downloaded = 0
+        self.sha256 = hashlib.sha256()
+        self.tee = open(tee_path, 'wb') if tee_path else None
+        self.queue = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        self.buffer = b''
+        self.offset = 0
+        self.eof = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.pump, daemon=True)
+        self.thread.start()
+
+    def pump(self):
+        try:
+            for data in self.response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                if self.closed.is_set():
+                    return
+                self.throttle.consume(len(data))
+                self.sha256.update(data)
+                if self.tee is not None:
+                    self.tee.write(data)
+                self.downloaded += len(data)
+                self.on_progress(self.downloaded, self.total)
+                self.put(data)
+            self.put(None)
+        except BaseException as e:
+            self.put(e)
+
+    def put(self, item):
+        # Give up once the reader has gone away instead of blocking on a full queue
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read(self, size=-1):
+        while not self.eof and (size < 0 or len(self.buffer) - self.offset < size):
+            item = self.queue.get()
+            if item is None:
+                self.eof = True
+            elif isinstance(item, BaseException):
+                raise item
+            else:
+                self.buffer = self.buffer[self.offset:] + item
+                self.offset = 0
+        # Small reads move an offset instead of copying what is left of the buffer
+        end = len(self.buffer) if size < 0 else min(len(self.buffer), self.offset + size)
+        data = self.buffer[self.offset:end]
+        self.offset = end
+        return data
+
+    def finish(self, size=None, sha256=None):
+        """Read to the end and check against the published size and digest; returns the SHA-256."""
+        while self.read(DOWNLOAD_CHUNK_SIZE):
+            pass
+        self.thread.join()
+        if self.tee is not None:
+            self.tee.close()
+        digest = self.sha256.hexdigest()
+        if self.total and self.downloaded != self.total:
+            raise DownloadError(f"Download incomplete: got {self.downloaded} of {self.total} bytes")
+        if size and self.downloaded != size:
+            raise IntegrityError(f"Downloaded file is corrupt (expected {size} bytes, got {self.downloaded})")
+        if sha256 and digest != sha256.lower():
+            raise IntegrityError(f"Downloaded file is corrupt (SHA-256 {digest} does not match the published {sha256})")
+        return digest
+
+    def close(self):
+        self.closed.set()
+        self.response.close()
+        self.thread.join()
+        if self.tee is not None:
+            self.tee.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Downloader:
+    """Downloads URLs into staging_dir, keeping <name>.part files between attempts.
+
+    Each partial file has a <name>.part.json sidecar with the URL, expected
+    size, the ETag/Last-Modified validators of the first response and, for
+    segmented downloads, how far each segment got. A resume sends Range plus
+    If-Range, so the server only continues the partial file if the asset is
+    still the same; otherwise the download restarts from zero.
+    """
+
+    def __init__(self, staging_dir, get_session, connections=DEFAULT_CONNECTIONS, throttle=None):
+        self.staging_dir = staging_dir
+        self.get_session = get_session  # Called per download so the session can be created lazily
+        self.connections = max(1, min(int(connections), MAX_CONNECTIONS))
+        self.throttle = throttle or Throttle()
+
+    def paths(self, url):
+        name = os.path.basename(urlparse(url).path) or "download"
+        final_path = os.path.join(self.staging_dir, name)
+        return final_path, final_path + ".part", final_path + ".part.json"
+
+    def load_meta(self, meta_path, url):
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('url') == url:
+                return meta
+        except (json.JSONDecodeError, IOError):
+            pass
+        return None
+
+    def save_meta(self, meta_path, meta):
+        temp_file = meta_path + ".tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(meta, f)
+        os.replace(temp_file, meta_path)
+
+    def validator(self, meta):
+        # Weak ETags can't be used with If-Range; fall back to Last-Modified
+        etag = meta.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return meta.get('last_modified')
+
+    def new_meta(self, url, response, size):
+        return {
+            'url': url,
+            'size': size,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+    def download(self, url, on_progress=None, size=None, sha256=None):
+        """Download url (resuming if possible) and return (path, sha256) of the complete file.
+
+        size and sha256 are what the release lists for the asset, if known.
+        A file that doesn't match them is deleted and fetched once more from
+        scratch before IntegrityError is raised. on_progress(downloaded, total)
+        may be called from several threads when the download is segmented.
+        """
+        on_progress = on_progress or (lambda downloaded, total: None)
+        for attempt in range(2):
+            path, digest = self.fetch(url, on_progress)
+            actual_size = os.path.getsize(path)
+            if size and actual_size != size:
+                problem = f"expected {size} bytes, got {actual_size}"
+            elif sha256 and digest != sha256.lower():
+                problem = f"SHA-256 {digest} does not match the published {sha256}"
+            else:
+                return path, digest
+            self.discard(path)
+        raise IntegrityError(f"Downloaded file is corrupt ({problem})")
+
+    def open_stream(self, url, on_progress=None, tee_path=None):
+        """Start downloading url and return a DownloadStream to read it from."""
+        response = self.get_session().get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        try:
+            response.raise_for_status()
+        except BaseException:
+            response.close()
+            raise
+        if tee_path:
+            os.makedirs(os.path.dirname(tee_path), exist_ok=True)
+        return DownloadStream(response, self.throttle, on_progress, tee_path)
+
+    def fetch(self, url, on_progress):
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.prune_stale()
+        final_path, part_path, meta_path = self.paths(url)
+
+        meta = self.load_meta(meta_path, url)
+        if meta is not None and not os.path.exists(part_path):
+            meta = None
+        if meta is not None and meta.get('segments'):
+            try:
+                hasher = self.fetch_segments(url, part_path, meta_path, meta, on_progress)
+                return self.complete(final_path, part_path, meta_path, hasher)
+            except AssetChanged:
+                self.discard(final_path)
+                meta = None
+
+        if meta is not None:
+            return self.resume_stream(url, final_path, part_path, meta_path, meta, on_progress)
+
+        session = self.get_session()
+        if self.connections > 1:
+            # Ask for one byte: a 206 tells us the size and that ranges work
+            response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=DOWNLOAD_TIMEOUT)
+            total = parse_content_range_total(response.headers.get('Content-Range'))
+            if response.status_code == 206 and total and total >= 2 * MIN_SEGMENT_SIZE:
+                response.close()
+                meta = self.new_meta(url, response, total)
+                if self.validator(meta):
+                    meta['segments'] = split_segments(total, self.connections)
+                    with open(part_path, 'wb') as f:
+                        f.truncate(total)  # Preallocate so segments can be written in place
+                    self.save_meta(meta_path, meta)
+                    hasher = self.fetch_segments(url, part_path, meta_path, meta, on_progress)
+                    return self.complete(final_path, part_path, meta_path, hasher)
+            elif response.status_code == 200:
+                # No range support: the probe is already streaming the whole file
+                response.raise_for_status()
+                return self.fresh_stream(url, response, final_path, part_path, meta_path, on_progress)
+            else:
+                response.close()
+
+        response = session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        return self.fresh_stream(url, response, final_path, part_path, meta_path, on_progress)
+
+    def fresh_stream(self, url, response, final_path, part_path, meta_path, on_progress):
+        hasher = PrefixHasher()
+        try:
+            response.raise_for_status()
+            total = int(response.headers.get('content-length', 0))
+            self.save_meta(meta_path, self.new_meta(url, response, total))
+            self.stream_to_file(response, part_path, 'wb', 0, total, on_progress, hasher)
+        finally:
+            response.close()
+        return self.complete(final_path, part_path, meta_path, hasher)
+
+    def resume_stream(self, url, final_path, part_path, meta_path, meta, on_progress):
+        existing = os.path.getsize(part_path)
+        if meta.get('size') and existing == meta['size']:
+            # Finished last time but never handed over
+            return self.complete(final_path, part_path, meta_path, PrefixHasher())
+
+        validator = self.validator(meta)
+        headers = {'Range': f"bytes={existing}-", 'If-Range': validator} if existing and validator else {}
+        response = self.get_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+        if response.status_code == 416:
+            # Our partial is not a prefix of the current file; start over
+            response.close()
+            self.discard(final_path)
+            return self.fetch(url, on_progress)
+        if headers and response.status_code == 206:
+            hasher = PrefixHasher()
+            try:
+                hasher.catch_up(part_path, existing)  # The hash state of the earlier attempt is gone
+                self.stream_to_file(response, part_path, 'ab', existing, meta.get('size') or 0, on_progress, hasher)
+            finally:
+                response.close()
+            return self.complete(final_path, part_path, meta_path, hasher)
+        # If-Range failed because the asset changed: the server sent the whole file
+        return self.fresh_stream(url, response, final_path, part_path, meta_path, on_progress)
+
+    def stream_to_file(self, response, part_path, mode, downloaded, total, on_progress, hasher):
+        with open(part_path, mode) as f:
+            for data in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                self.throttle.consume(len(data))
+                f.write(data)
+                hasher.update(data, downloaded)
+                downloaded += len(data)
+                on_progress(downloaded, total)
+
+    def fetch_segments(self, url, part_path, meta_path, meta, on_progress):
+        """Fetch every unfinished segment in parallel, writing at its offset with pwrite.
+
+        Returns a PrefixHasher that has hashed as much of the file as is contiguous.
+        """
+        segments = meta['segments']
+        total = meta['size']
+        validator = self.validator(meta)
+        if any(done for _, _, done in segments) and not validator:
+            raise AssetChanged("Cannot verify the partial download is still current")
+        session = self.get_session()
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+        hasher = PrefixHasher()
+        state = {'downloaded': sum(done for _, _, done in segments), 'saved_at': time.monotonic()}
+
+        def checkpoint(force=False):
+            # Callers hold lock
+            now = time.monotonic()
+            if force or now - state['saved_at'] >= META_SAVE_INTERVAL:
+                self.save_meta(meta_path, meta)
+                state['saved_at'] = now
+
+        def fetch(segment):
+            start, end, done = segment
+            headers = {'Range': f"bytes={start + done}-{end - 1}"}
+            if validator:
+                headers['If-Range'] = validator
+            response = session.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT)
+            try:
+                if response.status_code != 206:
+                    response.raise_for_status()
+                    raise AssetChanged("The file changed on the server during the download")
+                offset = start + done
+                for data in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    if stop.is_set():
+                        return
+                    data = data[:end - offset]  # Never write past the segment
+                    self.throttle.consume(len(data))
+                    os.pwrite(fd, data, offset)
+                    with lock:
+                        segment[2] = offset + len(data) - start
+                        state['downloaded'] += len(data)
+                        downloaded = state['downloaded']
+                        written = contiguous_end(segments)
+                        checkpoint()
+                    hasher.feed(fd, data, offset, written)
+                    offset += len(data)
+                    on_progress(downloaded, total)
+                    if offset >= end:
+                        break
+            finally:
+                response.close()
+
+        def worker(segment):
+            try:
+                fetch(segment)
+            except Exception as e:
+                errors.append(e)
+                stop.set()  # Let the other segments stop early; progress is checkpointed
+
+        fd = os.open(part_path, os.O_RDWR)
+        try:
+            threads = [threading.Thread(target=worker, args=(segment,), daemon=True)
+                       for segment in segments if segment[0] + segment[2] < segment[1]]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            os.close(fd)
+            with lock:
+                checkpoint(force=True)
+
+        if errors:
+            changed = [e for e in errors if isinstance(e, AssetChanged)]
+            raise changed[0] if changed else errors[0]
+        if any(start + done < end for start, end, done in segments):
+            raise DownloadError("Download incomplete, it will resume on the next attempt")
+        return hasher
+
+    def complete(self, final_path, part_path, meta_path, hasher):
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+        size = os.path.getsize(part_path)
+        if meta.get('size') and size != meta['size']:
+            raise DownloadError(f"Download incomplete: got {size} of {meta['size']} bytes, "
+                                f"it will resume on the next attempt")
+        hasher.catch_up(part_path, size)  # No-op unless bytes arrived out of order
+        os.replace(part_path, final_path)
+        os.remove(meta_path)
+        return final_path, hasher.hexdigest()
+
+    def discard(self, path):
+        """Remove a downloaded file and any partial state for it."""
+        for candidate in (path, path + ".part", path + ".part.json"):
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+
+    def prune_stale(self, max_age_days=STALE_PARTIAL_DAYS):
+        cutoff = time.time() - max_age_days * 86400
+        try:
+            entries = list(os.scandir(self.staging_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.endswith(".part") and entry.stat().st_mtime < cutoff:
+                self.discard(entry.path[:-len(".part")])
@@ -0,0 +1,1539 @@
+"""Release discovery, download, install and launch logic for the CDDA Mac launcher.
+
+Nothing in this module imports customtkinter or Tk, so cdda_cli can check
+for updates and install builds from cron or a login hook without paying
+for the GUI stack.
+"""
+import json
+import codecs
+import functools
+import os
+import platform
+import shutil
+import sys
+from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import subprocess
+import re
+from urllib.parse import urlparse
+import time
+import random
+
+import app_installer
+import archive_stream
+import dmg_reader
+from artifact_cache import ArtifactCache, DEFAULT_CACHE_MB, parse_digest
+from downloader import Downloader, Throttle, DEFAULT_CONNECTIONS, MAX_CONNECTIONS
+from save_snapshots import SnapshotError, SnapshotStore, DEFAULT_KEEP_DAYS, DEFAULT_KEEP_LAST
+
+DEFAULT_BASE_PATH = "~/Library/Application Support/Cataclysm"
+VERSION_TYPES = ("experimental", "stable", "bn")
+
+CDDA_RELEASES_URL = "https://api.github.com/repos/CleverRaven/Cataclysm-DDA/releases"
+CDDA_LATEST_URL = "https://api.github.com/repos/CleverRaven/Cataclysm-DDA/releases/latest"
+BN_RELEASES_URL = "https://api.github.com/repos/cataclysmbnteam/Cataclysm-BN/releases"
+INDEX_PAGE_SIZE = 100  # GitHub maximum per_page
+MAX_INDEX_PAGES = 10  # Only reached while seeding an empty index
+API_TIMEOUT = (5, 15)  # (connect, read) seconds per API request
+MAX_API_WORKERS = 4
+STREAM_CHUNK_SIZE = 16 * 1024
+JSON_NUMBER_CHARS = frozenset('0123456789+-.eE')
+RATE_LIMIT_RESERVE = 10  # Background refreshes leave this many requests for the user
+MAC_ASSET_SUFFIXES = ('.tar.gz', '.tgz', '.zip', '.dmg')  # Archives first: they install while downloading
+# Spellings of architectures and variants in release asset names
+ARCH_ALIASES = {
+    'arm64': 'arm64', 'arm': 'arm64', 'aarch64': 'arm64', 'silicon': 'arm64',
+    'x86_64': 'x86_64', 'x64': 'x86_64', 'amd64': 'x86_64', 'intel': 'x86_64',
+    'universal': 'universal',
+}
+VARIANT_ALIASES = {'tiles': 'tiles', 'graphics': 'tiles', 'curses': 'curses', 'terminal': 'curses'}
+DEFAULT_CONFIG = {
+    'refresh_interval_minutes': 60,  # 0 disables background refreshes
+    'github_token': None,  # Optional personal access token for the 5000/hour limit
+    'download_connections': DEFAULT_CONNECTIONS,  # Parallel range requests per download, 1 to 8
+    'artifact_cache_mb': DEFAULT_CACHE_MB,  # Downloaded builds kept for reinstalls, 0 disables
+    'max_concurrent_installs': 1,  # Queued installs that may run at the same time
+    'download_limit_mbps': 0,  # Total download bandwidth in megabits per second, 0 is unlimited
+    'keep_builds': app_installer.DEFAULT_KEEP_BUILDS,  # Installed builds kept per channel for rollback
+    'save_snapshots': True,  # Back up saves before every install and launch
+    'snapshot_keep_last': DEFAULT_KEEP_LAST,  # Newest save snapshots kept per channel
+    'snapshot_keep_days': DEFAULT_KEEP_DAYS,  # Plus the newest snapshot of each of this many days
+    'snapshot_compression': 'zlib',  # 'zlib' (fast) or 'lzma' (smaller)
+    'build_architectures': 'auto',  # Preferred first, e.g. ["arm64", "universal"]; 'auto' ranks for this Mac
+    'build_variant': 'tiles',  # 'tiles' or 'curses' (terminal only)
+    'build_formats': list(MAC_ASSET_SUFFIXES),  # Preferred first; [".dmg"] never streams
+}
+
+class RateLimitError(Exception):
+    pass
+
+def create_session(pool_size=max(MAX_API_WORKERS, MAX_CONNECTIONS)):
+    """Return a keep-alive session shared by all launcher HTTP traffic."""
+    # Imported here: requests is most of this module's import time and
+    # offline commands (status, launch, notes) never touch the network
+    import requests
+    import requests.adapters
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["User-Agent"] = "cdda-mac-launcher"
+    return session
+
+class GitHubCache:
+    """Persistent conditional-request cache for GitHub API responses.
+
+    Stores the ETag/Last-Modified validators and decoded JSON for each URL so
+    later requests can send If-None-Match/If-Modified-Since. A 304 reply has no
+    body and does not count against the unauthenticated rate limit.
+    """
+
+    def __init__(self, cache_file, session=None, token=None):
+        self.cache_file = cache_file
+        self._session = session
+        self.token = token
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.rate_limit_remaining = None
+        self.blocked_until = 0  # Epoch seconds before which no request is sent
+        self.load()
+
+    @property
+    def session(self):
+        # Created on first request so offline use never imports requests
+        with self.lock:
+            if self._session is None:
+                self._session = create_session()
+            return self._session
+
+    def load(self):
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as f:
+                    entries = json.load(f)
+                if isinstance(entries, dict):
+                    self.entries = entries
+            except (json.JSONDecodeError, IOError):
+                pass  # A broken cache only costs one full download per endpoint
+
+    def save(self):
+        # Write to a temp file and rename so a crash never leaves half a cache
+        temp_file = self.cache_file + ".tmp"
+        try:
+            with self.lock:
+                with open(temp_file, 'w') as f:
+                    json.dump(self.entries, f)
+                os.replace(temp_file, self.cache_file)
+        except IOError:
+            pass
+
+    def conditional_headers(self, url, conditional=True):
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.token:
+            # Only API requests carry the token, never asset downloads
+            headers["Authorization"] = f"Bearer {self.token}"
+        entry = self.entries.get(url)
+        if entry and conditional:
+            if entry.get('etag'):
+                headers["If-None-Match"] = entry['etag']
+            if entry.get('last_modified'):
+                headers["If-Modified-Since"] = entry['last_modified']
+        return headers
+
+    def request(self, url, conditional=True, **kwargs):
+        """GET url unless GitHub told us to back off, recording the rate-limit headers."""
+        if time.time() < self.blocked_until:
+            raise RateLimitError(f"GitHub rate limit reached, retrying after "
+                                 f"{datetime.fromtimestamp(self.blocked_until).strftime('%H:%M')}")
+        response = self.session.get(url, headers=self.conditional_headers(url, conditional), **kwargs)
+        self.note_rate_limit(response)
+        if response.status_code in (403, 429) and time.time() < self.blocked_until:
+            response.close()
+            raise RateLimitError(f"GitHub rate limit reached, retrying after "
+                                 f"{datetime.fromtimestamp(self.blocked_until).strftime('%H:%M')}")
+        return response
+
+    def note_rate_limit(self, response):
+        headers = response.headers
+        try:
+            if headers.get('X-RateLimit-Remaining') is not None:
+                self.rate_limit_remaining = int(headers['X-RateLimit-Remaining'])
+                if self.rate_limit_remaining == 0 and headers.get('X-RateLimit-Reset'):
+                    self.blocked_until = max(self.blocked_until, int(headers['X-RateLimit-Reset']))
+            if response.status_code in (403, 429) and headers.get('Retry-After'):
+                # Secondary rate limits only send Retry-After
+                self.blocked_until = max(self.blocked_until, time.time() + int(headers['Retry-After']))
+        except (TypeError, ValueError):
+            pass  # Malformed headers; carry on without backing off
+
+    def can_refresh_in_background(self):
+        if time.time() < self.blocked_until:
+            return False
+        return self.rate_limit_remaining is None or self.rate_limit_remaining > RATE_LIMIT_RESERVE
+
+    def store_validators(self, url, response, data=None):
+        with self.lock:
+            self.entries[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+            if data is not None:
+                self.entries[url]['data'] = data
+        self.save()
+
+    def get_json(self, url, timeout=API_TIMEOUT, trim=None):
+        """GET a JSON document, answering from the cache on 304.
+
+        trim(data) picks what is kept in the cache; the caller still gets the
+        full document on a 200, and only the trimmed copy on a 304.
+        """
+        response = self.request(url, timeout=timeout)
+        entry = self.entries.get(url)
+        if response.status_code == 304 and entry is not None and 'data' in entry:
+            return entry['data']
+
+        response.raise_for_status()
+        data = json.loads(response.text)
+        self.store_validators(url, response, trim(data) if trim else data)
+        return data
+
+    def stream_json_array(self, url, timeout=API_TIMEOUT, conditional=True):
+        """Return a generator over a JSON array response, or None if it is unchanged.
+
+        Elements are decoded as they arrive, so a caller that stops early never
+        downloads the rest of the page. Only validators are cached; callers
+        (like ReleaseIndex) keep their own copy of the data. They are stored
+        once the page has been read to the end or the caller closes the
+        generator, never when reading the body fails, so a 304 can't vouch
+        for a page that was only partly indexed.
+        """
+        response = self.request(url, conditional, timeout=timeout, stream=True)
+        if response.status_code == 304 and url in self.entries:
+            response.close()
+            return None
+
+        try:
+            response.raise_for_status()
+        except Exception:
+            response.close()
+            raise
+        return self._iter_response(url, response)
+
+    def _iter_response(self, url, response):
+        try:
+            yield from iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+        except GeneratorExit:
+            # The caller stopped early on purpose and has what it needed from this page
+            self.store_validators(url, response)
+            raise
+        else:
+            self.store_validators(url, response)
+        finally:
+            # Closing instead of draining drops the rest of the body on early exit
+            response.close()
+
+def iter_json_array(chunks):
+    """Incrementally decode a top-level JSON array from byte chunks, yielding each element."""
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    chunks = iter(chunks)
+    buffer = ""
+    pos = 0
+    started = False
+    exhausted = False
+    while True:
+        # Skip whitespace and separators between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # A number cut off by the buffer edge ("1." or "4.5e") decodes as a shorter one;
+                # it is only complete once something that can't continue it follows
+                if exhausted or (end < len(buffer) and buffer[end] not in JSON_NUMBER_CHARS):
+                    yield value
+                    # Drop consumed text so the buffer holds about one element
+                    buffer = buffer[end:]
+                    pos = 0
+                    continue
+        if exhausted:
+            raise ValueError("Truncated JSON array")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b"", final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+def run_concurrently(tasks, max_workers=MAX_API_WORKERS):
+    """Run {name: callable} on a bounded pool, returning ({name: result}, {name: error})."""
+    results = {}
+    errors = {}
+    if not tasks:
+        return results, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as pool:
+        futures = {pool.submit(task): name for name, task in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    return results, errors
+
+class Asset:
+    """A downloadable file attached to a release."""
+    __slots__ = ('name', 'url', 'size', 'digest')
+
+    def __init__(self, name, url, size=0, digest=None):
+        self.name = name
+        self.url = url
+        self.size = size
+        self.digest = digest
+
+    @classmethod
+    def from_github(cls, asset):
+        return cls(asset['name'], asset['browser_download_url'], asset.get('size', 0), asset.get('digest'))
+
+    def to_list(self):
+        return [self.name, self.url, self.size, self.digest]
+
+class Release:
+    """The fields of a GitHub release the launcher uses. Bodies live in NotesStore."""
+    __slots__ = ('tag', 'published_at', 'prerelease', 'assets')
+
+    def __init__(self, tag, published_at="", prerelease=False, assets=()):
+        self.tag = tag
+        self.published_at = published_at
+        self.prerelease = prerelease
+        self.assets = tuple(assets)
+
+    @classmethod
+    def from_github(cls, release):
+        return cls(release['tag_name'],
+                   release.get('published_at') or release.get('created_at') or "",
+                   release.get('prerelease', False),
+                   [Asset.from_github(asset) for asset in release.get('assets', [])])
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['tag'], data.get('published_at', ""), data.get('prerelease', False),
+                   [Asset(*asset) for asset in data.get('assets', [])])
+
+    def to_dict(self):
+        return {
+            'tag': self.tag,
+            'published_at': self.published_at,
+            'prerelease': self.prerelease,
+            'assets': [asset.to_list() for asset in self.assets],
+        }
+
+def release_fields(data):
+    """The parts of a GitHub release object Release.from_github reads; the body is left out."""
+    fields = {key: data[key] for key in ('tag_name', 'published_at', 'created_at', 'prerelease', 'draft')
+              if key in data}
+    fields['assets'] = [{key: asset[key] for key in ('name', 'browser_download_url', 'size', 'digest')
+                         if key in asset}
+                        for asset in data.get('assets', [])]
+    return fields
+
+class NotesStore:
+    """On-disk patch-note bodies, one file per release, read only when displayed."""
+
+    def __init__(self, notes_dir):
+        self.notes_dir = notes_dir
+
+    def path(self, repo_url, tag):
+        repo_name = "_".join(urlparse(repo_url).path.strip("/").split("/")[1:3])
+        safe_tag = re.sub(r'[^A-Za-z0-9._-]', '_', tag)
+        return os.path.join(self.notes_dir, repo_name, safe_tag + ".md")
+
+    def put(self, repo_url, tag, body):
+        path = self.path(repo_url, tag)
+        data = (body or "").encode('utf-8')
+        try:
+            # Most pages repeat bodies we already stored; skip rewriting those
+            if os.path.exists(path) and os.path.getsize(path) == len(data):
+                with open(path, 'rb') as f:
+                    if f.read() == data:
+                        return
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        except IOError:
+            pass
+
+    def get(self, repo_url, tag):
+        if not tag:
+            return ""
+        try:
+            with open(self.path(repo_url, tag), 'r', encoding='utf-8') as f:
+                return f.read() or "No patch notes available"
+        except IOError:
+            return "No patch notes available"
+
+@functools.lru_cache(maxsize=None)
+def host_architectures():
+    """Architectures this Mac can run, thinnest first."""
+    machine = platform.machine().lower()
+    if machine == 'x86_64' and sys.platform == 'darwin':
+        # An x86_64 Python on Apple silicon runs under Rosetta and reports x86_64
+        try:
+            translated = subprocess.run(["sysctl", "-n", "sysctl.proc_translated"],
+                                        capture_output=True, text=True).stdout.strip()
+        except OSError:
+            translated = ""
+        if translated == "1":
+            machine = 'arm64'
+    if ARCH_ALIASES.get(machine) == 'arm64':
+        return ('arm64', 'universal', 'x86_64')  # x86_64 builds still run under Rosetta
+    return ('x86_64', 'universal')
+
+class AssetPreference:
+    """Which Mac builds of a release are acceptable, each list preferred first."""
+    __slots__ = ('architectures', 'variant', 'formats')
+
+    def __init__(self, architectures=None, variant='tiles', formats=MAC_ASSET_SUFFIXES):
+        self.architectures = tuple(architectures or host_architectures())
+        self.variant = variant
+        self.formats = tuple(formats)
+
+    @classmethod
+    def from_config(cls, config):
+        architectures = config.get('build_architectures')
+        formats = config.get('build_formats')
+        return cls([ARCH_ALIASES.get(str(arch).lower(), arch) for arch in architectures]
+                   if isinstance(architectures, list) else None,
+                   VARIANT_ALIASES.get(str(config.get('build_variant')).lower(), 'tiles'),
+                   formats if isinstance(formats, list) and formats else MAC_ASSET_SUFFIXES)
+
+    def rank(self, asset):
+        """Sort key for an acceptable Mac build (lower is better), or None."""
+        described = describe_mac_asset(asset.name)
+        if described is None:
+            return None
+        arch, variant, suffix = described
+        if arch not in self.architectures or variant != self.variant or suffix not in self.formats:
+            return None
+        # Thinnest architecture, then format, then the smallest download; unknown sizes last
+        return (self.architectures.index(arch), self.formats.index(suffix), asset.size or float('inf'))
+
+    @property
+    def key(self):
+        """A string that changes whenever the set of acceptable builds does."""
+        return '/'.join((','.join(self.architectures), self.variant, ','.join(self.formats)))
+
+def describe_mac_asset(name):
+    """(architecture, variant, format) of a Mac build's file name, or None for other assets."""
+    name = name.lower()
+    tokens = re.split(r'[-.\s]+', name)
+    if 'osx' not in tokens and 'macos' not in tokens:
+        return None
+    suffix = next((suffix for suffix in MAC_ASSET_SUFFIXES if name.endswith(suffix)), None)
+    variant = next((VARIANT_ALIASES[token] for token in tokens if token in VARIANT_ALIASES), None)
+    if suffix is None or variant is None:
+        return None
+    # Builds that name no architecture predate Apple silicon
+    arch = next((ARCH_ALIASES[token] for token in tokens if token in ARCH_ALIASES), 'x86_64')
+    return arch, variant, suffix
+
+@functools.lru_cache(maxsize=None)
+def default_asset_preference():
+    return AssetPreference()
+
+def find_mac_asset(release, preference=None):
+    """The release's best Mac build under preference (by default, the best this Mac runs), or None."""
+    preference = preference or default_asset_preference()
+    best, best_rank = None, None
+    for asset in release.assets:
+        rank = preference.rank(asset)
+        if rank is not None and (best_rank is None or rank < best_rank):
+            best, best_rank = asset, rank
+    return best
+
+def is_experimental(release):
+    return "experimental" in release.tag.lower()
+
+def index_pointers(preference=None):
+    """Pointers kept up to date by ReleaseIndex so channel lookups never rescan.
+
+    experimental_mac only counts releases with a build acceptable under
+    preference, the same one the download is then picked with.
+    """
+    return {
+        CDDA_RELEASES_URL: {
+            'experimental': is_experimental,
+            'experimental_mac': lambda release: (is_experimental(release)
+                                                 and find_mac_asset(release, preference) is not None),
+        },
+        BN_RELEASES_URL: {
+            'latest': lambda release: True,
+        },
+    }
+
+INDEX_POINTERS = index_pointers()
+
+class RefreshScheduler:
+    """Runs a refresh callable in the background and on demand, one at a time.
+
+    Requests made while a refresh is in flight are coalesced into it. Periodic
+    refreshes are jittered so launchers behind one NAT spread out, and are
+    skipped while GitHub asks us to back off or few requests are left.
+    """
+
+    def __init__(self, refresh, interval, cache=None):
+        self.refresh = refresh
+        self.interval = interval  # Seconds; 0 disables periodic refreshes
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.running = False
+        self.stop_event = threading.Event()
+        self.timer_thread = None
+
+    def request(self):
+        """Start a refresh unless one is already running; returns True if started."""
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+        thread = threading.Thread(target=self._run, daemon=True)
+        thread.start()
+        return True
+
+    def _run(self):
+        try:
+            self.refresh()
+        finally:
+            with self.lock:
+                self.running = False
+
+    def next_delay(self):
+        delay = self.interval * random.uniform(0.9, 1.1)
+        if self.cache is not None:
+            delay = max(delay, self.cache.blocked_until - time.time())
+        return delay
+
+    def start(self):
+        if self.interval <= 0 or self.timer_thread is not None:
+            return
+        def loop():
+            while not self.stop_event.wait(self.next_delay()):
+                if self.cache is None or self.cache.can_refresh_in_background():
+                    self.request()
+        self.timer_thread = threading.Thread(target=loop, daemon=True)
+        self.timer_thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+class ReleaseIndex:
+    """Persistent tag -> Release index for each GitHub repository.
+
+    Seeding walks /releases page by page until every pointer for the repo
+    resolves (at most MAX_INDEX_PAGES), or until the pages run out, which is
+    remembered until rules_key changes. Later updates fetch page 1, usually a
+    304, and stop at the first release that is already indexed unchanged.
+    Pages are streamed, so stopping early also stops the download.
+    """
+
+    def __init__(self, index_file, notes=None, pointer_rules=None, rules_key=''):
+        self.index_file = index_file
+        self.notes = notes if notes is not None else NotesStore(os.path.join(os.path.dirname(index_file), "patch_notes"))
+        self.pointer_rules = INDEX_POINTERS if pointer_rules is None else pointer_rules
+        self.rules_key = rules_key  # Identifies pointer_rules, e.g. the build preference they were made from
+        self.repos = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r') as f:
+                    repos = json.load(f)
+                for repo_url, repo in repos.items():
+                    repo['releases'] = {tag: Release.from_dict(data) for tag, data in repo['releases'].items()}
+                self.repos = repos
+            except (json.JSONDecodeError, IOError, KeyError, TypeError, AttributeError):
+                self.repos = {}  # Rebuilt from GitHub on the next update
+        # The rules may have changed since the index was saved (e.g. a different build preference)
+        for repo_url in list(self.repos):
+            self.refresh_pointers(repo_url)
+
+    def save(self):
+        temp_file = self.index_file + ".tmp"
+        try:
+            with self.lock:
+                repos = {
+                    repo_url: {
+                        'releases': {tag: release.to_dict() for tag, release in repo['releases'].items()},
+                        'order': repo['order'],
+                        'pointers': repo['pointers'],
+                        'checked_at': repo.get('checked_at'),
+                        'exhausted': repo.get('exhausted'),
+                    }
+                    for repo_url, repo in self.repos.items()
+                }
+                with open(temp_file, 'w') as f:
+                    json.dump(repos, f)
+                os.replace(temp_file, self.index_file)
+        except IOError:
+            pass
+
+    def _repo(self, repo_url):
+        # Callers must hold self.lock
+        return self.repos.setdefault(repo_url, {'releases': {}, 'order': [], 'pointers': {}})
+
+    def upsert(self, repo_url, releases):
+        """Add or refresh GitHub release objects; returns how many were new or changed."""
+        changed = sum(1 for data in releases if self.upsert_one(repo_url, data))
+        self.reorder(repo_url)
+        return changed
+
+    def upsert_one(self, repo_url, data):
+        """Add or refresh one GitHub release object; returns True if the index changed."""
+        if data.get('draft'):
+            return False
+        release = Release.from_github(data)
+        # Bodies go straight to disk instead of staying in memory with the index, and
+        # are written whenever they differ, since an edited body leaves the index as it was;
+        # cached copies carry no body, so keep whatever notes are already stored
+        if 'body' in data:
+            self.notes.put(repo_url, release.tag, data['body'])
+        with self.lock:
+            repo = self._repo(repo_url)
+            old = repo['releases'].get(release.tag)
+            if old is not None and old.to_dict() == release.to_dict():
+                return False
+            repo['releases'][release.tag] = release
+        return True
+
+    def reorder(self, repo_url):
+        with self.lock:
+            repo = self._repo(repo_url)
+            repo['order'] = sorted(repo['releases'],
+                                   key=lambda tag: repo['releases'][tag].published_at,
+                                   reverse=True)
+
+    def update(self, cache, repo_url, max_pages=MAX_INDEX_PAGES):
+        with self.lock:
+            repo = self._repo(repo_url)
+            # A pointer the indexed releases can't resolve sends the walk back through older
+            # pages, unless a walk under the same rules already ran out of pages looking
+            seeded = bool(repo['releases']) and (
+                repo.get('exhausted') == self.rules_key
+                or all(repo['pointers'].get(name) for name in self.pointer_rules.get(repo_url, {})))
+        caught_up = False
+        for page in range(1, max_pages + 1):
+            url = f"{repo_url}?per_page={INDEX_PAGE_SIZE}&page={page}"
+            releases = cache.stream_json_array(url, conditional=True)
+            if releases is None:
+                if seeded:
+                    break  # Unchanged since last refresh, already indexed
+                # An earlier walk may have stopped partway through this page, or the index was lost
+                releases = cache.stream_json_array(url, conditional=False)
+            count = 0
+            try:
+                for data in releases:
+                    count += 1
+                    changed = self.upsert_one(repo_url, data)
+                    if seeded and not changed:
+                        # Everything older was indexed on an earlier refresh
+                        caught_up = True
+                        break
+                    if not seeded and self.claim_pointers(repo_url, data):
+                        caught_up = True
+                        break
+            finally:
+                releases.close()
+            if caught_up or count < INDEX_PAGE_SIZE:
+                break
+        if not (seeded or caught_up):
+            with self.lock:
+                # Older releases won't start resolving the pointer; stop walking back for it
+                repo['exhausted'] = self.rules_key
+        self.reorder(repo_url)
+        self.refresh_pointers(repo_url)
+        self.mark_checked(repo_url)
+        self.save()
+
+    def mark_checked(self, repo_url):
+        with self.lock:
+            self._repo(repo_url)['checked_at'] = time.time()
+
+    def last_checked(self):
+        """When GitHub was last successfully checked, as a datetime, or None."""
+        times = [repo.get('checked_at') for repo in self.repos.values() if repo.get('checked_at')]
+        return datetime.fromtimestamp(max(times)) if times else None
+
+    def claim_pointers(self, repo_url, data):
+        """While seeding, point unset pointers at the first matching release.
+
+        Pages arrive newest first, so the first match is the latest one.
+        Returns True once every pointer for the repo is resolved.
+        """
+        rules = self.pointer_rules.get(repo_url, {})
+        with self.lock:
+            repo = self._repo(repo_url)
+            release = repo['releases'].get(data['tag_name'])
+            for name, rule in rules.items():
+                if not repo['pointers'].get(name) and release is not None and rule(release):
+                    repo['pointers'][name] = release.tag
+            return all(repo['pointers'].get(name) for name in rules)
+
+    def refresh_pointers(self, repo_url):
+        rules = self.pointer_rules.get(repo_url, {})
+        with self.lock:
+            repo = self._repo(repo_url)
+            for name, rule in rules.items():
+                repo['pointers'][name] = next(
+                    (tag for tag in repo['order'] if rule(repo['releases'][tag])), None)
+
+    def set_pointer(self, repo_url, name, release):
+        """Record a release fetched outside the paged list (e.g. /releases/latest)."""
+        self.upsert(repo_url, [release])
+        with self.lock:
+            self._repo(repo_url)['pointers'][name] = release['tag_name']
+        self.save()
+
+    def find_asset(self, url):
+        """Return the indexed Asset with this download URL, or None."""
+        with self.lock:
+            for repo in self.repos.values():
+                for release in repo['releases'].values():
+                    for asset in release.assets:
+                        if asset.url == url:
+                            return asset
+        return None
+
+    def latest(self, repo_url, name):
+        """Return the Release a pointer refers to, or None."""
+        repo = self.repos.get(repo_url)
+        if not repo:
+            return None
+        tag = repo['pointers'].get(name)
+        return repo['releases'].get(tag) if tag else None
+
+class ProgressSnapshot:
+    """The latest progress state, as drained from a ProgressBus."""
+    __slots__ = ('status', 'downloaded', 'total', 'fraction', 'bytes_per_second', 'eta_seconds')
+
+    def __init__(self, status, downloaded, total, fraction, bytes_per_second, eta_seconds):
+        self.status = status
+        self.downloaded = downloaded
+        self.total = total
+        self.fraction = fraction  # None while the total size is unknown
+        self.bytes_per_second = bytes_per_second
+        self.eta_seconds = eta_seconds
+
+    def describe(self):
+        """Status text with byte counts, throughput and ETA appended while downloading."""
+        if not self.downloaded:
+            return self.status
+        parts = [f"{self.downloaded / 1048576:.1f}"
+                 + (f" of {self.total / 1048576:.1f} MiB" if self.total else " MiB")]
+        if self.bytes_per_second:
+            parts.append(f"{self.bytes_per_second / 1048576:.1f} MiB/s")
+        if self.eta_seconds is not None:
+            minutes, seconds = divmod(int(self.eta_seconds), 60)
+            parts.append(f"{minutes}:{seconds:02d} left")
+        return f"{self.status} {', '.join(parts)}"
+
+class ProgressBus:
+    """Thread-safe mailbox for status and download progress.
+
+    Workers publish as often as they like; each publish just overwrites the
+    latest value. A consumer such as the Tk main loop calls drain() at its
+    own frame rate and gets one coalesced snapshot, or None if nothing has
+    changed since the previous drain.
+    """
+
+    def __init__(self, smoothing=0.3):
+        self.lock = threading.Lock()
+        self.smoothing = smoothing  # EWMA weight of the newest throughput sample
+        self.status = ""
+        self.downloaded = 0
+        self.total = 0
+        self.fraction = 0.0
+        self.version = 0
+        self.drained_version = 0
+        self.rate = None
+        self.rate_sample = None  # (monotonic time, downloaded) at the previous drain
+
+    def publish_status(self, text):
+        with self.lock:
+            self.status = text
+            self.version += 1
+
+    def publish_progress(self, downloaded, total):
+        with self.lock:
+            if downloaded < self.downloaded:
+                self.rate = None  # A new download started
+                self.rate_sample = None
+            self.downloaded = downloaded
+            self.total = total
+            # content-length may be missing, leaving the total unknown
+            self.fraction = min(downloaded / total, 1.0) if total else None
+            self.version += 1
+
+    def set_fraction(self, fraction):
+        """Set the bar directly (e.g. 1 when done, 0 after an error) and clear byte counts."""
+        with self.lock:
+            self.fraction = fraction
+            self.downloaded = 0
+            self.total = 0
+            self.rate = None
+            self.rate_sample = None
+            self.version += 1
+
+    def drain(self):
+        with self.lock:
+            if self.version == self.drained_version:
+                return None
+            self.drained_version = self.version
+            now = time.monotonic()
+            if self.downloaded:
+                if self.rate_sample is not None and now > self.rate_sample[0]:
+                    sample = (self.downloaded - self.rate_sample[1]) / (now - self.rate_sample[0])
+                    self.rate = sample if self.rate is None else \
+                        self.smoothing * sample + (1 - self.smoothing) * self.rate
+                self.rate_sample = (now, self.downloaded)
+            eta = None
+            if self.rate and self.total:
+                eta = max(self.total - self.downloaded, 0) / self.rate
+            return ProgressSnapshot(self.status, self.downloaded, self.total, self.fraction, self.rate, eta)
+
+class ViewDispatcher:
+    """Thread-safe handoff of view state from worker threads to the Tk main loop.
+
+    Any thread may post() fields of the state as immutable values (strings,
+    numbers, tuples); a later value of a field replaces the earlier one. Once
+    per frame the main loop calls drain(), which renders the merged state into
+    widget values and returns only those that differ from what it returned
+    before, so a refresh that changes nothing redraws nothing.
+    """
+
+    def __init__(self, render):
+        self.render = render  # state dict -> {widget key: value}
+        self.lock = threading.Lock()
+        self.state = {}
+        self.version = 0
+        self.drained_version = 0
+        self.shown = {}  # Only touched by the draining thread
+
+    def post(self, **fields):
+        with self.lock:
+            # A new dict each time, so a state being rendered never changes underneath
+            self.state = {**self.state, **fields}
+            self.version += 1
+
+    def drain(self):
+        with self.lock:
+            if self.version == self.drained_version:
+                return {}
+            self.drained_version = self.version
+            state = self.state
+        changed = {key: value for key, value in self.render(state).items()
+                   if key not in self.shown or self.shown[key] != value}
+        self.shown.update(changed)
+        return changed
+
+class JobCancelled(Exception):
+    pass
+
+class InstallJob:
+    """One queued download-and-install of a channel, with its own progress."""
+
+    def __init__(self, version_type, url, version_tag):
+        self.version_type = version_type
+        self.url = url
+        self.version_tag = version_tag
+        self.progress = ProgressBus()
+        self.state = 'queued'  # queued, running, done, failed or cancelled
+        self.error = None
+        self.cancel_requested = threading.Event()
+        self.committed = False  # Set once the new build is active; a cancel can't undo that
+        self.future = None
+
+    @property
+    def active(self):
+        return self.state in ('queued', 'running')
+
+    def cancel(self):
+        """Stop at the next progress or status update; partial downloads are kept for resuming."""
+        self.cancel_requested.set()
+        if self.future is not None and self.future.cancel():
+            self.finish('cancelled', "Cancelled")
+
+    def check_cancelled(self):
+        if self.cancel_requested.is_set() and not self.committed:
+            raise JobCancelled()
+
+    def commit(self):
+        """Called once the install has switched builds; later cancels are ignored."""
+        self.committed = True
+
+    def publish_status(self, text):
+        self.check_cancelled()
+        self.progress.publish_status(text)
+
+    def publish_progress(self, downloaded, total):
+        self.check_cancelled()  # Raising here also unwinds the download's worker threads
+        self.progress.publish_progress(downloaded, total)
+
+    def finish(self, state, status=None, fraction=0):
+        self.state = state
+        if status is not None:
+            self.progress.publish_status(status)
+        self.progress.set_fraction(fraction)
+
+class InstallQueue:
+    """Runs install jobs on a bounded pool, at most one queued or running job per channel."""
+
+    def __init__(self, install, max_workers=1):
+        self.install = install  # install(version_type, url, version_tag, on_status=, on_progress=, on_commit=)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="install")
+        self.lock = threading.Lock()
+        self.by_channel = {}
+
+    def submit(self, version_type, url, version_tag):
+        """Queue an install and return its job, or the channel's job that is already pending."""
+        with self.lock:
+            job = self.by_channel.get(version_type)
+            if job is not None and job.active:
+                return job
+            job = InstallJob(version_type, url, version_tag)
+            self.by_channel[version_type] = job
+            job.future = self.executor.submit(self._run, job)
+            return job
+
+    def _run(self, job):
+        if job.cancel_requested.is_set():
+            job.finish('cancelled', "Cancelled")
+            return
+        job.state = 'running'
+        try:
+            self.install(job.version_type, job.url, job.version_tag,
+                         on_status=job.publish_status, on_progress=job.publish_progress, on_commit=job.commit)
+        except JobCancelled:
+            job.finish('cancelled', "Cancelled")
+        except Exception as e:
+            job.error = e
+            job.finish('failed', f"Error during download: {e}")
+        else:
+            job.finish('done', fraction=1)
+
+    def get(self, version_type):
+        with self.lock:
+            return self.by_channel.get(version_type)
+
+    def jobs(self):
+        with self.lock:
+            return list(self.by_channel.values())
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self.executor.shutdown(wait=False)
+
+class LauncherError(Exception):
+    """A failure with a message meant for the user, e.g. no Mac build available."""
+
+class LauncherCore:
+    """Everything the launcher does that doesn't need a window.
+
+    CDDALauncher mixes this into its CTk window and cdda_cli drives it
+    directly, so both see the same paths, versions and release data.
+    """
+
+    def __init__(self, base_path=None):
+        self.latest_experimental_mac_tag = None  # New variable to track last available Mac build
+        self.latest_experimental_tag = None
+        self.latest_experimental_url = None
+        self.latest_stable_tag = None
+        self.latest_stable_url = None
+        self.latest_bn_tag = None
+        self.latest_bn_url = None
+        
+        # Setup paths
+        self.base_path = base_path or os.path.expanduser(DEFAULT_BASE_PATH)
+        self.experimental_path = os.path.join(self.base_path, "experimental")
+        self.stable_path = os.path.join(self.base_path, "stable")
+        self.bn_path = os.path.join(self.base_path, "bn")
+        self.version_file = os.path.join(self.base_path, "versions.json")
+        self.config_file = os.path.join(self.base_path, "config.json")
+        self.api_cache_file = os.path.join(self.base_path, "api_cache.json")
+        self.release_index_file = os.path.join(self.base_path, "release_index.json")
+        self.patch_notes_dir = os.path.join(self.base_path, "patch_notes")
+        self.downloads_dir = os.path.join(self.base_path, "downloads")
+        self.artifacts_dir = os.path.join(self.base_path, "artifacts")
+        self.objects_dir = os.path.join(self.base_path, "objects")
+        self.userdata_dir = os.path.join(self.base_path, "userdata")
+        self.snapshots_dir = os.path.join(self.base_path, "snapshots")
+        
+        # Create directories if they don't exist
+        for path in [self.base_path, self.experimental_path, self.stable_path, self.bn_path, self.userdata_dir]:
+            os.makedirs(path, exist_ok=True)
+        
+        # Load saved versions
+        self.load_versions()
+        self.load_config()
+        self.api_cache = GitHubCache(self.api_cache_file, token=self.settings['github_token'])
+        self.asset_preference = AssetPreference.from_config(self.settings)
+        self.release_index = ReleaseIndex(self.release_index_file, NotesStore(self.patch_notes_dir),
+                                          index_pointers(self.asset_preference), self.asset_preference.key)
+        self.downloader = Downloader(self.downloads_dir, lambda: self.session,
+                                     self.settings['download_connections'],
+                                     Throttle(self.settings['download_limit_mbps'] * 1000000 / 8))
+        self.install_queue = InstallQueue(self.install_version, self.settings['max_concurrent_installs'])
+        # Installed files of every channel are clones of or hardlinks to these objects
+        self.object_store = app_installer.ObjectStore(self.objects_dir)
+        self.store_lock = threading.Lock()
+        self.store_users = 0  # Installs in progress; the store is only collected when this is 0
+        self.artifacts = ArtifactCache(self.artifacts_dir, max(0, int(self.settings['artifact_cache_mb'] * 1024 * 1024)))
+        self.snapshot_stores = {
+            version_type: SnapshotStore(os.path.join(self.snapshots_dir, version_type),
+                                        self.settings['snapshot_compression'])
+            for version_type in VERSION_TYPES
+        }
+        self.apply_release_index()
+
+    @property
+    def session(self):
+        """The keep-alive HTTP session shared by API calls and downloads."""
+        return self.api_cache.session
+
+    def load_versions(self):
+        # Initialize with None
+        self.installed_experimental_version = None
+        self.installed_stable_version = None
+        self.installed_bn_version = None
+        
+        # Try to load saved versions
+        if os.path.exists(self.version_file):
+            try:
+                with open(self.version_file, 'r') as f:
+                    versions = json.load(f)
+                    self.installed_experimental_version = versions.get('experimental')
+                    self.installed_stable_version = versions.get('stable')
+                    self.installed_bn_version = versions.get('bn')
+            except (json.JSONDecodeError, IOError):
+                pass  # If there's any error reading, keep the default None values
+
+    def load_config(self):
+        self.settings = dict(DEFAULT_CONFIG)
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r') as f:
+                    self.settings.update(json.load(f))
+            except (json.JSONDecodeError, IOError, TypeError, ValueError):
+                pass  # Fall back to defaults
+        for key, kind in (('refresh_interval_minutes', float), ('download_connections', int),
+                          ('artifact_cache_mb', float), ('max_concurrent_installs', int),
+                          ('download_limit_mbps', float), ('keep_builds', int), ('save_snapshots', bool),
+                          ('snapshot_keep_last', int), ('snapshot_keep_days', int)):
+            try:
+                self.settings[key] = kind(self.settings[key])
+            except (TypeError, ValueError):
+                self.settings[key] = DEFAULT_CONFIG[key]
+
+    def save_versions(self):
+        versions = {
+            'experimental': self.installed_experimental_version,
+            'stable': self.installed_stable_version,
+            'bn': self.installed_bn_version
+        }
+        try:
+            with open(self.version_file, 'w') as f:
+                json.dump(versions, f)
+        except IOError:
+            pass  # If we can't save, just continue
+
+    def get_game_path(self, version_type):
+        """Return the filesystem path for a given game version."""
+        if version_type == "experimental":
+            return self.experimental_path
+        elif version_type == "stable":
+            return self.stable_path
+        else:
+            return self.bn_path
+
+    def get_user_dir(self, version_type):
+        """Return the directory the game keeps a channel's saves in (passed as --userdir)."""
+        return os.path.join(self.userdata_dir, version_type)
+
+    def get_version(self, path, tracked_version):
+        if not os.path.exists(path):
+            return None
+        
+        if not app_installer.find_active_app(path):
+            return None
+
+        return tracked_version if tracked_version else "Unknown Version"
+
+    def get_installed_version(self, version_type):
+        tracked = getattr(self, f"installed_{version_type}_version")
+        return self.get_version(self.get_game_path(version_type), tracked)
+
+    def set_installed_version(self, version_type, version_tag):
+        setattr(self, f"installed_{version_type}_version", version_tag)
+        self.save_versions()
+
+    def get_latest_version(self, version_type):
+        """Return the tag 'Download Latest' would install for a channel."""
+        if version_type == "experimental":
+            return self.latest_experimental_mac_tag
+        elif version_type == "stable":
+            return self.latest_stable_tag
+        else:
+            return self.latest_bn_tag
+
+    def fetch_releases(self):
+        """Update the release index from GitHub; returns {channel: error} for failures."""
+        # Fetch every channel at once; refresh time is the slowest endpoint, not the sum
+        _, errors = run_concurrently({
+            'cdda': lambda: self.release_index.update(self.api_cache, CDDA_RELEASES_URL),
+            'stable': lambda: self.release_index.set_pointer(
+                CDDA_RELEASES_URL, 'stable', self.api_cache.get_json(CDDA_LATEST_URL, trim=release_fields)),
+            'bn': lambda: self.release_index.update(self.api_cache, BN_RELEASES_URL),
+        })
+        self.apply_release_index()
+        return errors
+
+    def apply_release_index(self):
+        """Resolve the latest_* fields from the release index pointers."""
+        experimental = self.release_index.latest(CDDA_RELEASES_URL, 'experimental')
+        if experimental:
+            self.latest_experimental_tag = experimental.tag
+        
+        # Newest experimental that actually has a Mac build, which may lag behind
+        mac_build = self.release_index.latest(CDDA_RELEASES_URL, 'experimental_mac')
+        if mac_build:
+            self.latest_experimental_mac_tag = mac_build.tag
+            asset = find_mac_asset(mac_build, self.asset_preference)
+            self.latest_experimental_url = asset.url if asset else None
+        
+        stable = self.release_index.latest(CDDA_RELEASES_URL, 'stable')
+        if stable:
+            self.latest_stable_tag = stable.tag
+            asset = find_mac_asset(stable, self.asset_preference)
+            self.latest_stable_url = asset.url if asset else None
+        
+        bn = self.release_index.latest(BN_RELEASES_URL, 'latest')
+        if bn:
+            self.latest_bn_tag = bn.tag
+            asset = find_mac_asset(bn, self.asset_preference)
+            self.latest_bn_url = asset.url if asset else None
+
+    def get_patch_notes(self, version_type):
+        """Load a channel's patch notes from disk when the view needs them."""
+        notes = self.release_index.notes
+        if version_type == "experimental":
+            return notes.get(CDDA_RELEASES_URL, self.latest_experimental_mac_tag)
+        elif version_type == "stable":
+            return notes.get(CDDA_RELEASES_URL, self.latest_stable_tag)
+        else:
+            return notes.get(BN_RELEASES_URL, self.latest_bn_tag)
+
+    def release_state(self):
+        """Every channel's latest and installed version and patch notes, as ViewDispatcher fields."""
+        state = {'experimental_tag': self.latest_experimental_tag}
+        for version_type in ("experimental", "stable", "bn"):
+            state[f"latest_{version_type}"] = self.get_latest_version(version_type)
+            state[f"installed_{version_type}"] = self.get_installed_version(version_type)
+            state[f"notes_{version_type}"] = self.get_patch_notes(version_type)
+        return state
+
+    def resolve_download(self, version_type):
+        """Return (url, tag) of the Mac build to install, or raise LauncherError."""
+        if version_type == "experimental":
+            if not self.latest_experimental_url:
+                if self.latest_experimental_tag != self.latest_experimental_mac_tag:
+                    raise LauncherError(f"No Mac build yet for {self.latest_experimental_tag}. Latest Mac build: {self.latest_experimental_mac_tag}")
+                raise LauncherError(f"No Mac download found for {version_type} version")
+            url = self.latest_experimental_url
+            version_tag = self.latest_experimental_mac_tag
+        elif version_type == "stable":
+            url = self.latest_stable_url
+            version_tag = self.latest_stable_tag
+        else:  # bn
+            url = self.latest_bn_url
+            version_tag = self.latest_bn_tag
+        
+        if not url:
+            raise LauncherError(f"No Mac download found for {version_type} version")
+        return url, version_tag
+
+    def queue_install(self, version_type):
+        """Queue an install of the channel's latest build; returns the InstallJob."""
+        url, version_tag = self.resolve_download(version_type)
+        return self.install_queue.submit(version_type, url, version_tag)
+
+    def install_version(self, version_type, url, version_tag, on_status=None, on_progress=None, on_commit=None):
+        """Download the build at url and install its .app into the channel folder.
+
+        .tar.gz and .zip builds are extracted while they download; DMGs are
+        downloaded first. on_status(text) and on_progress(downloaded_bytes,
+        total_bytes) are called from the calling thread as the install advances,
+        and on_commit() once the new build is active and recorded in versions.json.
+        """
+        on_status = on_status or (lambda text: None)
+        on_progress = on_progress or (lambda downloaded, total: None)
+        asset = self.release_index.find_asset(url)
+        size = asset.size if asset else None
+        sha256 = parse_digest(asset.digest) if asset else None
+        kind = archive_stream.archive_kind(url)
+        
+        # First, since an archive is installed from while it arrives
+        on_status("Backing up saves...")
+        self.snapshot_saves(version_type, f"before installing {version_tag}", on_progress=on_progress)
+        
+        extract_dir = os.path.join(self.downloads_dir, f"extract-{version_type}")
+        shutil.rmtree(extract_dir, ignore_errors=True)
+        mount_point = None
+        # Pinned until extracted, so another channel's install can't evict it meanwhile
+        artifact_path = self.artifacts.lookup(url, asset.digest if asset else None, pin=True)
+        pinned = artifact_path
+        try:
+            if artifact_path:
+                on_status(f"Using cached download of {version_type} version...")
+            if kind:
+                if artifact_path:
+                    on_status("Extracting archive...")
+                    with open(artifact_path, 'rb') as f:
+                        self.extract_archive(f, kind, extract_dir)
+                else:
+                    on_status(f"Downloading and extracting {version_type} version...")
+                    artifact_path = self.stream_archive(url, kind, extract_dir, size, sha256, on_progress)
+                source_app = archive_stream.find_app(extract_dir)
+                if not source_app:
+                    raise LauncherError("Could not find .app in archive")
+            else:
+                if not artifact_path:
+                    on_status(f"Downloading {version_type} version...")
+                    # Partial downloads are kept in downloads/ and resumed on the next attempt
+                    # Hashed as it arrives and checked against what GitHub lists for the asset
+                    artifact_path, digest = self.downloader.download(url, on_progress, size, sha256)
+                    artifact_path = pinned = self.artifacts.add(url, artifact_path, digest, pin=True)
+                
+                # Read the .app straight out of the DMG; hdiutil is only needed for images dmg_reader can't read
+                on_status("Extracting DMG...")
+                try:
+                    source_app = dmg_reader.extract_app(artifact_path, extract_dir, on_progress=on_progress)
+                except dmg_reader.DmgError as e:
+                    if sys.platform != "darwin":
+                        raise LauncherError(f"Could not read DMG: {e}")
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+                    on_status("Mounting DMG...")
+                    mount_point, source_app = self.mount_dmg(artifact_path)
+            
+            target_path = self.get_game_path(version_type)
+            
+            # Build the new .app beside the installed builds from the shared object store
+            # and switch `current` to it; saves left in the old app are moved out first
+            with self.store_lock:
+                self.store_users += 1
+            try:
+                on_status("Installing new version...")
+                stats = app_installer.install_app(
+                    source_app, target_path, version_tag, self.object_store, self.get_user_dir(version_type),
+                    keep=max(1, self.settings['keep_builds']), legacy_tag=self.get_installed_version(version_type),
+                    scratch_source=mount_point is None, on_progress=on_progress, source_url=url)
+            finally:
+                with self.store_lock:
+                    self.store_users -= 1
+            
+            # Update tracked version as soon as `current` points at the new build
+            self.set_installed_version(version_type, version_tag)
+            if on_commit:
+                on_commit()
+        finally:
+            try:
+                if mount_point:
+                    subprocess.run(["hdiutil", "detach", mount_point], check=True)
+            finally:
+                if pinned:
+                    self.artifacts.unpin(pinned)
+                shutil.rmtree(extract_dir, ignore_errors=True)
+        
+        on_status("Cleaning up...")
+        self.collect_objects()
+        
+        if artifact_path and not self.artifacts.contains(artifact_path):
+            self.downloader.discard(artifact_path)  # Caching is disabled
+        on_status(f"{version_type.capitalize()} version installed successfully! "
+                  f"({stats['copied']} files changed, {stats['linked']} unchanged)")
+
+    def extract_archive(self, fileobj, kind, extract_dir, select=None):
+        try:
+            archive_stream.extract_archive(fileobj, kind, extract_dir, select)
+        except archive_stream.ArchiveError as e:
+            raise LauncherError(f"Could not extract archive: {e}")
+    
+    def stream_archive(self, url, kind, extract_dir, size=None, sha256=None, on_progress=None, select=None):
+        """Extract the archive at url into extract_dir as it downloads.
+
+        With the artifact cache enabled a copy is written on the way past and
+        cached; returns its path, or None when nothing was kept.
+        """
+        tee_path = self.downloader.paths(url)[0] if self.artifacts.enabled else None
+        try:
+            with self.downloader.open_stream(url, on_progress, tee_path) as stream:
+                self.extract_archive(stream, kind, extract_dir, select)
+                # The extracted files aren't used until the whole download checks out
+                digest = stream.finish(size, sha256)
+        except BaseException:
+            if tee_path:
+                self.downloader.discard(tee_path)
+            raise
+        return self.artifacts.add(url, tee_path, digest) if tee_path else None
+    
+    def mount_dmg(self, dmg_path):
+        """Attach a DMG with hdiutil; returns (mount point, path of the .app in it)."""
+        mount_process = subprocess.Popen(["hdiutil", "attach", dmg_path, "-nobrowse"], 
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, error = mount_process.communicate()
+        
+        if mount_process.returncode != 0:
+            raise LauncherError(f"Failed to mount DMG: {error.decode()}")
+        
+        # Find the mount point
+        mount_point = None
+        for line in output.decode().split('\n'):
+            if '/Volumes/' in line:
+                mount_point = line.split('\t')[-1].strip()
+                break
+        
+        if not mount_point:
+            raise LauncherError("Could not find DMG mount point")
+        
+        # Find the .app in the mounted DMG
+        for item in os.listdir(mount_point):
+            if item.endswith('.app'):
+                return mount_point, os.path.join(mount_point, item)
+        
+        subprocess.run(["hdiutil", "detach", mount_point], check=True)
+        raise LauncherError("Could not find .app in mounted DMG")
+
+    def collect_objects(self):
+        """Delete store objects that no channel's install uses any more; returns the bytes freed."""
+        with self.store_lock:
+            if self.store_users:
+                return 0  # An install may be linking objects it hasn't recorded yet
+            installs = [self.get_game_path(version_type) for version_type in VERSION_TYPES]
+            return self.object_store.gc(app_installer.referenced_objects(installs))
+
+    def find_app(self, version_type):
+        """Return the installed .app path for a channel, or raise LauncherError."""
+        path = self.get_game_path(version_type)
+        
+        if not os.path.exists(path):
+            raise LauncherError(f"No {version_type} version installed")
+        
+        app_path = app_installer.find_active_app(path)
+        if not app_path:
+            raise LauncherError(f"No .app found in {version_type} folder")
+        
+        return app_path
+
+    def list_builds(self, version_type):
+        """Installed builds of a channel, newest first, as dicts with name, tag and active."""
+        return app_installer.list_builds(self.get_game_path(version_type))
+
+    def switch_build(self, version_type, name=None):
+        """Make an installed build current, by default the newest inactive one; returns its tag."""
+        if name is None:
+            previous = [build for build in self.list_builds(version_type) if not build['active']]
+            if not previous:
+                raise LauncherError(f"No other {version_type} build installed")
+            name = previous[0]['name']
+        try:
+            tag = app_installer.switch_build(self.get_game_path(version_type), name,
+                                             self.get_user_dir(version_type))
+        except FileNotFoundError as e:
+            raise LauncherError(str(e))
+        self.set_installed_version(version_type, tag)
+        return tag
+
+    def verify_install(self, version_type, on_progress=None):
+        """Check a channel's active build against its install manifest; returns app_installer.verify_build()'s report."""
+        build = app_installer.active_build(self.get_game_path(version_type))
+        if build is None:
+            raise LauncherError(f"No verifiable {version_type} build is installed; install it again first")
+        try:
+            return app_installer.verify_build(build, on_progress=on_progress)
+        except FileNotFoundError as e:
+            raise LauncherError(str(e))
+    
+    def repair_install(self, version_type, on_status=None, on_progress=None):
+        """Verify a channel's active build and rewrite only its damaged files; returns the verify report.
+
+        Files are restored from the object store where it still has them,
+        and otherwise extracted on their own from the cached download, or
+        from a new download of the same build.
+        """
+        on_status = on_status or (lambda text: None)
+        on_progress = on_progress or (lambda done, total: None)
+        on_status(f"Verifying {version_type} version...")
+        report = self.verify_install(version_type, on_progress)
+        if not report['damaged']:
+            on_status(f"All {report['files']} files of the {version_type} version are intact")
+            return report
+        
+        on_status(f"Repairing {len(report['damaged'])} files...")
+        build = app_installer.active_build(self.get_game_path(version_type))
+        with self.store_lock:
+            self.store_users += 1
+        try:
+            remaining = app_installer.repair_build(build, report['damaged'], self.object_store)
+            if remaining:
+                url = app_installer.load_manifest(build).get('url')
+                if not url:
+                    raise LauncherError(f"{len(remaining)} damaged files are no longer available; "
+                                        f"install the {version_type} version again")
+                extract_dir = os.path.join(self.downloads_dir, f"repair-{version_type}")
+                shutil.rmtree(extract_dir, ignore_errors=True)
+                try:
+                    source_app = self.extract_build_files(url, remaining, extract_dir, on_status, on_progress)
+                    remaining = app_installer.repair_build(build, remaining, self.object_store, source_app)
+                finally:
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+        finally:
+            with self.store_lock:
+                self.store_users -= 1
+        if remaining:
+            raise LauncherError(f"{len(remaining)} files could not be repaired (first: {remaining[0]}); "
+                                f"install the {version_type} version again")
+        on_status(f"Repaired {len(report['damaged'])} files of the {version_type} version")
+        return report
+    
+    def extract_build_files(self, url, paths, extract_dir, on_status, on_progress):
+        """Extract only paths (relative to the .app) of the build at url; returns the extracted .app."""
+        asset = self.release_index.find_asset(url)
+        size = asset.size if asset else None
+        sha256 = parse_digest(asset.digest) if asset else None
+        # Pinned until extracted, so another channel's install can't evict it meanwhile
+        artifact_path = self.artifacts.lookup(url, asset.digest if asset else None, pin=True)
+        pinned = artifact_path
+        kind = archive_stream.archive_kind(url)
+        try:
+            if kind:
+                wanted = set(paths)
+                
+                def select(name):
+                    # Member names lead to the .app through however many folders the archive has
+                    parts = name.split('/')
+                    for index, part in enumerate(parts[:-1]):
+                        if part.endswith('.app'):
+                            return os.path.join(*parts[index + 1:]) in wanted
+                    return False
+                
+                if artifact_path:
+                    on_status("Extracting damaged files...")
+                    with open(artifact_path, 'rb') as f:
+                        self.extract_archive(f, kind, extract_dir, select)
+                else:
+                    on_status("Downloading damaged files...")
+                    self.stream_archive(url, kind, extract_dir, size, sha256, on_progress, select)
+                return archive_stream.find_app(extract_dir)
+            
+            if not artifact_path:
+                on_status("Downloading damaged files...")
+                artifact_path, digest = self.downloader.download(url, on_progress, size, sha256)
+                artifact_path = pinned = self.artifacts.add(url, artifact_path, digest, pin=True)
+            try:
+                on_status("Extracting damaged files...")
+                return dmg_reader.extract_app(artifact_path, extract_dir, on_progress=on_progress, paths=paths)
+            except dmg_reader.DmgError as e:
+                raise LauncherError(f"Could not read DMG: {e}")
+            finally:
+                if not self.artifacts.contains(artifact_path):
+                    self.downloader.discard(artifact_path)  # Caching is disabled
+        finally:
+            if pinned:
+                self.artifacts.unpin(pinned)
+    
+    def snapshot_saves(self, version_type, label="", prune=True, on_progress=None, force=False):
+        """Snapshot the channel's user dir if save_snapshots (or force) is on; returns the summary or None.
+
+        Save folders still inside the installed app are moved to the user dir
+        first, so they are covered too. Snapshots past the retention policy
+        are deleted afterwards, and the chunks only they used once any were.
+        """
+        user_dir = self.get_user_dir(version_type)
+        app_path = app_installer.find_active_app(self.get_game_path(version_type))
+        store = self.snapshot_stores[version_type]
+        try:
+            if app_path:
+                app_installer.adopt_user_data(app_path, user_dir)
+            if not (self.settings['save_snapshots'] or force):
+                return None
+            summary = store.take(user_dir, label, on_progress=on_progress)
+            # gc walks every stored chunk, so only run it when a snapshot went away
+            if summary is not None and prune and \
+                    store.prune(self.settings['snapshot_keep_last'], self.settings['snapshot_keep_days']):
+                store.gc()
+        except OSError as e:
+            raise LauncherError(f"Could not back up {version_type} saves: {e}")
+        return summary
+
+    def list_snapshots(self, version_type):
+        """Save snapshots of a channel, newest first."""
+        return self.snapshot_stores[version_type].list()
+
+    def restore_snapshot(self, version_type, snapshot_id=None):
+        """Replace a channel's saves with a snapshot, by default the newest; returns its id.
+
+        The current saves are snapshotted first, even with save_snapshots off,
+        so a restore can always be undone.
+        """
+        store = self.snapshot_stores[version_type]
+        if snapshot_id is None:
+            snapshots = store.list()
+            if not snapshots:
+                raise LauncherError(f"No {version_type} save snapshots")
+            snapshot_id = snapshots[0]['id']
+        try:
+            store.load(snapshot_id)
+            # Not pruned here: that could drop the snapshot being restored
+            self.snapshot_saves(version_type, f"before restoring {snapshot_id}", prune=False, force=True)
+            store.restore(snapshot_id, self.get_user_dir(version_type))
+        except SnapshotError as e:
+            raise LauncherError(str(e))
+        except OSError as e:
+            raise LauncherError(f"Could not restore {version_type} saves: {e}")
+        return snapshot_id
+
+    def launch(self, version_type, on_status=None, on_progress=None):
+        """Back up the channel's saves and start the game; returns the .app path.
+
+        This can take a while on a large world, so the GUI calls it off the
+        main thread. A failed backup is reported through on_status(text) and
+        doesn't keep the game from starting.
+        """
+        on_status = on_status or (lambda text: None)
+        app_path = self.find_app(version_type)
+        user_dir = self.get_user_dir(version_type)
+        on_status("Backing up saves...")
+        try:
+            self.snapshot_saves(version_type, "before launch", on_progress=on_progress)
+        except LauncherError as e:
+            on_status(f"Warning: {e}; launching anyway")
+        else:
+            on_status(f"Launching {version_type} version...")
+        os.makedirs(user_dir, exist_ok=True)
+        # The game expects a trailing separator on --userdir
+        subprocess.Popen(["open", app_path, "--args", "--userdir", os.path.join(user_dir, "")])
+        return app_path
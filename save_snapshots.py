@@ -0,0 +1,288 @@
+"""Deduplicated, compressed snapshots of a channel's save data.
+
+CDDA worlds are thousands of small JSON map files, and between two sessions
+only a few of them change. A snapshot splits every file into chunks of up to
+CHUNK_SIZE and stores each chunk once, compressed, under its SHA-256 as
+chunks/<sha[:2]>/<sha>. The snapshot itself is just a manifest of paths,
+sizes, mtimes and chunk hashes in snapshots/<id>.json, so it costs only the
+chunks that are new since the last one. Files whose size and mtime match the
+previous snapshot aren't even read.
+
+Retention keeps the newest snapshots plus the newest of each day for a few
+days; gc() then drops the chunks no remaining snapshot uses.
+"""
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import threading
+import time
+import zlib
+
+from copy_engine import COPY_WORKERS, parallel_map, walk_tree
+
+CHUNK_SIZE = 1024 * 1024  # Map files are a few KB, so most files are one chunk
+SNAPSHOTS_NAME = "snapshots"
+CHUNKS_NAME = "chunks"
+DEFAULT_KEEP_LAST = 10
+DEFAULT_KEEP_DAYS = 7
+# Each stored chunk starts with a byte saying how the rest is encoded
+COMPRESSORS = {
+    'zlib': (b'z', lambda data: zlib.compress(data, 6)),
+    'lzma': (b'x', lzma.compress),
+}
+DECOMPRESSORS = {
+    b'z': zlib.decompress,
+    b'x': lzma.decompress,
+    b'-': lambda data: data,  # Stored as is when compressing didn't help
+}
+
+class SnapshotError(Exception):
+    pass
+
+class SnapshotStore:
+    """Snapshots of one directory tree, sharing a store of compressed chunks."""
+
+    def __init__(self, root, compression='zlib'):
+        self.root = root
+        self.snapshots_dir = os.path.join(root, SNAPSHOTS_NAME)
+        self.chunks_dir = os.path.join(root, CHUNKS_NAME)
+        self.compression = compression if compression in COMPRESSORS else 'zlib'
+        self.lock = threading.Lock()
+
+    def chunk_path(self, sha256):
+        return os.path.join(self.chunks_dir, sha256[:2], sha256)
+
+    def write_chunk(self, data):
+        """Store a chunk unless it is already there; returns (sha256, bytes written)."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(sha256)
+        if os.path.exists(path):
+            return sha256, 0
+        tag, compress = COMPRESSORS[self.compression]
+        packed = compress(data)
+        if len(packed) >= len(data):
+            tag, packed = b'-', data
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per thread: two files may share a chunk nobody has written yet
+        temp_file = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(temp_file, 'wb') as f:
+            f.write(tag)
+            f.write(packed)
+        os.replace(temp_file, path)
+        return sha256, len(packed) + 1
+
+    def read_chunk(self, sha256):
+        try:
+            with open(self.chunk_path(sha256), 'rb') as f:
+                blob = f.read()
+            data = DECOMPRESSORS[blob[:1]](blob[1:])
+        except (OSError, KeyError, zlib.error, lzma.LZMAError):
+            raise SnapshotError(f"Snapshot chunk {sha256} is missing or damaged")
+        if hashlib.sha256(data).hexdigest() != sha256:
+            raise SnapshotError(f"Snapshot chunk {sha256} is damaged")
+        return data
+
+    def snapshot_path(self, snapshot_id):
+        return os.path.join(self.snapshots_dir, snapshot_id + ".json")
+
+    def load(self, snapshot_id):
+        try:
+            with open(self.snapshot_path(snapshot_id), 'r') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError):
+            raise SnapshotError(f"No snapshot named {snapshot_id}")
+
+    def _load_all(self):
+        # Newest first; unreadable manifests are skipped
+        snapshots = []
+        try:
+            names = [entry.name for entry in os.scandir(self.snapshots_dir) if entry.name.endswith(".json")]
+        except OSError:
+            names = []
+        for name in names:
+            try:
+                snapshots.append(self.load(name[:-len(".json")]))
+            except SnapshotError:
+                pass
+        snapshots.sort(key=lambda snapshot: snapshot['created'], reverse=True)
+        return snapshots
+
+    def _new_id(self, created):
+        base = time.strftime('%Y%m%d-%H%M%S', time.localtime(created))
+        snapshot_id = base
+        suffix = 2
+        while os.path.exists(self.snapshot_path(snapshot_id)):
+            snapshot_id = f"{base}.{suffix}"
+            suffix += 1
+        return snapshot_id
+
+    @staticmethod
+    def summary(snapshot):
+        return {
+            'id': snapshot['id'],
+            'created': snapshot['created'],
+            'label': snapshot.get('label', ''),
+            'files': len(snapshot['files']),
+            'bytes': sum(entry[0] for entry in snapshot['files'].values()),
+        }
+
+    def list(self):
+        """Snapshots as summary dicts (id, created, label, files, bytes), newest first."""
+        with self.lock:
+            return [self.summary(snapshot) for snapshot in self._load_all()]
+
+    def take(self, source_dir, label="", workers=COPY_WORKERS, on_progress=None):
+        """Snapshot every file under source_dir.
+
+        Returns the new snapshot's summary with new_chunks and new_bytes
+        (what it added to the store), or None if source_dir is empty or
+        nothing changed since the latest snapshot. on_progress(done_bytes,
+        total_bytes) is called as changed files are read.
+        """
+        if not os.path.isdir(source_dir):
+            return None
+        with self.lock:
+            snapshots = self._load_all()
+            previous = snapshots[0] if snapshots else None
+            previous_files = previous['files'] if previous else {}
+            files = {}
+            dirs = []
+            pending = []
+            for rel, entry in walk_tree(source_dir):
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir():
+                    dirs.append(rel)
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                old = previous_files.get(rel)
+                if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+                    files[rel] = old
+                else:
+                    pending.append((rel, entry.path, st.st_mtime_ns, st.st_size))
+            stats = {'new_chunks': 0, 'new_bytes': 0, 'read_bytes': 0}
+            total_bytes = sum(item[3] for item in pending)
+            stats_lock = threading.Lock()
+
+            def add_file(item):
+                rel, path, mtime_ns, _ = item
+                size = 0
+                chunks = []
+                with open(path, 'rb') as f:
+                    for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        sha256, written = self.write_chunk(data)
+                        chunks.append(sha256)
+                        size += len(data)
+                        with stats_lock:
+                            if written:
+                                stats['new_chunks'] += 1
+                                stats['new_bytes'] += written
+                            stats['read_bytes'] += len(data)
+                            if on_progress:
+                                on_progress(stats['read_bytes'], max(total_bytes, stats['read_bytes']))
+                with stats_lock:
+                    files[rel] = [size, mtime_ns, chunks]
+
+            parallel_map(add_file, pending, workers)
+            if not files and not dirs:
+                return None
+            if previous and files == previous_files and dirs == previous.get('dirs'):
+                return None
+
+            created = time.time()
+            snapshot = {'id': self._new_id(created), 'created': created, 'label': label,
+                        'dirs': dirs, 'files': files}
+            os.makedirs(self.snapshots_dir, exist_ok=True)
+            path = self.snapshot_path(snapshot['id'])
+            temp_file = path + ".tmp"
+            with open(temp_file, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(temp_file, path)
+            return dict(self.summary(snapshot), new_chunks=stats['new_chunks'], new_bytes=stats['new_bytes'])
+
+    def restore(self, snapshot_id, dest_dir, workers=COPY_WORKERS):
+        """Replace dest_dir with the contents of a snapshot; returns the number of files.
+
+        The snapshot is written out beside dest_dir and swapped in by rename,
+        so a missing or damaged chunk leaves dest_dir as it was.
+        """
+        dest_dir = dest_dir.rstrip(os.sep)
+        staging_dir = dest_dir + ".restoring"
+        replaced_dir = dest_dir + ".replaced"
+        with self.lock:
+            snapshot = self.load(snapshot_id)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir)
+            for rel in snapshot.get('dirs', []):
+                os.makedirs(os.path.join(staging_dir, rel), exist_ok=True)
+
+            def write_file(item):
+                rel, (size, mtime_ns, chunks) = item
+                path = os.path.join(staging_dir, rel)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    for sha256 in chunks:
+                        f.write(self.read_chunk(sha256))
+                os.utime(path, ns=(mtime_ns, mtime_ns))
+
+            try:
+                parallel_map(write_file, snapshot['files'].items(), workers)
+            except BaseException:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+            shutil.rmtree(replaced_dir, ignore_errors=True)
+            if os.path.lexists(dest_dir):
+                os.rename(dest_dir, replaced_dir)
+            os.rename(staging_dir, dest_dir)
+            shutil.rmtree(replaced_dir, ignore_errors=True)
+            return len(snapshot['files'])
+
+    def prune(self, keep_last=DEFAULT_KEEP_LAST, keep_days=DEFAULT_KEEP_DAYS, now=None):
+        """Delete snapshots outside the retention policy; returns the ids removed.
+
+        Kept are the keep_last newest snapshots, and the newest snapshot of
+        each of the last keep_days days.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            snapshots = self._load_all()
+            keep = {snapshot['id'] for snapshot in snapshots[:max(0, keep_last)]}
+            days = set()
+            for snapshot in snapshots:
+                day = time.strftime('%Y-%m-%d', time.localtime(snapshot['created']))
+                if snapshot['created'] >= now - keep_days * 86400 and day not in days:
+                    days.add(day)
+                    keep.add(snapshot['id'])
+            removed = [snapshot['id'] for snapshot in snapshots if snapshot['id'] not in keep]
+            for snapshot_id in removed:
+                os.remove(self.snapshot_path(snapshot_id))
+            return removed
+
+    def gc(self):
+        """Remove chunks no snapshot uses (and leftover temp files); returns bytes freed."""
+        with self.lock:
+            referenced = {sha256 for snapshot in self._load_all()
+                          for entry in snapshot['files'].values() for sha256 in entry[2]}
+            freed = 0
+            if not os.path.isdir(self.chunks_dir):
+                return 0
+            for _, entry in list(walk_tree(self.chunks_dir)):
+                if entry.is_file(follow_symlinks=False) and entry.name not in referenced:
+                    try:
+                        size = entry.stat(follow_symlinks=False).st_size
+                        os.remove(entry.path)
+                        freed += size
+                    except OSError:
+                        pass
+            return freed
+
+    def total_bytes(self):
+        """Disk space used by stored chunks."""
+        total = 0
+        if os.path.isdir(self.chunks_dir):
+            for _, entry in walk_tree(self.chunks_dir):
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+        return total
@@ -0,0 +1,252 @@
+"""Build small UDIF disk images holding an HFS+ volume, for testing dmg_reader.
+
+Only what a reader of release DMGs looks at is filled in: the volume header,
+the catalog and extents overflow B-trees, BSD permissions and dates, and
+the UDIF trailer and chunk tables. The tree to store is a dict of names to
+bytes (a file), File, Symlink, HardLink or another dict (a folder).
+"""
+import bz2
+import plistlib
+import struct
+import zlib
+
+BLOCK_SIZE = 4096
+NODE_SIZE = 4096
+SECTOR_SIZE = 512
+HFS_EPOCH_OFFSET = 2082844800
+ROOT_FOLDER_ID = 2
+CHUNK_TYPES = {'raw': 0x00000001, 'zlib': 0x80000005, 'bzip2': 0x80000006}
+COMPRESS = {'raw': lambda data: data, 'zlib': zlib.compress, 'bzip2': bz2.compress}
+
+class File:
+    def __init__(self, data, mode=0o644, fragments=1, hfs_compressed=False):
+        self.data = data
+        self.mode = mode
+        self.fragments = fragments  # Extents to split the data over; more than 8 needs the overflow file
+        self.hfs_compressed = hfs_compressed
+
+class Symlink:
+    def __init__(self, target):
+        self.target = target
+
+class HardLink:
+    def __init__(self, data):
+        self.data = data
+
+def catalog_key(parent_id, name):
+    encoded = name.replace(':', '/').encode('utf-16-be')
+    return struct.pack('>HIH', 6 + len(encoded), parent_id, len(encoded) // 2) + encoded
+
+def bsd_info(mode, owner_flags=0, special=0):
+    return struct.pack('>IIBBHI', 501, 20, 0, owner_flags, mode, special)
+
+def fork_data(size, extents):
+    data = struct.pack('>QII', size, 0, sum(count for _, count in extents))
+    for start, count in (list(extents[:8]) + [(0, 0)] * 8)[:8]:
+        data += struct.pack('>II', start, count)
+    return data
+
+class HfsBuilder:
+    def __init__(self, mtime):
+        self.date = mtime + HFS_EPOCH_OFFSET
+        self.volume = bytearray(BLOCK_SIZE)  # Block 0 holds the volume header
+        self.next_id = 16
+        self.records = []  # (key, record)
+        self.overflow = []  # (file id, start block in fork, extents)
+        self.inodes = []  # (link id, data) for the private hardlink folder
+        self.files = 0
+        self.folders = 0
+
+    def allocate(self, data, fragments=1):
+        """Write data into free blocks, split over `fragments` extents with gaps between them."""
+        blocks = max(1, -(-len(data) // BLOCK_SIZE)) if data else 0
+        extents = []
+        done = 0
+        for index in range(fragments):
+            count = blocks // fragments + (1 if index < blocks % fragments else 0)
+            if not count:
+                continue
+            start = len(self.volume) // BLOCK_SIZE
+            chunk = data[done * BLOCK_SIZE:(done + count) * BLOCK_SIZE]
+            self.volume += chunk + bytes(count * BLOCK_SIZE - len(chunk))
+            if fragments > 1:
+                self.volume += bytes(BLOCK_SIZE)  # A gap, so the extents aren't contiguous
+            extents.append((start, count))
+            done += count
+        return extents
+
+    def add_thread(self, cnid, kind, parent_id, name):
+        encoded = name.replace(':', '/').encode('utf-16-be')
+        record = struct.pack('>hhIH', kind, 0, parent_id, len(encoded) // 2) + encoded
+        self.records.append((catalog_key(cnid, ''), record))
+
+    def add_folder(self, parent_id, name, children, cnid=None):
+        cnid = cnid or self.take_id()
+        self.folders += 1
+        record = struct.pack('>hHIIIIIII', 1, 0, len(children), cnid, self.date, self.date, self.date, self.date, 0)
+        record += bsd_info(0o040755) + bytes(32) + struct.pack('>II', 0, 0)
+        self.records.append((catalog_key(parent_id, name), record))
+        self.add_thread(cnid, 3, parent_id, name)
+        for child_name, child in children.items():
+            self.add(cnid, child_name, child)
+        return cnid
+
+    def add_file(self, parent_id, name, data, mode, file_type=b'\0\0\0\0', creator=b'\0\0\0\0',
+                 fragments=1, owner_flags=0, special=0):
+        cnid = self.take_id()
+        self.files += 1
+        extents = self.allocate(data, fragments)
+        if len(extents) > 8:
+            self.overflow.append((cnid, sum(count for _, count in extents[:8]), extents[8:]))
+        record = struct.pack('>hHIIIIIII', 2, 0, 0, cnid, self.date, self.date, self.date, self.date, 0)
+        record += bsd_info(mode, owner_flags, special)
+        record += struct.pack('>4s4sHhhH', file_type, creator, 0, 0, 0, 0) + bytes(16)
+        record += struct.pack('>II', 0, 0) + fork_data(len(data), extents) + fork_data(0, [])
+        self.records.append((catalog_key(parent_id, name), record))
+        self.add_thread(cnid, 4, parent_id, name)
+        return cnid
+
+    def add(self, parent_id, name, child):
+        if isinstance(child, dict):
+            self.add_folder(parent_id, name, child)
+        elif isinstance(child, Symlink):
+            self.add_file(parent_id, name, child.target.encode(), 0o120755, b'slnk', b'rhap')
+        elif isinstance(child, HardLink):
+            link_id = len(self.inodes) + 100
+            self.inodes.append((link_id, child.data))
+            self.add_file(parent_id, name, b'', 0o100644, b'hlnk', b'hfs+', special=link_id)
+        elif isinstance(child, File):
+            self.add_file(parent_id, name, child.data, 0o100000 | child.mode, fragments=child.fragments,
+                          owner_flags=0x20 if child.hfs_compressed else 0)
+        else:
+            self.add_file(parent_id, name, child, 0o100644)
+
+    def take_id(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def btree(self, records, max_key_length, attributes):
+        """Leaf nodes packed in key order, an index node above them if there are several, and a header node."""
+        # Catalog keys sort by parent id then name; extents keys by fork, file id and block
+        records = sorted(records, key=lambda record: record[0][2:6] + record[0][8:] if max_key_length > 10
+                         else record[0][2:])
+        leaves = [[]]
+        for key, data in records:
+            used = 14 + sum(len(k) + len(d) for k, d in leaves[-1]) + 2 * (len(leaves[-1]) + 2)
+            if leaves[-1] and used + len(key) + len(data) > NODE_SIZE:
+                leaves.append([])
+            leaves[-1].append((key, data))
+        if not records:
+            leaves = []
+        nodes = [None]
+        first_leaf = 1 if leaves else 0
+        for index, leaf in enumerate(leaves):
+            number = len(nodes)
+            forward = number + 1 if index + 1 < len(leaves) else 0
+            backward = number - 1 if index else 0
+            nodes.append(self.node(forward, backward, -1, 1, [key + data for key, data in leaf]))
+        root = first_leaf
+        depth = 1 if leaves else 0
+        # Index levels above the leaves until a single root node is left
+        level = [leaf[0][0] + struct.pack('>I', first_leaf + index) for index, leaf in enumerate(leaves)]
+        while len(level) > 1:
+            depth += 1
+            groups = [[]]
+            for record in level:
+                if groups[-1] and 14 + sum(map(len, groups[-1])) + len(record) + 2 * (len(groups[-1]) + 2) > NODE_SIZE:
+                    groups.append([])
+                groups[-1].append(record)
+            level = []
+            for group in groups:
+                level.append(group[0][:-4] + struct.pack('>I', len(nodes)))
+                nodes.append(self.node(0, 0, 0, depth, group))
+            root = len(nodes) - 1
+        last_leaf = len(leaves) if leaves else 0
+        header = struct.pack('>HIIIIHHII', depth, root, len(records), first_leaf, last_leaf,
+                             NODE_SIZE, max_key_length, len(nodes), 0)
+        header += struct.pack('>HIBBI', 0, 0, 0, 0xBC, attributes) + bytes(64)
+        bitmap = bytearray(NODE_SIZE - 256)
+        for number in range(len(nodes)):
+            bitmap[number // 8] |= 0x80 >> (number % 8)
+        nodes[0] = self.node(0, 0, 1, 0, [header, bytes(128), bytes(bitmap)])
+        return b''.join(nodes)
+
+    @staticmethod
+    def node(forward, backward, kind, height, records):
+        data = struct.pack('>IIbBHH', forward, backward, kind, height, len(records), 0)
+        offsets = []
+        for record in records:
+            offsets.append(len(data))
+            data += record
+        offsets.append(len(data))
+        table = b''.join(struct.pack('>H', offset) for offset in reversed(offsets))
+        return data + bytes(NODE_SIZE - len(data) - len(table)) + table
+
+    def build(self, tree, volume_name):
+        self.add_folder(1, volume_name, tree, cnid=ROOT_FOLDER_ID)
+        if self.inodes:
+            private = {f"iNode{link_id}": data for link_id, data in self.inodes}
+            self.add_folder(ROOT_FOLDER_ID, "\0\0\0\0HFS+ Private Data", private)
+        catalog = self.btree(self.records, 516, 6)
+        extents_records = []
+        for file_id, start_block, extents in self.overflow:
+            key = struct.pack('>HBBII', 10, 0, 0, file_id, start_block)
+            extents_records.append((key, fork_data(0, extents)[16:]))  # Always eight extents
+        extents = self.btree(extents_records, 10, 2)
+        extents_fork = self.allocate(extents)
+        catalog_fork = self.allocate(catalog)
+        total_blocks = len(self.volume) // BLOCK_SIZE
+        header = struct.pack('>2sHIII', b'H+', 4, 0x100, 0, 0)
+        header += struct.pack('>IIII', self.date, self.date, 0, self.date)
+        header += struct.pack('>IIIIIIIIIIQ', self.files, self.folders, BLOCK_SIZE, total_blocks, 0, total_blocks,
+                              BLOCK_SIZE, BLOCK_SIZE, self.next_id, 1, 1)
+        header += bytes(32) + fork_data(0, []) + fork_data(len(extents), extents_fork)
+        header += fork_data(len(catalog), catalog_fork) + fork_data(0, []) + fork_data(0, [])
+        self.volume[1024:1024 + len(header)] = header
+        return bytes(self.volume)
+
+def block_table(first_sector, partition, chunk_sectors, compression, data_fork):
+    """Append a partition's chunks to data_fork; returns its "mish" block table."""
+    chunks = []
+    chunk_bytes = chunk_sectors * SECTOR_SIZE
+    for index, start in enumerate(range(0, len(partition), chunk_bytes)):
+        data = partition[start:start + chunk_bytes]
+        sector = start // SECTOR_SIZE
+        sectors = -(-len(data) // SECTOR_SIZE)
+        data += bytes(sectors * SECTOR_SIZE - len(data))
+        if not any(data):
+            chunks.append((0x00000002, sector, sectors, len(data_fork), 0))
+            continue
+        # Every third chunk is stored raw, like incompressible runs in real images
+        kind = compression if index % 3 else 'raw'
+        packed = COMPRESS[kind](data)
+        chunks.append((CHUNK_TYPES[kind], sector, sectors, len(data_fork), len(packed)))
+        data_fork += packed
+    sector_count = -(-len(partition) // SECTOR_SIZE)
+    table = struct.pack('>4sIQQQII', b'mish', 1, first_sector, sector_count, 0, 0, 0) + bytes(24)
+    table += bytes(136) + struct.pack('>I', len(chunks) + 1)
+    for kind, sector, sectors, offset, size in chunks:
+        table += struct.pack('>IIQQQQ', kind, 0, sector, sectors, offset, size)
+    table += struct.pack('>IIQQQQ', 0xffffffff, 0, sector_count, 0, len(data_fork), 0)
+    return table
+
+def build_dmg(path, tree, chunk_sectors=16, compression='zlib', mtime=1700000000, partition_name='Apple_HFS'):
+    """Write a UDIF image of an HFS+ volume holding `tree` to path."""
+    volume = HfsBuilder(mtime).build(tree, "Cataclysm")
+    data_fork = bytearray()
+    partitions = [('Protective Master Boot Record (MBR : 0)', block_table(0, bytes(SECTOR_SIZE), 1, 'raw', data_fork))]
+    partitions.append((f"disk image ({partition_name} : 1)", block_table(1, volume, chunk_sectors, compression, data_fork)))
+    plist = plistlib.dumps({'resource-fork': {'blkx': [
+        {'Attributes': '0x0050', 'CFName': name, 'Data': table, 'ID': str(index - 1), 'Name': name}
+        for index, (name, table) in enumerate(partitions)
+    ]}})
+    trailer = bytearray(512)
+    struct.pack_into('>4sIII', trailer, 0, b'koly', 4, 512, 1)
+    struct.pack_into('>QQ', trailer, 24, 0, len(data_fork))
+    struct.pack_into('>II', trailer, 56, 1, 1)
+    struct.pack_into('>QQ', trailer, 216, len(data_fork), len(plist))
+    struct.pack_into('>IQ', trailer, 488, 1, 1 + len(volume) // SECTOR_SIZE)
+    with open(path, 'wb') as f:
+        f.write(data_fork)
+        f.write(plist)
+        f.write(trailer)
@@ -0,0 +1,172 @@
+import unittest
+from unittest.mock import MagicMock
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import launcher_core
+
+def make_response(status, data=None, headers=None):
+    response = MagicMock()
+    response.status_code = status
+    response.headers = headers or {}
+    response.text = json.dumps(data) if data is not None else ""
+    return response
+
+class GitHubCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.temp_dir.name, 'api_cache.json')
+        self.url = 'https://api.github.com/repos/x/y/releases'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_stores_validators_and_reuses_on_304(self):
+        session = MagicMock()
+        session.get.return_value = make_response(200, [{'tag_name': 'a'}], {'ETag': '"abc"', 'Last-Modified': 'Mon'})
+        cache = launcher_core.GitHubCache(self.cache_file, session)
+        self.assertEqual(cache.get_json(self.url), [{'tag_name': 'a'}])
+
+        # A fresh instance must pick the entry up from disk
+        session.get.return_value = make_response(304)
+        cache = launcher_core.GitHubCache(self.cache_file, session)
+        self.assertEqual(cache.get_json(self.url), [{'tag_name': 'a'}])
+        headers = session.get.call_args.kwargs['headers']
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(headers['If-Modified-Since'], 'Mon')
+
+    def test_no_validators_without_entry(self):
+        cache = launcher_core.GitHubCache(self.cache_file, MagicMock())
+        headers = cache.conditional_headers(self.url)
+        self.assertNotIn('If-None-Match', headers)
+        self.assertNotIn('If-Modified-Since', headers)
+
+    def test_corrupt_cache_file_is_ignored(self):
+        with open(self.cache_file, 'w') as f:
+            f.write('{not json')
+        cache = launcher_core.GitHubCache(self.cache_file, MagicMock())
+        self.assertEqual(cache.entries, {})
+
+    def test_run_concurrently_isolates_failures(self):
+        def fail():
+            raise TimeoutError("timed out")
+        results, errors = launcher_core.run_concurrently({'stable': lambda: 1, 'bn': fail})
+        self.assertEqual(results, {'stable': 1})
+        self.assertIsInstance(errors['bn'], TimeoutError)
+
+    def test_requests_have_timeout(self):
+        session = MagicMock()
+        session.get.return_value = make_response(200, {})
+        cache = launcher_core.GitHubCache(self.cache_file, session)
+        cache.get_json(self.url)
+        self.assertIn('timeout', session.get.call_args.kwargs)
+
+    def test_stream_json_array_returns_none_on_304(self):
+        session = MagicMock()
+        response = make_response(200, None, {'ETag': '"e"'})
+        response.iter_content.return_value = [b'[{"tag_name": "a"}', b']']
+        session.get.return_value = response
+        cache = launcher_core.GitHubCache(self.cache_file, session)
+        self.assertEqual(list(cache.stream_json_array(self.url)), [{'tag_name': 'a'}])
+        self.assertNotIn('data', cache.entries[self.url])
+        self.assertTrue(response.close.called)
+
+        session.get.return_value = make_response(304)
+        self.assertIsNone(cache.stream_json_array(self.url))
+        self.assertEqual(session.get.call_args.kwargs['headers']['If-None-Match'], '"e"')
+
+    def test_stream_json_array_keeps_validators_of_partly_read_pages_out(self):
+        def broken_body(**kwargs):
+            yield b'[{"tag_name": "a"},'
+            raise ConnectionError("connection reset")
+        session = MagicMock()
+        response = make_response(200, None, {'ETag': '"e"'})
+        response.iter_content.side_effect = broken_body
+        session.get.return_value = response
+        cache = launcher_core.GitHubCache(self.cache_file, session)
+        with self.assertRaises(ConnectionError):
+            list(cache.stream_json_array(self.url))
+        self.assertNotIn(self.url, cache.entries)
+
+        # Stopping early on purpose still counts as having read the page
+        response.iter_content.side_effect = None
+        response.iter_content.return_value = [b'[{"tag_name": "a"}, {"tag_name": "b"}]']
+        releases = cache.stream_json_array(self.url)
+        next(releases)
+        releases.close()
+        self.assertEqual(cache.entries[self.url]['etag'], '"e"')
+
+class RateLimitTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.session = MagicMock()
+        self.cache = launcher_core.GitHubCache(os.path.join(self.temp_dir.name, 'c.json'), self.session, 'tok')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_token_sent_to_api(self):
+        self.session.get.return_value = make_response(200, {})
+        self.cache.get_json('https://api.github.com/x')
+        self.assertEqual(self.session.get.call_args.kwargs['headers']['Authorization'], 'Bearer tok')
+
+    def test_exhausted_limit_blocks_until_reset(self):
+        reset = int(launcher_core.time.time()) + 600
+        self.session.get.return_value = make_response(
+            403, None, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+        with self.assertRaises(launcher_core.RateLimitError):
+            self.cache.get_json('https://api.github.com/x')
+        self.assertEqual(self.cache.blocked_until, reset)
+        # No request goes out while blocked
+        self.session.get.reset_mock()
+        with self.assertRaises(launcher_core.RateLimitError):
+            self.cache.get_json('https://api.github.com/x')
+        self.session.get.assert_not_called()
+        self.assertFalse(self.cache.can_refresh_in_background())
+
+    def test_retry_after(self):
+        self.session.get.return_value = make_response(429, None, {'Retry-After': '120'})
+        with self.assertRaises(launcher_core.RateLimitError):
+            self.cache.get_json('https://api.github.com/x')
+        self.assertGreater(self.cache.blocked_until, launcher_core.time.time() + 100)
+
+    def test_low_remaining_skips_background_refresh(self):
+        self.session.get.return_value = make_response(200, {}, {'X-RateLimit-Remaining': '3'})
+        self.cache.get_json('https://api.github.com/x')
+        self.assertFalse(self.cache.can_refresh_in_background())
+
+class RefreshSchedulerTests(unittest.TestCase):
+    def test_requests_coalesce_while_running(self):
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        def refresh():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+        scheduler = launcher_core.RefreshScheduler(refresh, 0)
+        self.assertTrue(scheduler.request())
+        started.wait(5)
+        self.assertFalse(scheduler.request())
+        self.assertFalse(scheduler.request())
+        release.set()
+        for _ in range(100):
+            if not scheduler.running:
+                break
+            launcher_core.time.sleep(0.01)
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(scheduler.request())
+
+    def test_next_delay_waits_for_reset(self):
+        cache = MagicMock()
+        cache.blocked_until = launcher_core.time.time() + 1000
+        scheduler = launcher_core.RefreshScheduler(lambda: None, 60, cache)
+        self.assertGreater(scheduler.next_delay(), 900)
+
+if __name__ == '__main__':
+    unittest.main()
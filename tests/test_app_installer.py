@@ -0,0 +1,224 @@
+import unittest
+from unittest.mock import patch
+
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import app_installer
+
+DATA = os.path.join('Contents', 'Resources', 'data')
+
+class InstallAppTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.target = os.path.join(self.root, 'experimental')
+        self.store = app_installer.ObjectStore(os.path.join(self.root, 'objects'))
+        self.user_dir = os.path.join(self.root, 'userdata')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def make_build(self, name, files):
+        app = os.path.join(self.root, name, 'Cataclysm.app')
+        for rel, content in files.items():
+            self.write(os.path.join(app, rel), content)
+        os.makedirs(os.path.join(app, 'Contents', 'Frameworks'), exist_ok=True)
+        os.symlink('Versions/Current', os.path.join(app, 'Contents', 'Frameworks', 'Current'))
+        return app
+
+    def install(self, app, tag, target=None, **kwargs):
+        return app_installer.install_app(app, target or self.target, tag, self.store, self.user_dir, **kwargs)
+
+    def installed(self, rel):
+        return os.path.join(app_installer.find_active_app(self.target), rel)
+
+    def test_update_writes_only_changes(self):
+        old = self.make_build('a', {
+            os.path.join(DATA, 'json', 'items.json'): 'items v1',
+            os.path.join(DATA, 'json', 'monsters.json'): 'monsters',
+            os.path.join(DATA, 'gfx', 'tiles.png'): 'tiles',
+        })
+        stats = self.install(old, 'a')
+        self.assertEqual(stats['copied'], 3)
+        unchanged_inode = os.stat(self.installed(os.path.join(DATA, 'gfx', 'tiles.png'))).st_ino
+        self.write(self.installed(os.path.join(DATA, 'save', 'World', 'player.sav')), 'my save')
+
+        new = self.make_build('b', {
+            os.path.join(DATA, 'json', 'items.json'): 'items v2',
+            os.path.join(DATA, 'gfx', 'tiles.png'): 'tiles',
+            os.path.join(DATA, 'json', 'new.json'): 'added',
+        })
+        stats = self.install(new, 'b')
+        self.assertEqual((stats['copied'], stats['linked']), (2, 1))
+        self.assertEqual(self.read(self.installed(os.path.join(DATA, 'json', 'items.json'))), 'items v2')
+        self.assertEqual(os.stat(self.installed(os.path.join(DATA, 'gfx', 'tiles.png'))).st_ino, unchanged_inode)
+        self.assertFalse(os.path.exists(self.installed(os.path.join(DATA, 'json', 'monsters.json'))))
+        # The save made inside the old app was moved out, not carried into the new build
+        self.assertEqual(self.read(os.path.join(self.user_dir, 'save', 'World', 'player.sav')), 'my save')
+        self.assertFalse(os.path.exists(self.installed(os.path.join(DATA, 'save'))))
+        self.assertEqual(os.readlink(self.installed(os.path.join('Contents', 'Frameworks', 'Current'))),
+                         'Versions/Current')
+
+    def test_manifest_skips_hashing_unchanged_files(self):
+        files = {os.path.join(DATA, 'json', name): name for name in ('a.json', 'b.json')}
+        self.install(self.make_build('a', files), 'a')
+        with patch.object(app_installer, 'file_sha256', wraps=app_installer.file_sha256) as sha256:
+            # Reinstalling the same build: size and mtime match the manifest
+            stats = self.install(os.path.join(self.root, 'a', 'Cataclysm.app'), 'a')
+        sha256.assert_not_called()
+        self.assertEqual(stats['linked'], 2)
+        self.assertEqual([build['name'] for build in app_installer.list_builds(self.target)], ['a.2', 'a'])
+
+    def test_failed_build_leaves_install_untouched(self):
+        self.install(self.make_build('a', {'Contents/Info.plist': 'v1'}), 'a')
+        new = self.make_build('b', {'Contents/Info.plist': 'v2'})
+        with patch.object(app_installer, 'copy_file', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.install(new, 'b')
+        self.assertEqual(self.read(self.installed('Contents/Info.plist')), 'v1')
+        self.assertEqual(os.listdir(os.path.join(self.target, 'builds')), ['a'])
+
+    def test_scratch_source_is_linked_into_the_store(self):
+        app = self.make_build('a', {'Contents/Info.plist': 'v1'})
+        stats = self.install(app, 'a', scratch_source=True)
+        self.assertEqual(stats['copied'], 1)
+        source = os.stat(os.path.join(app, 'Contents', 'Info.plist'))
+        obj = os.stat(self.store.path(app_installer.file_sha256(os.path.join(app, 'Contents', 'Info.plist'))))
+        self.assertEqual(obj.st_ino, source.st_ino)
+
+    def test_rollback_is_a_switch_and_keeps_saves(self):
+        self.install(self.make_build('a', {'Contents/Info.plist': 'v1'}), 'a')
+        self.install(self.make_build('b', {'Contents/Info.plist': 'v2'}), 'b')
+        self.write(self.installed(os.path.join(DATA, 'save', 'World', 'player.sav')), 'my save')
+        self.assertEqual(app_installer.switch_build(self.target, 'a', self.user_dir), 'a')
+        self.assertEqual(self.read(self.installed('Contents/Info.plist')), 'v1')
+        self.assertEqual(self.read(os.path.join(self.user_dir, 'save', 'World', 'player.sav')), 'my save')
+        self.assertEqual([build['active'] for build in app_installer.list_builds(self.target)], [False, True])
+
+    def test_keeps_only_the_newest_builds(self):
+        for tag in ('a', 'b', 'c'):
+            self.install(self.make_build(tag, {'Contents/Info.plist': tag}), tag, keep=2)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.target, 'builds'))), ['b', 'c'])
+        app_installer.switch_build(self.target, 'b', self.user_dir)
+        self.install(self.make_build('d', {'Contents/Info.plist': 'd'}), 'd', keep=2)
+        # Builds are kept by install time, so c outlives b even though b was used more recently
+        self.assertEqual(sorted(os.listdir(os.path.join(self.target, 'builds'))), ['c', 'd'])
+
+    def test_migrates_install_from_before_builds(self):
+        build = self.make_build('a', {'Contents/Info.plist': 'v1'})
+        shutil.copytree(build, os.path.join(self.target, 'Cataclysm.app'), symlinks=True)
+        self.assertEqual(app_installer.find_active_app(self.target), os.path.join(self.target, 'Cataclysm.app'))
+        # Identical files of the old install are adopted into the store without copying
+        stats = self.install(build, 'b', legacy_tag='a')
+        self.assertEqual((stats['copied'], stats['linked']), (0, 1))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.target, 'builds'))), ['a', 'b'])
+        self.assertFalse(os.path.exists(os.path.join(self.target, 'Cataclysm.app')))
+
+    def test_recover_drops_interrupted_staging(self):
+        self.install(self.make_build('a', {'Contents/Info.plist': 'v1'}), 'a')
+        os.makedirs(os.path.join(self.target, 'builds', 'b.staging', 'Cataclysm.app'))
+        app_installer.recover(self.target)
+        self.assertEqual(os.listdir(os.path.join(self.target, 'builds')), ['a'])
+
+    def test_adopt_user_data_never_overwrites(self):
+        app = self.make_build('a', {
+            os.path.join(DATA, 'save', 'Old', 'player.sav'): 'stale',
+            os.path.join(DATA, 'save', 'Other', 'player.sav'): 'other',
+            os.path.join(DATA, 'memorial', 'dead.txt'): 'rip',
+        })
+        self.write(os.path.join(self.user_dir, 'save', 'Old', 'player.sav'), 'current')
+        inode = os.stat(os.path.join(app, DATA, 'memorial', 'dead.txt')).st_ino
+        self.assertEqual(app_installer.adopt_user_data(app, self.user_dir), 2)
+        self.assertEqual(self.read(os.path.join(self.user_dir, 'save', 'Old', 'player.sav')), 'current')
+        self.assertEqual(self.read(os.path.join(self.user_dir, 'save', 'Other', 'player.sav')), 'other')
+        # Renamed, not copied
+        self.assertEqual(os.stat(os.path.join(self.user_dir, 'memorial', 'dead.txt')).st_ino, inode)
+        self.assertTrue(os.path.exists(os.path.join(app, DATA, 'save', 'Old', 'player.sav')))
+
+    def test_channels_share_objects_and_gc_drops_unused(self):
+        build = self.make_build('a', {'Contents/Resources/data/json/items.json': 'shared',
+                                      'Contents/Info.plist': 'v1'})
+        stable = os.path.join(self.root, 'stable')
+        self.install(build, 'a')
+        stats = self.install(build, 'a', target=stable)
+        self.assertEqual(stats['copied'], 0)
+        rel = 'Contents/Resources/data/json/items.json'
+        self.assertEqual(os.stat(self.installed(rel)).st_ino,
+                         os.stat(os.path.join(app_installer.find_active_app(stable), rel)).st_ino)
+
+        self.install(self.make_build('b', {'Contents/Info.plist': 'v2'}), 'b', keep=1)
+        # items.json and v1 of Info.plist are still used by stable
+        self.assertEqual(self.store.gc(app_installer.referenced_objects([self.target, stable])), 0)
+        freed = self.store.gc(app_installer.referenced_objects([self.target]))
+        self.assertEqual(freed, len('shared') + len('v1'))
+
+    def test_verify_hashes_only_changed_files(self):
+        files = {os.path.join(DATA, 'json', f'item{index}.json'): f'item {index}' for index in range(5)}
+        files[os.path.join('Contents', 'MacOS', 'Cataclysm')] = 'binary'
+        app = self.make_build('a', files)
+        os.chmod(os.path.join(app, 'Contents', 'MacOS', 'Cataclysm'), 0o755)
+        self.install(app, 'a')
+        build = app_installer.active_build(self.target)
+        report = app_installer.verify_build(build)
+        self.assertEqual(report, {'files': 6, 'hashed': 0, 'damaged': []})
+
+        # Touched but unchanged: hashed once and found intact
+        os.utime(self.installed(os.path.join(DATA, 'json', 'item0.json')), (1, 1))
+        # Same size, different contents
+        with open(self.installed(os.path.join(DATA, 'json', 'item1.json')), 'r+') as f:
+            f.write('ITEM')
+        os.remove(self.installed(os.path.join(DATA, 'json', 'item2.json')))
+        self.write(self.installed(os.path.join(DATA, 'json', 'item3.json')), 'truncated')
+        os.chmod(self.installed(os.path.join('Contents', 'MacOS', 'Cataclysm')), 0o644)
+        report = app_installer.verify_build(build)
+        self.assertEqual(report['hashed'], 2)
+        self.assertEqual(report['damaged'], sorted([
+            os.path.join(DATA, 'json', 'item1.json'), os.path.join(DATA, 'json', 'item2.json'),
+            os.path.join(DATA, 'json', 'item3.json'), os.path.join('Contents', 'MacOS', 'Cataclysm')]))
+
+    def test_repair_from_store_then_source(self):
+        files = {os.path.join(DATA, 'json', 'items.json'): 'items', os.path.join(DATA, 'gfx', 'tiles.png'): 'tiles'}
+        app = self.make_build('a', files)
+        self.install(app, 'a')
+        build = app_installer.active_build(self.target)
+        # Deleted: the store still has the contents
+        os.remove(self.installed(os.path.join(DATA, 'gfx', 'tiles.png')))
+        # Overwritten in place: a hardlinked object was overwritten with it
+        self.write(self.installed(os.path.join(DATA, 'json', 'items.json')), 'oops!')
+        damaged = app_installer.verify_build(build)['damaged']
+        self.assertEqual(len(damaged), 2)
+
+        remaining = app_installer.repair_build(build, damaged, self.store)
+        self.assertEqual(self.read(self.installed(os.path.join(DATA, 'gfx', 'tiles.png'))), 'tiles')
+        if remaining:  # Hardlinked, not cloned
+            self.assertEqual(remaining, [os.path.join(DATA, 'json', 'items.json')])
+            # The damaged object is deleted, so nothing else gets linked to it
+            sha256 = app_installer.load_manifest(build)['files'][remaining[0]][2]
+            self.assertFalse(self.store.has(sha256))
+            remaining = app_installer.repair_build(build, remaining, self.store, app)
+        self.assertEqual(remaining, [])
+        self.assertEqual(self.read(self.installed(os.path.join(DATA, 'json', 'items.json'))), 'items')
+        self.assertEqual(app_installer.verify_build(build), {'files': 2, 'hashed': 0, 'damaged': []})
+
+        # A source without the recorded contents is no help
+        os.remove(self.installed(os.path.join(DATA, 'json', 'items.json')))
+        shutil.rmtree(self.store.store_dir)
+        self.write(os.path.join(app, DATA, 'json', 'items.json'), 'items v2')
+        self.assertEqual(app_installer.repair_build(build, [os.path.join(DATA, 'json', 'items.json')], self.store, app),
+                         [os.path.join(DATA, 'json', 'items.json')])
+
+if __name__ == '__main__':
+    unittest.main()
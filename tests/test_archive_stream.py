@@ -0,0 +1,212 @@
+import unittest
+
+import hashlib
+import io
+import os
+import stat
+import sys
+import tarfile
+import tempfile
+import zipfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import archive_stream
+import downloader
+from test_downloader import FakeSession
+
+URL = 'https://example.com/releases/download/x/cdda-osx.tar.gz'
+MTIME = 1700000000
+
+class Unseekable(io.RawIOBase):
+    """A write-only stream, so zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+def make_tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tar:
+        for name, kind, value, mode in members:
+            info = tarfile.TarInfo(name)
+            info.mode = mode
+            info.mtime = MTIME
+            info.type = kind
+            if kind == tarfile.REGTYPE:
+                info.size = len(value)
+                tar.addfile(info, io.BytesIO(value))
+            else:
+                info.linkname = value
+                tar.addfile(info)
+    return buffer.getvalue()
+
+def zip_member(archive, name, data, mode=0o644, compress=zipfile.ZIP_DEFLATED, file_type=stat.S_IFREG):
+    info = zipfile.ZipInfo(name, date_time=(2024, 1, 2, 3, 4, 6))
+    info.create_system = archive_stream.ZIP_UNIX
+    info.external_attr = (file_type | mode) << 16
+    info.compress_type = compress
+    archive.writestr(info, data)
+
+SAMPLE_TAR = [
+    ('Cataclysm.app', tarfile.DIRTYPE, '', 0o755),
+    ('Cataclysm.app/Contents/MacOS/Cataclysm', tarfile.REGTYPE, b'binary' * 1000, 0o755),
+    ('Cataclysm.app/Contents/Resources/data/json/items.json', tarfile.REGTYPE, b'{"id": "rock"}', 0o644),
+    ('Cataclysm.app/Contents/Resources/data/json/copy.json', tarfile.LNKTYPE,
+     'Cataclysm.app/Contents/Resources/data/json/items.json', 0o644),
+    ('Cataclysm.app/Contents/Frameworks/Current', tarfile.SYMTYPE, 'Versions/A', 0o777),
+]
+
+class ExtractTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dest = os.path.join(self.temp_dir.name, 'out')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def path(self, *parts):
+        return os.path.join(self.dest, 'Cataclysm.app', 'Contents', *parts)
+
+    def read(self, *parts):
+        with open(self.path(*parts), 'rb') as f:
+            return f.read()
+
+    def test_archive_kind(self):
+        self.assertEqual(archive_stream.archive_kind(URL), 'tar')
+        self.assertEqual(archive_stream.archive_kind('https://dl/cdda-osx.TGZ'), 'tar')
+        self.assertEqual(archive_stream.archive_kind('https://dl/cdda-osx.zip'), 'zip')
+        self.assertIsNone(archive_stream.archive_kind('https://dl/cdda-osx.dmg'))
+
+    def test_tar_while_downloading(self):
+        body = make_tar(SAMPLE_TAR)
+        loader = downloader.Downloader(self.temp_dir.name, lambda: FakeSession(body), connections=1)
+        tee = os.path.join(self.temp_dir.name, 'cdda-osx.tar.gz')
+        progress = []
+        with loader.open_stream(URL, lambda done, total: progress.append(done), tee) as stream:
+            archive_stream.extract_archive(stream, 'tar', self.dest)
+            digest = stream.finish(len(body), hashlib.sha256(body).hexdigest())
+        self.assertEqual(digest, hashlib.sha256(body).hexdigest())
+        self.assertEqual(progress[-1], len(body))
+        with open(tee, 'rb') as f:
+            self.assertEqual(f.read(), body)
+
+        self.assertEqual(archive_stream.find_app(self.dest), os.path.join(self.dest, 'Cataclysm.app'))
+        self.assertEqual(self.read('MacOS', 'Cataclysm'), b'binary' * 1000)
+        self.assertEqual(os.stat(self.path('MacOS', 'Cataclysm')).st_mode & 0o777, 0o755)
+        self.assertEqual(os.stat(self.path('MacOS', 'Cataclysm')).st_mtime, MTIME)
+        self.assertEqual(self.read('Resources', 'data', 'json', 'copy.json'), b'{"id": "rock"}')
+        self.assertTrue(os.path.samefile(self.path('Resources', 'data', 'json', 'copy.json'),
+                                         self.path('Resources', 'data', 'json', 'items.json')))
+        self.assertEqual(os.readlink(self.path('Frameworks', 'Current')), 'Versions/A')
+
+    def test_zip_with_sizes_in_headers(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            zip_member(archive, 'build/Cataclysm.app/Contents/MacOS/Cataclysm', b'binary' * 1000, mode=0o755)
+            zip_member(archive, 'build/Cataclysm.app/Contents/Info.plist', b'<plist/>', compress=zipfile.ZIP_STORED)
+            zip_member(archive, 'build/Cataclysm.app/Contents/Frameworks/Current', b'Versions/A',
+                       mode=0o777, file_type=stat.S_IFLNK)
+        buffer.seek(0)
+        archive_stream.extract_archive(buffer, 'zip', self.dest)
+        app = os.path.join(self.dest, 'build', 'Cataclysm.app')
+        self.assertEqual(archive_stream.find_app(self.dest), app)
+        binary = os.path.join(app, 'Contents', 'MacOS', 'Cataclysm')
+        with open(binary, 'rb') as f:
+            self.assertEqual(f.read(), b'binary' * 1000)
+        self.assertEqual(os.stat(binary).st_mode & 0o777, 0o755)
+        with open(os.path.join(app, 'Contents', 'Info.plist'), 'rb') as f:
+            self.assertEqual(f.read(), b'<plist/>')
+        self.assertEqual(os.readlink(os.path.join(app, 'Contents', 'Frameworks', 'Current')), 'Versions/A')
+
+    def test_zip_with_data_descriptors(self):
+        output = Unseekable()
+        with zipfile.ZipFile(output, 'w') as archive:
+            zip_member(archive, 'Cataclysm.app/Contents/MacOS/Cataclysm', os.urandom(200000), mode=0o755)
+            zip_member(archive, 'Cataclysm.app/Contents/Info.plist', b'<plist/>' * 100)
+        archive_stream.extract_archive(io.BytesIO(bytes(output.data)), 'zip', self.dest)
+        self.assertEqual(self.read('Info.plist'), b'<plist/>' * 100)
+        self.assertEqual(os.stat(self.path('MacOS', 'Cataclysm')).st_mode & 0o777, 0o755)
+
+        # Streamed zip64 entries end in a descriptor with 8-byte sizes
+        output = Unseekable()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in (('Cataclysm.app/Contents/PkgInfo', b'APPL????'),
+                               ('Cataclysm.app/Contents/Info.plist', b'<plist>64</plist>')):
+                with archive.open(name, 'w', force_zip64=True) as f:
+                    f.write(data)
+        archive_stream.extract_archive(io.BytesIO(bytes(output.data)), 'zip', self.dest)
+        self.assertEqual(self.read('PkgInfo'), b'APPL????')
+        self.assertEqual(self.read('Info.plist'), b'<plist>64</plist>')
+
+        # Without a size up front there is no telling where stored data ends
+        output = Unseekable()
+        with zipfile.ZipFile(output, 'w') as archive:
+            zip_member(archive, 'Cataclysm.app/Info.plist', b'<plist/>', compress=zipfile.ZIP_STORED)
+        with self.assertRaisesRegex(archive_stream.ArchiveError, 'stored'):
+            archive_stream.extract_archive(io.BytesIO(bytes(output.data)), 'zip', self.dest)
+
+    def test_select_extracts_only_some_members(self):
+        wanted = {'Cataclysm.app/Contents/MacOS/Cataclysm', 'build/Cataclysm.app/Contents/Info.plist'}
+        archive_stream.extract_archive(io.BytesIO(make_tar(SAMPLE_TAR)), 'tar', self.dest, wanted.__contains__)
+        self.assertEqual(self.read('MacOS', 'Cataclysm'), b'binary' * 1000)
+        self.assertEqual(os.listdir(self.path()), ['MacOS'])
+
+        output = Unseekable()
+        with zipfile.ZipFile(output, 'w') as archive:
+            zip_member(archive, 'build/Cataclysm.app/Contents/MacOS/Cataclysm', os.urandom(50000), mode=0o755)
+            zip_member(archive, 'build/Cataclysm.app/Contents/Info.plist', b'<plist/>', mode=0o600)
+        dest = os.path.join(self.temp_dir.name, 'zip')
+        archive_stream.extract_archive(io.BytesIO(bytes(output.data)), 'zip', dest, wanted.__contains__)
+        plist = os.path.join(dest, 'build', 'Cataclysm.app', 'Contents', 'Info.plist')
+        with open(plist, 'rb') as f:
+            self.assertEqual(f.read(), b'<plist/>')
+        self.assertEqual(os.stat(plist).st_mode & 0o777, 0o600)
+        self.assertEqual(os.listdir(os.path.dirname(plist)), ['Info.plist'])
+
+    def test_rejects_paths_outside_the_destination(self):
+        outside = os.path.join(self.temp_dir.name, 'outside')
+        os.mkdir(outside)
+        with open(os.path.join(outside, 'secret'), 'wb') as f:
+            f.write(b'secret')
+        for members in (
+            [('../evil', tarfile.REGTYPE, b'x', 0o644)],
+            [('/tmp/evil', tarfile.REGTYPE, b'x', 0o644)],
+            [('link', tarfile.SYMTYPE, outside, 0o777), ('link/evil', tarfile.REGTYPE, b'x', 0o644)],
+            # A hardlink through an earlier symlink would link a file outside into the build
+            [('x', tarfile.SYMTYPE, os.path.join(outside, 'secret'), 0o777), ('y', tarfile.LNKTYPE, 'x', 0o644)],
+        ):
+            with self.assertRaisesRegex(archive_stream.ArchiveError, 'Unsafe'):
+                archive_stream.extract_archive(io.BytesIO(make_tar(members)), 'tar', self.dest)
+        # A file named like an earlier symlink replaces the link instead of writing through it
+        target = os.path.join(outside, 'target')
+        with open(target, 'wb') as f:
+            f.write(b'original')
+        archive_stream.extract_archive(io.BytesIO(make_tar([
+            ('file', tarfile.SYMTYPE, target, 0o777), ('file', tarfile.REGTYPE, b'new', 0o644)])), 'tar', self.dest)
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'original')
+        self.assertEqual(sorted(os.listdir(outside)), ['secret', 'target'])
+        self.assertEqual(os.stat(os.path.join(outside, 'secret')).st_nlink, 1)
+
+    def test_stream_checks_the_download(self):
+        body = make_tar(SAMPLE_TAR)
+        loader = downloader.Downloader(self.temp_dir.name, lambda: FakeSession(body), connections=1)
+        with loader.open_stream(URL) as stream:
+            archive_stream.extract_archive(stream, 'tar', self.dest)
+            with self.assertRaises(downloader.IntegrityError):
+                stream.finish(sha256='0' * 64)
+
+        session = FakeSession(body)
+        session.fail_after = 0
+        loader = downloader.Downloader(self.temp_dir.name, lambda: session, connections=1)
+        with loader.open_stream(URL) as stream, self.assertRaises(ConnectionError):
+            archive_stream.extract_archive(stream, 'tar', os.path.join(self.temp_dir.name, 'failed'))
+
+if __name__ == '__main__':
+    unittest.main()
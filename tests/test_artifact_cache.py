@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch
+
+import hashlib
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import artifact_cache
+
+URL = 'https://example.com/releases/download/a/cdda-osx.dmg'
+
+class ArtifactCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, 'artifacts')
+        self.downloads = os.path.join(self.temp_dir.name, 'downloads')
+        os.makedirs(self.downloads)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def download(self, body, name='cdda-osx.dmg'):
+        path = os.path.join(self.downloads, name)
+        with open(path, 'wb') as f:
+            f.write(body)
+        return path
+
+    def test_add_moves_into_cache_and_lookup_hits(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 1000)
+        path = cache.add(URL, self.download(b'build a'))
+        sha256 = hashlib.sha256(b'build a').hexdigest()
+        self.assertEqual(os.path.basename(path), sha256 + '.dmg')
+        self.assertFalse(os.listdir(self.downloads))
+        # A fresh instance reads the persisted index
+        reloaded = artifact_cache.ArtifactCache(self.cache_dir, 1000)
+        self.assertEqual(reloaded.lookup(URL), path)
+        self.assertTrue(reloaded.contains(path))
+
+    def test_lookup_by_digest_and_dedup(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 1000)
+        path = cache.add(URL, self.download(b'same bytes'))
+        other = 'https://mirror.example.com/cdda-osx.dmg'
+        digest = 'sha256:' + hashlib.sha256(b'same bytes').hexdigest()
+        self.assertEqual(cache.lookup(other, digest), path)
+        self.assertEqual(cache.add(other, self.download(b'same bytes')), path)
+        self.assertEqual(len(cache.entries()), 1)
+        self.assertEqual(cache.entries()[0]['urls'], sorted([URL, other]))
+
+    def test_evicts_least_recently_used(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 25)
+        with patch('artifact_cache.time.time', side_effect=[1, 2, 3, 4]):
+            cache.add('https://example.com/a.dmg', self.download(b'a' * 10))
+            cache.add('https://example.com/b.dmg', self.download(b'b' * 10))
+            cache.lookup('https://example.com/a.dmg')  # a is now newer than b
+            cache.add('https://example.com/c.dmg', self.download(b'c' * 10))
+        self.assertIsNotNone(cache.lookup('https://example.com/a.dmg'))
+        self.assertIsNone(cache.lookup('https://example.com/b.dmg'))
+        self.assertEqual(cache.total_bytes(), 20)
+
+    def test_pinned_artifact_survives_eviction(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 15)
+        a = cache.add('https://example.com/a.dmg', self.download(b'a' * 10))
+        # One channel is still extracting a when another channel's install adds b
+        self.assertEqual(cache.lookup('https://example.com/a.dmg', pin=True), a)
+        cache.add('https://example.com/b.dmg', self.download(b'b' * 10))
+        self.assertTrue(os.path.exists(a))
+        self.assertEqual(cache.total_bytes(), 20)  # Over budget until a is released
+        cache.unpin(a)
+        cache.prune()
+        self.assertFalse(os.path.exists(a))
+        self.assertIsNotNone(cache.lookup('https://example.com/b.dmg'))
+
+    def test_newest_artifact_kept_even_over_budget(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 5)
+        path = cache.add(URL, self.download(b'x' * 10))
+        self.assertTrue(os.path.exists(path))
+
+    def test_disabled_leaves_file_in_place(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 0)
+        path = self.download(b'build')
+        self.assertEqual(cache.add(URL, path), path)
+        self.assertFalse(cache.contains(path))
+        self.assertIsNone(cache.lookup(URL))
+
+    def test_missing_file_is_a_miss(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 1000)
+        os.remove(cache.add(URL, self.download(b'build')))
+        self.assertIsNone(cache.lookup(URL))
+        self.assertEqual(cache.entries(), [])
+
+    def test_prune_removes_strays_and_clears(self):
+        cache = artifact_cache.ArtifactCache(self.cache_dir, 1000)
+        cache.add(URL, self.download(b'build'))
+        with open(os.path.join(self.cache_dir, 'leftover.dmg'), 'wb') as f:
+            f.write(b'12345678')
+        self.assertEqual(cache.prune(), 8)
+        self.assertEqual(cache.prune(0), 5)
+        self.assertEqual(os.listdir(self.cache_dir), ['index.json'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+import unittest
+from unittest.mock import patch
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+import cdda_cli
+import downloader
+import launcher_core
+
+class CliTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_path = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            code = cdda_cli.main(['--base-path', self.base_path] + list(argv))
+        return code, output.getvalue()
+
+    def test_never_imports_gui_or_network_stack(self):
+        code = ("import sys, cdda_cli; "
+                "cdda_cli.main(['--base-path', sys.argv[1], 'status']); "
+                "print([m for m in ('customtkinter', 'tkinter', 'requests') if m in sys.modules])")
+        output = subprocess.run([sys.executable, '-c', code, self.base_path], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], '[]')
+
+    def test_status_offline(self):
+        code, output = self.run_cli('status')
+        self.assertEqual(code, 0)
+        self.assertIn('experimental', output)
+        self.assertIn('Not installed', output)
+
+    def test_status_reports_update(self):
+        os.makedirs(os.path.join(self.base_path, 'bn', 'Cataclysm.app'))
+        core = launcher_core.LauncherCore(self.base_path)
+        core.set_installed_version('bn', 'bn-old')
+        core.release_index.set_pointer(launcher_core.BN_RELEASES_URL, 'latest',
+                                       {'tag_name': 'bn-new', 'assets': []})
+        core.release_index.refresh_pointers(launcher_core.BN_RELEASES_URL)
+        code, output = self.run_cli('status')
+        bn_line = [line for line in output.splitlines() if line.startswith('bn')][0]
+        self.assertIn('bn-new', bn_line)
+        self.assertIn('bn-old', bn_line)
+        self.assertIn('update available', bn_line)
+
+    def test_launch_missing_build_fails(self):
+        with redirect_stdout(io.StringIO()), patch('sys.stderr', new=io.StringIO()) as stderr:
+            code = cdda_cli.main(['--base-path', self.base_path, 'launch', 'stable'])
+        self.assertEqual(code, 1)
+        self.assertIn('No .app found in stable folder', stderr.getvalue())
+
+    @patch('subprocess.Popen')
+    def test_launch(self, popen):
+        app = os.path.join(self.base_path, 'stable', 'Cataclysm.app')
+        save = os.path.join(app, 'Contents', 'Resources', 'data', 'save', 'World')
+        os.makedirs(save)
+        code, _ = self.run_cli('launch', 'stable')
+        self.assertEqual(code, 0)
+        user_dir = os.path.join(self.base_path, 'userdata', 'stable')
+        popen.assert_called_once_with(['open', app, '--args', '--userdir', user_dir + os.sep])
+        # Saves left inside the app are moved out before the game starts
+        self.assertFalse(os.path.exists(save))
+        self.assertTrue(os.path.isdir(os.path.join(user_dir, 'save', 'World')))
+
+    def test_snapshot_and_restore_saves(self):
+        save = os.path.join(self.base_path, 'userdata', 'bn', 'save', 'World', 'player.sav')
+        os.makedirs(os.path.dirname(save))
+        with open(save, 'w') as f:
+            f.write('alive')
+        code, output = self.run_cli('snapshots', 'bn', '--take')
+        self.assertEqual(code, 0)
+        self.assertIn('manual', output)
+        with open(save, 'w') as f:
+            f.write('dead')
+        code, output = self.run_cli('restore', 'bn')
+        self.assertEqual(code, 0)
+        with open(save) as f:
+            self.assertEqual(f.read(), 'alive')
+        # The saves that were replaced can be restored in turn
+        _, output = self.run_cli('snapshots', 'bn')
+        self.assertIn('before restoring', output)
+
+    def test_restore_can_be_undone_with_snapshots_off(self):
+        with open(os.path.join(self.base_path, 'config.json'), 'w') as f:
+            f.write('{"save_snapshots": false}')
+        save = os.path.join(self.base_path, 'userdata', 'bn', 'save', 'World', 'player.sav')
+        os.makedirs(os.path.dirname(save))
+        with open(save, 'w') as f:
+            f.write('alive')
+        core = launcher_core.LauncherCore(self.base_path)
+        self.assertIsNone(core.snapshot_saves('bn', 'before launch'))
+        old = core.snapshot_saves('bn', 'manual', force=True)['id']
+        with open(save, 'w') as f:
+            f.write('dead')
+        core.restore_snapshot('bn', old)
+        undo = [snapshot for snapshot in core.list_snapshots('bn') if snapshot['id'] != old]
+        self.assertEqual([snapshot['label'] for snapshot in undo], [f'before restoring {old}'])
+        core.restore_snapshot('bn', undo[0]['id'])
+        with open(save) as f:
+            self.assertEqual(f.read(), 'dead')
+
+    def test_install_failure_is_one_line_not_a_traceback(self):
+        for error in (downloader.IntegrityError("sha256 mismatch"),
+                      ConnectionResetError("connection reset")):
+            with patch.object(launcher_core.LauncherCore, 'fetch_releases', return_value={}), \
+                    patch.object(launcher_core.LauncherCore, 'resolve_download', return_value=('https://x/a.dmg', 'a')), \
+                    patch.object(launcher_core.LauncherCore, 'install_version', side_effect=error), \
+                    redirect_stdout(io.StringIO()), patch('sys.stderr', new=io.StringIO()) as stderr:
+                code = cdda_cli.main(['--base-path', self.base_path, 'install', 'stable'])
+            self.assertEqual(code, 1)
+            self.assertEqual(stderr.getvalue(), f"{error}\n")
+
+    def test_rollback_without_other_builds_fails(self):
+        with redirect_stdout(io.StringIO()), patch('sys.stderr', new=io.StringIO()) as stderr:
+            code = cdda_cli.main(['--base-path', self.base_path, 'rollback', 'experimental'])
+        self.assertEqual(code, 1)
+        self.assertIn('No other experimental build installed', stderr.getvalue())
+
+class LauncherCoreTests(unittest.TestCase):
+    def test_install_reads_dmg_without_hdiutil(self):
+        sys.path.insert(0, os.path.join(ROOT, 'tests'))
+        from dmg_builder import File, build_dmg
+        with tempfile.TemporaryDirectory() as base_path:
+            dmg = os.path.join(base_path, 'game.dmg')
+            build_dmg(dmg, {'Cataclysm.app': {'Contents': {
+                'Info.plist': b'<plist/>', 'MacOS': {'Cataclysm': File(b'binary', mode=0o755)}}}})
+            core = launcher_core.LauncherCore(base_path)
+            with patch.object(core.artifacts, 'lookup', return_value=dmg), \
+                    patch.object(core.artifacts, 'contains', return_value=True), \
+                    patch('subprocess.run') as run, patch('subprocess.Popen') as popen:
+                core.install_version('stable', 'https://example.com/game.dmg', 'build-1')
+            run.assert_not_called()
+            popen.assert_not_called()
+            app = core.find_app('stable')
+            with open(os.path.join(app, 'Contents', 'MacOS', 'Cataclysm'), 'rb') as f:
+                self.assertEqual(f.read(), b'binary')
+            self.assertEqual(core.get_installed_version('stable'), 'build-1')
+            self.assertFalse(os.path.exists(os.path.join(core.downloads_dir, 'extract-stable')))
+
+    def test_install_extracts_archive_while_downloading(self):
+        sys.path.insert(0, os.path.join(ROOT, 'tests'))
+        from test_archive_stream import SAMPLE_TAR, make_tar
+        from test_downloader import FakeSession
+        url = 'https://example.com/releases/download/x/cdda-osx.tar.gz'
+        body = make_tar(SAMPLE_TAR)
+        with tempfile.TemporaryDirectory() as base_path:
+            core = launcher_core.LauncherCore(base_path)
+            core.downloader.get_session = lambda: FakeSession(body)
+            statuses = []
+            core.install_version('stable', url, 'build-1', on_status=statuses.append)
+            self.assertIn("Downloading and extracting stable version...", statuses)
+            with open(os.path.join(core.find_app('stable'), 'Contents', 'MacOS', 'Cataclysm'), 'rb') as f:
+                self.assertEqual(f.read(), b'binary' * 1000)
+            self.assertEqual(os.listdir(core.downloads_dir), [])
+            # A copy was kept on the way past, so a reinstall needs no download
+            cached = core.artifacts.lookup(url)
+            with open(cached, 'rb') as f:
+                self.assertEqual(f.read(), body)
+            core.downloader.get_session = None
+            statuses = []
+            core.install_version('stable', url, 'build-1', on_status=statuses.append)
+            self.assertIn("Extracting archive...", statuses)
+
+    def test_repair_rewrites_only_damaged_files(self):
+        sys.path.insert(0, os.path.join(ROOT, 'tests'))
+        import archive_stream
+        from test_archive_stream import SAMPLE_TAR, make_tar
+        from test_downloader import FakeSession
+        url = 'https://example.com/releases/download/x/cdda-osx.tar.gz'
+        with tempfile.TemporaryDirectory() as base_path:
+            core = launcher_core.LauncherCore(base_path)
+            core.downloader.get_session = lambda: FakeSession(make_tar(SAMPLE_TAR))
+            core.install_version('stable', url, 'build-1')
+            app = core.find_app('stable')
+            binary = os.path.join(app, 'Contents', 'MacOS', 'Cataclysm')
+            with open(binary, 'r+b') as f:
+                f.write(b'BROKEN')
+            os.remove(os.path.join(app, 'Contents', 'Resources', 'data', 'json', 'items.json'))
+
+            output = io.StringIO()
+            with redirect_stdout(output):
+                self.assertEqual(cdda_cli.main(['--base-path', base_path, 'verify', 'stable']), 1)
+            self.assertIn('damaged: Contents/MacOS/Cataclysm', output.getvalue())
+
+            with patch.object(archive_stream, 'prepare_file', wraps=archive_stream.prepare_file) as prepare:
+                report = core.repair_install('stable')
+            self.assertEqual(len(report['damaged']), 2)
+            # The deleted file came back from the object store; only the overwritten one was extracted
+            self.assertLessEqual(prepare.call_count, 1)
+            with open(binary, 'rb') as f:
+                self.assertEqual(f.read(), b'binary' * 1000)
+            self.assertEqual(core.verify_install('stable')['damaged'], [])
+            self.assertEqual(os.listdir(core.downloads_dir), [])
+
+    def test_installed_version_recorded_per_channel(self):
+        with tempfile.TemporaryDirectory() as base_path:
+            core = launcher_core.LauncherCore(base_path)
+            core.set_installed_version('bn', 'bn-1')
+            reloaded = launcher_core.LauncherCore(base_path)
+            self.assertEqual(reloaded.installed_bn_version, 'bn-1')
+            self.assertIsNone(reloaded.installed_stable_version)
+
+    def test_build_behind_current_counts_as_installed(self):
+        with tempfile.TemporaryDirectory() as base_path:
+            core = launcher_core.LauncherCore(base_path)
+            channel = core.get_game_path('stable')
+            build = os.path.join(channel, 'builds', 'build-1')
+            os.makedirs(os.path.join(build, 'Cataclysm.app'))
+            launcher_core.app_installer.activate(channel, build)
+            core.set_installed_version('stable', 'build-1')
+            self.assertEqual(core.get_installed_version('stable'), 'build-1')
+            self.assertIsNone(core.get_installed_version('bn'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+import os
+import stat
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import copy_engine
+
+class CopyTreeTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.temp_dir.name, 'src')
+        self.dst = os.path.join(self.temp_dir.name, 'dst')
+        for index in range(50):
+            path = os.path.join(self.src, f"dir{index % 5}", f"file{index}.json")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write("x" * index)
+        os.chmod(os.path.join(self.src, 'dir1', 'file1.json'), 0o755)
+        os.symlink('dir0', os.path.join(self.src, 'link'))
+        os.utime(os.path.join(self.src, 'dir2'), (1000000000, 1000000000))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_copies_tree_with_metadata(self):
+        progress = []
+        lock = threading.Lock()
+        def on_progress(done, total):
+            with lock:
+                progress.append((done, total))
+        copied = copy_engine.copy_tree(self.src, self.dst, workers=4, on_progress=on_progress)
+        self.assertEqual(copied, sum(range(50)))
+        self.assertEqual(len(progress), 50)
+        self.assertEqual(max(progress), (copied, copied))
+        for index in range(50):
+            with open(os.path.join(self.dst, f"dir{index % 5}", f"file{index}.json")) as f:
+                self.assertEqual(f.read(), "x" * index)
+        self.assertEqual(os.readlink(os.path.join(self.dst, 'link')), 'dir0')
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.join(self.dst, 'dir1', 'file1.json')).st_mode), 0o755)
+        self.assertEqual(os.stat(os.path.join(self.dst, 'dir2')).st_mtime, 1000000000)
+
+    def test_parallel_map_raises_first_error(self):
+        def fail_on_seven(item):
+            if item == 7:
+                raise OSError("disk full")
+        with self.assertRaises(OSError):
+            copy_engine.parallel_map(fail_on_seven, range(100), workers=4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import dmg_reader
+from dmg_builder import File, HardLink, Symlink, build_dmg
+
+MTIME = 1700000000
+
+def sample_tree(rng):
+    return {
+        'Cataclysm.app': {
+            'Contents': {
+                'Info.plist': b'<plist>v1</plist>',
+                'MacOS': {'Cataclysm': File(rng.randbytes(50000), mode=0o755)},
+                'Resources': {
+                    'data': {
+                        'json': {f"item{index}.json": b'{"id": "rock"} ' * index for index in range(40)},
+                        'gfx': {'tiles.png': File(rng.randbytes(70000), fragments=10)},
+                        'empty.txt': b'',
+                        'a:b.txt': b'colon',
+                    },
+                    'sparse.bin': bytes(40000) + b'end',
+                },
+                'Frameworks': {
+                    'SDL2.framework': {
+                        'Versions': {'A': {'SDL2': b'library'}},
+                        'Current': Symlink('Versions/A'),
+                    },
+                },
+                'PkgInfo': HardLink(b'APPL????'),
+            },
+        },
+        'Applications': Symlink('/Applications'),
+    }
+
+class ExtractAppTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.dmg = os.path.join(self.root, 'game.dmg')
+        self.dest = os.path.join(self.root, 'out')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, *parts):
+        with open(os.path.join(self.dest, 'Cataclysm.app', 'Contents', *parts), 'rb') as f:
+            return f.read()
+
+    def check_tree(self, tree):
+        contents = tree['Cataclysm.app']['Contents']
+        data = contents['Resources']['data']
+        self.assertEqual(self.read('Info.plist'), b'<plist>v1</plist>')
+        self.assertEqual(self.read('MacOS', 'Cataclysm'), contents['MacOS']['Cataclysm'].data)
+        for name, content in data['json'].items():
+            self.assertEqual(self.read('Resources', 'data', 'json', name), content)
+        # Split over ten extents, the last two in the extents overflow file
+        self.assertEqual(self.read('Resources', 'data', 'gfx', 'tiles.png'), data['gfx']['tiles.png'].data)
+        self.assertEqual(self.read('Resources', 'data', 'empty.txt'), b'')
+        self.assertEqual(self.read('Resources', 'data', 'a:b.txt'), b'colon')
+        self.assertEqual(self.read('Resources', 'sparse.bin'), bytes(40000) + b'end')
+        self.assertEqual(self.read('PkgInfo'), b'APPL????')
+        self.assertEqual(os.readlink(os.path.join(self.dest, 'Cataclysm.app', 'Contents', 'Frameworks',
+                                                  'SDL2.framework', 'Current')), 'Versions/A')
+        executable = os.stat(os.path.join(self.dest, 'Cataclysm.app', 'Contents', 'MacOS', 'Cataclysm'))
+        self.assertEqual(executable.st_mode & 0o777, 0o755)
+        self.assertEqual(executable.st_mtime, MTIME)
+        self.assertEqual(os.stat(os.path.join(self.dest, 'Cataclysm.app')).st_mtime, MTIME)
+
+    def test_extracts_zlib_image(self):
+        tree = sample_tree(random.Random(1))
+        build_dmg(self.dmg, tree, mtime=MTIME)
+        progress = []
+        app = dmg_reader.extract_app(self.dmg, self.dest,
+                                     on_progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(app, os.path.join(self.dest, 'Cataclysm.app'))
+        self.check_tree(tree)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        # Only the app is extracted, not the rest of the volume
+        self.assertEqual(os.listdir(self.dest), ['Cataclysm.app'])
+
+    def test_extracts_bzip2_image_serially(self):
+        tree = sample_tree(random.Random(2))
+        build_dmg(self.dmg, tree, chunk_sectors=64, compression='bzip2', mtime=MTIME)
+        dmg_reader.extract_app(self.dmg, self.dest, workers=1)
+        self.check_tree(tree)
+
+    def test_extracts_only_the_given_paths(self):
+        tree = sample_tree(random.Random(4))
+        build_dmg(self.dmg, tree, mtime=MTIME)
+        wanted = os.path.join('Contents', 'Resources', 'data', 'gfx', 'tiles.png')
+        app = dmg_reader.extract_app(self.dmg, self.dest, paths=[wanted, os.path.join('Contents', 'PkgInfo')])
+        self.assertEqual(self.read('Resources', 'data', 'gfx', 'tiles.png'),
+                         tree['Cataclysm.app']['Contents']['Resources']['data']['gfx']['tiles.png'].data)
+        self.assertEqual(self.read('PkgInfo'), b'APPL????')
+        self.assertEqual(sorted(os.listdir(os.path.join(app, 'Contents'))), ['PkgInfo', 'Resources'])
+        self.assertEqual(os.listdir(os.path.join(app, 'Contents', 'Resources', 'data')), ['gfx'])
+
+    def test_rejects_what_it_cannot_read(self):
+        with open(self.dmg, 'wb') as f:
+            f.write(b'not a disk image' * 100)
+        with self.assertRaisesRegex(dmg_reader.DmgError, 'koly'):
+            dmg_reader.extract_app(self.dmg, self.dest)
+
+        build_dmg(self.dmg, {'Cataclysm.app': {}}, partition_name='Apple_APFS')
+        with self.assertRaisesRegex(dmg_reader.DmgError, 'APFS'):
+            dmg_reader.extract_app(self.dmg, self.dest)
+
+        build_dmg(self.dmg, {'Cataclysm.app': {'Contents': {'Info.plist': File(b'x', hfs_compressed=True)}}})
+        with self.assertRaisesRegex(dmg_reader.DmgError, 'compressed'):
+            dmg_reader.extract_app(self.dmg, os.path.join(self.root, 'compressed'))
+
+        build_dmg(self.dmg, {'README': b'no app here'})
+        with self.assertRaisesRegex(dmg_reader.DmgError, r'\.app'):
+            dmg_reader.extract_app(self.dmg, self.dest)
+
+    def test_damaged_chunk_is_an_error(self):
+        build_dmg(self.dmg, sample_tree(random.Random(3)))
+        with dmg_reader.UdifImage(self.dmg) as image:
+            chunk = [chunk for chunk in image.chunks if chunk.kind == dmg_reader.CHUNK_ZLIB][-1]
+        with open(self.dmg, 'r+b') as f:
+            f.seek(chunk.offset + chunk.size // 2)
+            f.write(b'\xff' * 8)
+        with self.assertRaises(dmg_reader.DmgError):
+            dmg_reader.extract_app(self.dmg, self.dest)
+
+    def test_truncated_or_corrupted_image_is_a_dmg_error(self):
+        build_dmg(self.dmg, sample_tree(random.Random(4)))
+        with open(self.dmg, 'rb') as f:
+            original = f.read()
+        plist_offset = original.rfind(b'<?xml')
+        broken_xml = original[:plist_offset + 40] + b'<<' + original[plist_offset + 42:]
+        with open(self.dmg, 'wb') as f:
+            f.write(broken_xml)
+        with self.assertRaisesRegex(dmg_reader.DmgError, 'partition map'):
+            dmg_reader.extract_app(self.dmg, self.dest)
+
+        # Anything else the parsers trip over must come out as DmgError too
+        rng = random.Random(5)
+        damaged = [original[:len(original) // 2] + original[-512:]]  # Truncated, trailer kept
+        for _ in range(40):
+            data = bytearray(original)
+            for _ in range(8):
+                data[rng.randrange(len(data))] = rng.randrange(256)
+            damaged.append(bytes(data))
+        for index, data in enumerate(damaged):
+            with open(self.dmg, 'wb') as f:
+                f.write(data)
+            try:
+                dmg_reader.extract_app(self.dmg, os.path.join(self.root, f'out{index}'))
+            except dmg_reader.DmgError:
+                pass
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+import unittest
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import downloader
+
+URL = 'https://example.com/releases/download/x/cdda-osx.dmg'
+
+class FakeResponse:
+    def __init__(self, status_code, body, headers, fail_after=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers
+        self.fail_after = fail_after
+        self.closed = False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise IOError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise ConnectionError("connection reset")
+            yield self.body[start:start + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+class FakeSession:
+    """Serves one file with Range/If-Range semantics like GitHub's asset CDN."""
+    def __init__(self, body, etag='"v1"', ranges=True):
+        self.body = body
+        self.etag = etag
+        self.ranges = ranges
+        self.fail_after = None
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        with self.lock:
+            self.requests.append(headers)
+        response_headers = {'ETag': self.etag}
+        if_range = headers.get('If-Range')
+        if self.ranges and 'Range' in headers and if_range in (None, self.etag):
+            first, last = headers['Range'].split('=')[1].split('-')
+            start = int(first)
+            end = int(last) + 1 if last else len(self.body)
+            if start >= len(self.body):
+                return FakeResponse(416, b'', response_headers)
+            body = self.body[start:end]
+            response_headers['content-length'] = str(len(body))
+            response_headers['Content-Range'] = f'bytes {start}-{end - 1}/{len(self.body)}'
+            fail_after = None
+            if self.fail_after is not None and start > 0:
+                fail_after = self.fail_after
+            return FakeResponse(206, body, response_headers, fail_after)
+        response_headers['content-length'] = str(len(self.body))
+        return FakeResponse(200, self.body, response_headers, self.fail_after)
+
+class DownloaderTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.body = os.urandom(300 * 1024)
+        self.session = FakeSession(self.body)
+        self.downloader = downloader.Downloader(self.temp_dir.name, lambda: self.session, connections=1)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_restarts_when_server_ignores_ranges(self):
+        self.interrupted_download()
+        self.session.ranges = False
+        path, _ = self.downloader.download(URL)
+        self.assertEqual(self.read(path), self.body)
+
+    def interrupted_download(self):
+        self.session.fail_after = 128 * 1024
+        with self.assertRaises(ConnectionError):
+            self.downloader.download(URL)
+        self.session.fail_after = None
+
+    def test_fresh_download(self):
+        progress = []
+        path, digest = self.downloader.download(URL, lambda done, total: progress.append((done, total)))
+        self.assertEqual(self.read(path), self.body)
+        self.assertEqual(digest, hashlib.sha256(self.body).hexdigest())
+        self.assertEqual(progress[-1], (len(self.body), len(self.body)))
+        self.assertFalse(os.path.exists(path + '.part.json'))
+
+    def test_resumes_after_interruption(self):
+        self.interrupted_download()
+        _, part_path, _ = self.downloader.paths(URL)
+        self.assertEqual(os.path.getsize(part_path), 128 * 1024)
+
+        progress = []
+        path, digest = self.downloader.download(URL, lambda done, total: progress.append(done))
+        self.assertEqual(self.session.requests[-1]['Range'], f'bytes={128 * 1024}-')
+        self.assertEqual(self.session.requests[-1]['If-Range'], '"v1"')
+        self.assertEqual(progress[0], 128 * 1024 + downloader.DOWNLOAD_CHUNK_SIZE)
+        self.assertEqual(self.read(path), self.body)
+        self.assertEqual(digest, hashlib.sha256(self.body).hexdigest())
+
+    def test_restarts_when_asset_changed(self):
+        self.interrupted_download()
+        self.session.body = os.urandom(200 * 1024)
+        self.session.etag = '"v2"'
+        path, _ = self.downloader.download(URL)
+        self.assertEqual(self.read(path), self.session.body)
+
+    def test_verifies_published_size_and_digest(self):
+        sha256 = hashlib.sha256(self.body).hexdigest()
+        path, digest = self.downloader.download(URL, size=len(self.body), sha256=sha256.upper())
+        self.assertEqual(digest, sha256)
+
+    def test_corrupt_download_refetched_then_rejected(self):
+        with self.assertRaises(downloader.IntegrityError):
+            self.downloader.download(URL, sha256='0' * 64)
+        self.assertEqual(len(self.session.requests), 2)  # One retry from scratch
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_truncated_download_rejected(self):
+        with self.assertRaises(downloader.IntegrityError):
+            self.downloader.download(URL, size=len(self.body) + 1)
+
+    def test_discard_removes_partial_state(self):
+        self.interrupted_download()
+        final_path, part_path, meta_path = self.downloader.paths(URL)
+        self.downloader.discard(final_path)
+        self.assertFalse(os.path.exists(part_path))
+        self.assertFalse(os.path.exists(meta_path))
+
+class ThrottleTests(unittest.TestCase):
+    @patch('downloader.time.sleep')
+    @patch('downloader.time.monotonic', return_value=100.0)
+    def test_sleeps_once_over_rate(self, monotonic, sleep):
+        throttle = downloader.Throttle(1000)
+        throttle.consume(250)  # Within the burst allowance
+        throttle.consume(1000)
+        sleep.assert_called_once_with(1.0)
+
+    @patch('downloader.time.sleep')
+    def test_unlimited(self, sleep):
+        downloader.Throttle(0).consume(10 ** 9)
+        sleep.assert_not_called()
+
+@patch.object(downloader, 'MIN_SEGMENT_SIZE', 64 * 1024)
+class SegmentedDownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.body = os.urandom(1024 * 1024 + 123)
+        self.session = FakeSession(self.body)
+        self.downloader = downloader.Downloader(self.temp_dir.name, lambda: self.session, connections=4)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_split_segments_covers_file(self):
+        segments = downloader.split_segments(1000 * 1024, 3)
+        self.assertEqual(len(segments), 3)
+        self.assertEqual(segments[0][0], 0)
+        self.assertEqual(segments[-1][1], 1000 * 1024)
+        for previous, current in zip(segments, segments[1:]):
+            self.assertEqual(previous[1], current[0])
+
+    def test_parallel_segments(self):
+        progress = []
+        path, digest = self.downloader.download(URL, lambda done, total: progress.append((done, total)))
+        self.assertEqual(self.read(path), self.body)
+        self.assertEqual(digest, hashlib.sha256(self.body).hexdigest())
+        ranges = sorted(h['Range'] for h in self.session.requests[1:])
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(max(progress), (len(self.body), len(self.body)))
+
+    def test_falls_back_to_single_stream_without_ranges(self):
+        self.session.ranges = False
+        path, _ = self.downloader.download(URL)
+        self.assertEqual(self.read(path), self.body)
+        self.assertEqual(len(self.session.requests), 1)  # The probe became the download
+
+    def test_failed_segment_resumes_where_it_stopped(self):
+        self.session.fail_after = 128 * 1024
+        with self.assertRaises(ConnectionError):
+            self.downloader.download(URL)
+        self.session.fail_after = None
+        self.session.requests.clear()
+        path, digest = self.downloader.download(URL)
+        self.assertEqual(self.read(path), self.body)
+        self.assertEqual(digest, hashlib.sha256(self.body).hexdigest())
+        # Only the unfinished tails were requested, and never from offset 0
+        for headers in self.session.requests:
+            self.assertNotEqual(headers['Range'].split('=')[1].split('-')[0], '0')
+            self.assertEqual(headers['If-Range'], '"v1"')
+
+    def test_changed_asset_restarts(self):
+        self.session.fail_after = 128 * 1024
+        with self.assertRaises(ConnectionError):
+            self.downloader.download(URL)
+        self.session.fail_after = None
+        self.session.body = os.urandom(900 * 1024)
+        self.session.etag = '"v2"'
+        path, _ = self.downloader.download(URL)
+        self.assertEqual(self.read(path), self.session.body)
+
+if __name__ == '__main__':
+    unittest.main()
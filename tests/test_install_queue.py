@@ -0,0 +1,109 @@
+import unittest
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import launcher_core
+
+class FakeInstaller:
+    """Stands in for LauncherCore.install_version; blocks until released."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, version_type, url, version_tag, on_status=None, on_progress=None, on_commit=None):
+        with self.lock:
+            self.calls.append(version_type)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self.started.release()
+        try:
+            on_status("Downloading...")
+            while not self.release.wait(0.01):
+                on_progress(50, 100)
+            if version_type == 'bn':
+                raise IOError("disk full")
+        finally:
+            with self.lock:
+                self.running -= 1
+
+class InstallQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.installer = FakeInstaller()
+        self.queue = launcher_core.InstallQueue(self.installer, max_workers=1)
+
+    def tearDown(self):
+        self.installer.release.set()
+        self.queue.executor.shutdown(wait=True)
+
+    def test_same_channel_is_deduplicated(self):
+        first = self.queue.submit('stable', 'url', '0.G')
+        second = self.queue.submit('stable', 'url', '0.G')
+        self.assertIs(first, second)
+        self.installer.release.set()
+        first.future.result(timeout=5)
+        self.assertEqual(first.state, 'done')
+        self.assertEqual(self.installer.calls, ['stable'])
+        # A finished job doesn't block the next install
+        self.assertIsNot(self.queue.submit('stable', 'url', '0.G'), first)
+
+    def test_concurrency_cap(self):
+        jobs = [self.queue.submit(channel, 'url', 'tag') for channel in ('experimental', 'stable')]
+        self.assertTrue(self.installer.started.acquire(timeout=5))
+        self.assertEqual(jobs[1].state, 'queued')
+        self.installer.release.set()
+        for job in jobs:
+            job.future.result(timeout=5)
+        self.assertEqual(self.installer.max_running, 1)
+
+    def test_cancel_running_job(self):
+        job = self.queue.submit('experimental', 'url', 'tag')
+        self.assertTrue(self.installer.started.acquire(timeout=5))
+        job.cancel()
+        job.future.result(timeout=5)
+        self.assertEqual(job.state, 'cancelled')
+        self.assertEqual(job.progress.drain().status, "Cancelled")
+
+    def test_cancel_after_commit_is_ignored(self):
+        committed = threading.Event()
+        cancelled = threading.Event()
+        def install(version_type, url, version_tag, on_status=None, on_progress=None, on_commit=None):
+            on_commit()
+            committed.set()
+            cancelled.wait(5)
+            on_status("Cleaning up...")
+        queue = launcher_core.InstallQueue(install)
+        job = queue.submit('experimental', 'url', 'tag')
+        self.assertTrue(committed.wait(5))
+        job.cancel()
+        cancelled.set()
+        job.future.result(timeout=5)
+        self.assertEqual(job.state, 'done')
+        queue.executor.shutdown(wait=True)
+
+    def test_cancel_queued_job_never_runs(self):
+        running = self.queue.submit('experimental', 'url', 'tag')
+        queued = self.queue.submit('stable', 'url', 'tag')
+        queued.cancel()
+        self.installer.release.set()
+        running.future.result(timeout=5)
+        self.assertEqual(queued.state, 'cancelled')
+        self.assertEqual(self.installer.calls, ['experimental'])
+
+    def test_failure_is_reported_per_job(self):
+        job = self.queue.submit('bn', 'url', 'tag')
+        self.installer.release.set()
+        job.future.result(timeout=5)
+        self.assertEqual(job.state, 'failed')
+        snapshot = job.progress.drain()
+        self.assertEqual(snapshot.status, "Error during download: disk full")
+        self.assertEqual(snapshot.fraction, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 
 import os
 import sys
+import tempfile
 
 # Fake customtkinter to avoid dependency on GUI library during tests
 class Dummy:
@@ -40,18 +41,27 @@ class BaseLauncher(cdda_launcher.CDDALauncher):
 
 class PathTests(unittest.TestCase):
     def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
         with patch.object(cdda_launcher, 'SingleInstance', new=MagicMock()):
-            self.launcher = BaseLauncher()
+            self.launcher = BaseLauncher(self.temp_dir.name)
         # use deterministic paths
         self.launcher.experimental_path = '/tmp/exp'
         self.launcher.stable_path = '/tmp/stable'
         self.launcher.bn_path = '/tmp/bn'
 
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
     def test_get_game_path(self):
         self.assertEqual(self.launcher.get_game_path('experimental'), '/tmp/exp')
         self.assertEqual(self.launcher.get_game_path('stable'), '/tmp/stable')
         self.assertEqual(self.launcher.get_game_path('bn'), '/tmp/bn')
 
+    def test_settings_leave_window_config_alone(self):
+        # An instance attribute named config would hide tkinter's Misc.config on the window
+        self.assertNotIn('config', vars(self.launcher))
+        self.assertIn('keep_builds', self.launcher.settings)
+
     @patch('subprocess.Popen')
     def test_open_folder_bn(self, popen):
         self.launcher.open_folder('bn')
@@ -63,8 +73,22 @@ class PathTests(unittest.TestCase):
     def test_launch_game_bn(self, exists, listdir, popen):
         exists.return_value = True
         listdir.return_value = ['Cataclysm.app']
-        self.launcher.launch_game('bn')
-        popen.assert_called_once_with(['open', '/tmp/bn/Cataclysm.app'])
+        self.launcher.launch_game('bn').join()
+        user_dir = os.path.join(self.launcher.get_user_dir('bn'), '')
+        self.assertTrue(user_dir.startswith(self.temp_dir.name))
+        popen.assert_called_once_with(['open', '/tmp/bn/Cataclysm.app', '--args', '--userdir', user_dir])
+
+    @patch('subprocess.Popen')
+    @patch('os.listdir')
+    @patch('os.path.exists')
+    def test_failed_backup_still_launches(self, exists, listdir, popen):
+        exists.return_value = True
+        listdir.return_value = ['Cataclysm.app']
+        error = cdda_launcher.LauncherError("Could not back up bn saves: disk full")
+        with patch.object(self.launcher, 'snapshot_saves', side_effect=error):
+            self.launcher.launch_game('bn').join()
+        popen.assert_called_once()
+        self.assertIn('launching anyway', self.launcher.progress_bus.drain().status)
 
 if __name__ == '__main__':
     unittest.main()
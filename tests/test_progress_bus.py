@@ -0,0 +1,64 @@
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from launcher_core import ProgressBus
+
+
+class ProgressBusTests(unittest.TestCase):
+    def test_drain_returns_none_without_changes(self):
+        bus = ProgressBus()
+        self.assertIsNone(bus.drain())
+        bus.publish_status("Downloading...")
+        self.assertEqual(bus.drain().status, "Downloading...")
+        self.assertIsNone(bus.drain())
+
+    def test_coalesces_to_latest_value(self):
+        bus = ProgressBus()
+        threads = [threading.Thread(target=lambda i=i: [bus.publish_progress(n, 1000) for n in range(i, 500, 4)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        bus.publish_progress(1000, 1000)
+        snapshot = bus.drain()
+        self.assertEqual(snapshot.downloaded, 1000)
+        self.assertEqual(snapshot.fraction, 1.0)
+        self.assertIsNone(bus.drain())
+
+    def test_unknown_total_has_no_fraction(self):
+        bus = ProgressBus()
+        bus.publish_progress(4096, 0)
+        snapshot = bus.drain()
+        self.assertIsNone(snapshot.fraction)
+        self.assertIsNone(snapshot.eta_seconds)
+
+    def test_throughput_and_eta(self):
+        bus = ProgressBus(smoothing=1.0)
+        with mock.patch('launcher_core.time.monotonic', side_effect=[100.0, 102.0]):
+            bus.publish_progress(1 << 20, 11 << 20)
+            self.assertIsNone(bus.drain().bytes_per_second)
+            bus.publish_progress(5 << 20, 11 << 20)
+            snapshot = bus.drain()
+        self.assertEqual(snapshot.bytes_per_second, 2 << 20)
+        self.assertEqual(snapshot.eta_seconds, 3.0)
+        self.assertIn("2.0 MiB/s", snapshot.describe())
+        self.assertIn("0:03 left", snapshot.describe())
+
+    def test_set_fraction_clears_download(self):
+        bus = ProgressBus()
+        bus.publish_status("Installing...")
+        bus.publish_progress(10, 20)
+        bus.set_fraction(1)
+        snapshot = bus.drain()
+        self.assertEqual(snapshot.fraction, 1)
+        self.assertEqual(snapshot.describe(), "Installing...")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,284 @@
+import unittest
+from unittest.mock import MagicMock
+
+import json
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import launcher_core
+
+REPO = launcher_core.CDDA_RELEASES_URL
+# Release JSON in the shape /releases returns, trimmed to the fields the launcher reads
+with open(os.path.join(os.path.dirname(__file__), 'release_assets.json')) as f:
+    RECORDED_RELEASES = {data['tag_name']: data for data in json.load(f)}
+
+def release(number, mac=False):
+    assets = [{'name': f'cdda-linux-{number}.tar.gz', 'browser_download_url': f'https://dl/linux-{number}', 'size': 1}]
+    if mac:
+        assets.append({'name': f'cdda-osx-graphics-universal-{number}.dmg',
+                       'browser_download_url': f'https://dl/osx-{number}', 'size': 2})
+    return {
+        'tag_name': f'cdda-experimental-{number:04d}',
+        'published_at': f'2024-01-01T00:00:{number:02d}Z',
+        'body': f'notes {number}',
+        'assets': assets,
+    }
+
+class FakeCache:
+    """Serves /releases pages from a list ordered newest first."""
+    def __init__(self, releases, page_size):
+        self.releases = releases
+        self.page_size = page_size
+        self.requested = []
+
+    def stream_json_array(self, url, **kwargs):
+        page = int(url.rsplit('page=', 1)[1])
+        self.requested.append(page)
+        start = (page - 1) * self.page_size
+        self.yielded = 0
+        return self._iter(self.releases[start:start + self.page_size])
+
+    def _iter(self, releases):
+        for data in releases:
+            self.yielded += 1
+            yield data
+
+class ReleaseIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_file = os.path.join(self.temp_dir.name, 'release_index.json')
+        self.page_size = launcher_core.INDEX_PAGE_SIZE
+        launcher_core.INDEX_PAGE_SIZE = 3
+
+    def tearDown(self):
+        launcher_core.INDEX_PAGE_SIZE = self.page_size
+        self.temp_dir.cleanup()
+
+    def test_seed_walks_pages_until_mac_build_found(self):
+        # Mac build lags five releases behind the newest experimental
+        releases = [release(n, mac=(n == 4)) for n in range(9, 0, -1)]
+        cache = FakeCache(releases, 3)
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.update(cache, REPO)
+        self.assertEqual(cache.requested, [1, 2])
+        # Stops reading page 2 as soon as the Mac build is seen
+        self.assertEqual(cache.yielded, 3)
+        self.assertEqual(index.latest(REPO, 'experimental').tag, 'cdda-experimental-0009')
+        self.assertEqual(index.latest(REPO, 'experimental_mac').tag, 'cdda-experimental-0004')
+
+    def test_incremental_update_stops_at_known_tags(self):
+        releases = [release(n, mac=(n == 2)) for n in range(3, 0, -1)]
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.update(FakeCache(releases, 3), REPO)
+
+        releases = [release(n, mac=(n == 5)) for n in range(5, 0, -1)]
+        cache = FakeCache(releases, 3)
+        index = launcher_core.ReleaseIndex(self.index_file)  # reload from disk
+        index.update(cache, REPO)
+        self.assertEqual(cache.requested, [1])
+        self.assertEqual(cache.yielded, 3)  # 5, 4, then the unchanged 3
+        self.assertEqual(index.latest(REPO, 'experimental_mac').tag, 'cdda-experimental-0005')
+        # Release 1 was never needed: seeding stopped once the Mac build was found
+        self.assertEqual(len(index.repos[REPO]['releases']), 4)
+
+    def test_unchanged_page_keeps_index(self):
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.update(FakeCache([release(1, mac=True)], 3), REPO)
+        cache = MagicMock()
+        cache.stream_json_array.return_value = None  # 304
+        index.update(cache, REPO)
+        self.assertTrue(cache.stream_json_array.call_args.kwargs['conditional'])
+        self.assertEqual(index.latest(REPO, 'experimental_mac').tag, 'cdda-experimental-0001')
+
+    def test_set_pointer_records_release(self):
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.set_pointer(REPO, 'stable', release(7, mac=True))
+        record = index.latest(REPO, 'stable')
+        self.assertEqual(launcher_core.find_mac_asset(record).url, 'https://dl/osx-7')
+
+    def test_cached_latest_release_has_no_body(self):
+        session = MagicMock()
+        response = MagicMock(status_code=200, headers={'ETag': '"e"'}, text=json.dumps(release(7, mac=True)))
+        session.get.return_value = response
+        cache = launcher_core.GitHubCache(os.path.join(self.temp_dir.name, 'api_cache.json'), session)
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.set_pointer(REPO, 'stable', cache.get_json('https://x/latest', trim=launcher_core.release_fields))
+        self.assertNotIn('body', cache.entries['https://x/latest']['data'])
+        with open(os.path.join(self.temp_dir.name, 'api_cache.json')) as f:
+            self.assertNotIn('notes 7', f.read())
+
+        # A 304 answers from the trimmed copy without blanking the stored notes
+        session.get.return_value = MagicMock(status_code=304, headers={})
+        index = launcher_core.ReleaseIndex(os.path.join(self.temp_dir.name, 'fresh_index.json'), index.notes)
+        index.set_pointer(REPO, 'stable', cache.get_json('https://x/latest', trim=launcher_core.release_fields))
+        self.assertEqual(launcher_core.find_mac_asset(index.latest(REPO, 'stable')).url, 'https://dl/osx-7')
+        self.assertEqual(index.notes.get(REPO, 'cdda-experimental-0007'), 'notes 7')
+
+    def test_bodies_are_stored_on_disk_not_in_index(self):
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.update(FakeCache([release(1, mac=True)], 3), REPO)
+        record = index.latest(REPO, 'experimental_mac')
+        self.assertFalse(hasattr(record, 'body'))
+        self.assertFalse(hasattr(record, '__dict__'))
+        self.assertEqual(index.notes.get(REPO, record.tag), 'notes 1')
+        self.assertEqual(index.notes.get(REPO, 'missing'), 'No patch notes available')
+
+    def test_edited_body_replaces_stored_notes(self):
+        core = launcher_core.LauncherCore(self.temp_dir.name)
+        core.release_index.update(FakeCache([release(1, mac=True)], 3), REPO)
+        core.apply_release_index()
+        self.assertEqual(core.get_patch_notes('experimental'), 'notes 1')
+        # Same length, and nothing the index keeps has changed
+        edited = dict(release(1, mac=True), body='fixed 1')
+        core.release_index.update(FakeCache([edited], 3), REPO)
+        self.assertEqual(core.get_patch_notes('experimental'), 'fixed 1')
+
+    def test_assets_added_to_known_release_are_picked_up(self):
+        index = launcher_core.ReleaseIndex(self.index_file)
+        index.update(FakeCache([release(2), release(1, mac=True)], 3), REPO)
+        index.update(FakeCache([release(2, mac=True), release(1, mac=True)], 3), REPO)
+        self.assertEqual(index.latest(REPO, 'experimental_mac').tag, 'cdda-experimental-0002')
+
+    def test_mac_pointer_follows_the_configured_build_preference(self):
+        # Newest first; only the older release has a universal terminal-only build
+        releases = [RECORDED_RELEASES['cdda-experimental-2025-02-01-0412'],
+                    RECORDED_RELEASES['cdda-experimental-2024-11-23-0607']]
+        cache = FakeCache(releases, 3)
+        launcher_core.ReleaseIndex(self.index_file).update(cache, REPO)
+        self.assertEqual(cache.yielded, 1)  # The default preference was happy with the newest
+
+        preference = launcher_core.AssetPreference(architectures=['universal'], variant='curses')
+        index = launcher_core.ReleaseIndex(self.index_file, pointer_rules=launcher_core.index_pointers(preference))
+        self.assertIsNone(index.latest(REPO, 'experimental_mac'))
+        cache = FakeCache(releases, 3)
+        index.update(cache, REPO)
+        self.assertEqual(cache.yielded, 2)
+        self.assertEqual(index.latest(REPO, 'experimental_mac').tag, 'cdda-experimental-2024-11-23-0607')
+
+        with open(os.path.join(self.temp_dir.name, 'config.json'), 'w') as f:
+            json.dump({'build_architectures': ['universal'], 'build_variant': 'curses'}, f)
+        core = launcher_core.LauncherCore(self.temp_dir.name)
+        self.assertEqual(core.latest_experimental_mac_tag, 'cdda-experimental-2024-11-23-0607')
+        self.assertTrue(core.latest_experimental_url.endswith('/cdda-osx-terminal-only-universal-2024-11-23-0607.dmg'))
+
+        # Going back to the default moves the pointer forward again without a refresh
+        os.remove(os.path.join(self.temp_dir.name, 'config.json'))
+        core = launcher_core.LauncherCore(self.temp_dir.name)
+        self.assertEqual(core.latest_experimental_mac_tag, 'cdda-experimental-2025-02-01-0412')
+
+    def test_unresolvable_pointer_is_not_walked_for_on_every_update(self):
+        # No release has a Mac build, so the first walk runs out of pages
+        releases = [release(n) for n in range(5, 0, -1)]
+        cache = FakeCache(releases, 3)
+        launcher_core.ReleaseIndex(self.index_file, rules_key='tiles').update(cache, REPO)
+        self.assertEqual(cache.requested, [1, 2])
+
+        cache = FakeCache([release(6)] + releases, 3)
+        index = launcher_core.ReleaseIndex(self.index_file, rules_key='tiles')
+        index.update(cache, REPO)
+        self.assertEqual(cache.requested, [1])
+        self.assertEqual(index.latest(REPO, 'experimental').tag, 'cdda-experimental-0006')
+        self.assertIsNone(index.latest(REPO, 'experimental_mac'))
+
+        # Releases passed over may suit a different build preference
+        cache = MagicMock()
+        pages = [[release(6)] + releases[:2], releases[2:4]]
+        cache.stream_json_array.side_effect = [None] + [(data for data in page) for page in pages]
+        launcher_core.ReleaseIndex(self.index_file, rules_key='curses').update(cache, REPO)
+        self.assertEqual([call.kwargs['conditional'] for call in cache.stream_json_array.call_args_list],
+                         [True, False, True])
+
+    def test_last_checked_survives_reload(self):
+        index = launcher_core.ReleaseIndex(self.index_file)
+        self.assertIsNone(index.last_checked())
+        index.update(FakeCache([release(1, mac=True)], 3), REPO)
+        reloaded = launcher_core.ReleaseIndex(self.index_file)
+        self.assertEqual(reloaded.last_checked(), index.last_checked())
+        self.assertIsNotNone(reloaded.last_checked())
+
+class IterJsonArrayTests(unittest.TestCase):
+    def test_every_chunk_boundary(self):
+        # Every size splits the floats after "1." and "4.5e" somewhere
+        data = [{'tag_name': 'ü-1', 'n': [1, 2]}, 12345, "x,]", {}, 1.25, {'size': 4.5e-07}, -0.5]
+        text = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        for size in range(1, len(text) + 1):
+            chunks = [text[i:i + size] for i in range(0, len(text), size)]
+            self.assertEqual(list(launcher_core.iter_json_array(chunks)), data)
+
+    def test_stops_pulling_chunks_on_early_exit(self):
+        pulled = []
+        def chunks():
+            for piece in [b'[{"a": 1}', b', {"a": 2}', b', {"a": 3}]']:
+                pulled.append(piece)
+                yield piece
+        items = launcher_core.iter_json_array(chunks())
+        self.assertEqual(next(items), {'a': 1})
+        self.assertEqual(len(pulled), 2)
+
+    def test_truncated_array_raises(self):
+        with self.assertRaises(ValueError):
+            list(launcher_core.iter_json_array([b'[{"a": 1}, {"a"']))
+
+class AssetSelectionTests(unittest.TestCase):
+    def pick(self, tag, **preference):
+        asset = launcher_core.find_mac_asset(launcher_core.Release.from_github(RECORDED_RELEASES[tag]),
+                                             launcher_core.AssetPreference(**preference))
+        return asset and asset.name
+
+    def test_thinnest_build_for_the_architecture(self):
+        tag = 'cdda-experimental-2025-02-01-0412'
+        self.assertEqual(self.pick(tag, architectures=['arm64', 'universal', 'x86_64'], formats=['.dmg']),
+                         'cdda-osx-with-graphics-arm64-2025-02-01-0412.dmg')
+        self.assertEqual(self.pick(tag, architectures=['x86_64', 'universal'], formats=['.dmg']),
+                         'cdda-osx-with-graphics-x64-2025-02-01-0412.dmg')
+        self.assertEqual(self.pick(tag, architectures=['universal']),
+                         'cdda-osx-with-graphics-universal-2025-02-01-0412.dmg')
+        # Format is ranked before size: the archive streams
+        self.assertEqual(self.pick(tag, architectures=['arm64']),
+                         'cdda-osx-with-graphics-arm64-2025-02-01-0412.tar.gz')
+        self.assertEqual(self.pick(tag, architectures=['arm64'], variant='curses'),
+                         'cdda-osx-terminal-only-arm64-2025-02-01-0412.dmg')
+
+    def test_universal_only_when_nothing_thinner(self):
+        tag = 'cdda-experimental-2024-11-23-0607'
+        self.assertEqual(self.pick(tag, architectures=['arm64', 'universal', 'x86_64']),
+                         'cdda-osx-with-graphics-universal-2024-11-23-0607.dmg')
+        self.assertEqual(self.pick(tag, architectures=['x86_64', 'universal'], variant='curses'),
+                         'cdda-osx-terminal-only-universal-2024-11-23-0607.dmg')
+        self.assertIsNone(self.pick(tag, architectures=['arm64']))
+
+    def test_bn_and_untagged_builds(self):
+        self.assertEqual(self.pick('v0.7.0', architectures=['arm64', 'universal', 'x86_64']),
+                         'cbn-osx-tiles-arm-v0.7.0.dmg')
+        self.assertEqual(self.pick('v0.7.0', architectures=['x86_64', 'universal']),
+                         'cbn-osx-tiles-x64-v0.7.0.dmg')
+        # Builds that name no architecture are Intel builds, which Apple silicon runs under Rosetta
+        self.assertEqual(self.pick('0.F-3', architectures=['arm64', 'universal', 'x86_64']),
+                         'cdda-osx-tiles-0.F-3.dmg')
+        self.assertIsNone(self.pick('0.F-3', architectures=['arm64', 'universal']))
+
+    def test_preference_from_config_and_host(self):
+        launcher_core.host_architectures.cache_clear()
+        try:
+            with patch('platform.machine', return_value='arm64'):
+                self.assertEqual(launcher_core.host_architectures(), ('arm64', 'universal', 'x86_64'))
+        finally:
+            launcher_core.host_architectures.cache_clear()
+        preference = launcher_core.AssetPreference.from_config(
+            {'build_architectures': ['x64', 'universal'], 'build_variant': 'terminal', 'build_formats': ['.dmg']})
+        self.assertEqual(preference.architectures, ('x86_64', 'universal'))
+        self.assertEqual(preference.variant, 'curses')
+        self.assertEqual(preference.formats, ('.dmg',))
+        with tempfile.TemporaryDirectory() as base_path:
+            with open(os.path.join(base_path, 'config.json'), 'w') as f:
+                json.dump({'build_architectures': ['x86_64'], 'build_formats': ['.dmg']}, f)
+            core = launcher_core.LauncherCore(base_path)
+            core.release_index.set_pointer(launcher_core.BN_RELEASES_URL, 'latest', RECORDED_RELEASES['v0.7.0'])
+            core.apply_release_index()
+            self.assertTrue(core.latest_bn_url.endswith('/cbn-osx-tiles-x64-v0.7.0.dmg'))
+
+if __name__ == '__main__':
+    unittest.main()
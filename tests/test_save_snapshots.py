@@ -0,0 +1,118 @@
+import unittest
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import save_snapshots
+
+class SnapshotStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = self.temp_dir.name
+        self.saves = os.path.join(self.root, 'userdata')
+        self.store = save_snapshots.SnapshotStore(os.path.join(self.root, 'snapshots'))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, rel, content):
+        path = os.path.join(self.saves, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def read(self, rel):
+        with open(os.path.join(self.saves, rel), 'rb') as f:
+            return f.read()
+
+    def make_world(self, maps=20):
+        for index in range(maps):
+            content = b'{"terrain": "field"} ' * 200 + bytes([index])
+            self.write(os.path.join('save', 'World', 'maps', f"{index}.map"), content)
+        self.write(os.path.join('save', 'World', 'player.sav'), b'hp 100')
+
+    def test_second_snapshot_stores_only_the_change(self):
+        self.make_world()
+        first = self.store.take(self.saves, 'first')
+        self.assertEqual((first['files'], first['new_chunks']), (21, 21))
+        # JSON map data compresses well
+        self.assertLess(first['new_bytes'], first['bytes'] / 4)
+
+        self.write(os.path.join('save', 'World', 'player.sav'), b'hp 42')
+        second = self.store.take(self.saves, 'second')
+        self.assertEqual((second['files'], second['new_chunks']), (21, 1))
+        self.assertEqual([snapshot['label'] for snapshot in self.store.list()], ['second', 'first'])
+
+    def test_nothing_changed_takes_no_snapshot(self):
+        self.assertIsNone(self.store.take(self.saves))
+        self.make_world(2)
+        self.assertIsNotNone(self.store.take(self.saves))
+        self.assertIsNone(self.store.take(self.saves))
+        self.assertEqual(len(self.store.list()), 1)
+
+    def test_progress_covers_changed_files(self):
+        self.make_world(3)
+        self.store.take(self.saves)
+        self.write(os.path.join('save', 'World', 'player.sav'), b'hp 42')
+        progress = []
+        self.store.take(self.saves, on_progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(5, 5)])
+
+    def test_restore_replaces_the_tree(self):
+        self.make_world(3)
+        os.makedirs(os.path.join(self.saves, 'templates'))
+        mtime_ns = os.stat(os.path.join(self.saves, 'save', 'World', 'player.sav')).st_mtime_ns
+        snapshot = self.store.take(self.saves)
+        self.write(os.path.join('save', 'World', 'player.sav'), b'dead')
+        self.write(os.path.join('save', 'Other', 'player.sav'), b'new world')
+
+        self.assertEqual(self.store.restore(snapshot['id'], self.saves), 4)
+        self.assertEqual(self.read(os.path.join('save', 'World', 'player.sav')), b'hp 100')
+        self.assertEqual(os.stat(os.path.join(self.saves, 'save', 'World', 'player.sav')).st_mtime_ns, mtime_ns)
+        self.assertFalse(os.path.exists(os.path.join(self.saves, 'save', 'Other')))
+        self.assertTrue(os.path.isdir(os.path.join(self.saves, 'templates')))
+
+    def test_damaged_chunk_leaves_saves_untouched(self):
+        self.write('save/World/player.sav', b'hp 100')
+        snapshot = self.store.take(self.saves)
+        self.write('save/World/player.sav', b'hp 1')
+        for _, entry in save_snapshots.walk_tree(self.store.chunks_dir):
+            if entry.is_file():
+                with open(entry.path, 'r+b') as f:
+                    f.write(b'-garbage')
+        with self.assertRaises(save_snapshots.SnapshotError):
+            self.store.restore(snapshot['id'], self.saves)
+        self.assertEqual(self.read('save/World/player.sav'), b'hp 1')
+        self.assertFalse(os.path.exists(self.saves + '.restoring'))
+
+    def test_lzma_round_trip(self):
+        store = save_snapshots.SnapshotStore(os.path.join(self.root, 'lzma'), 'lzma')
+        self.make_world(2)
+        snapshot = store.take(self.saves)
+        restored = os.path.join(self.root, 'restored')
+        store.restore(snapshot['id'], restored)
+        with open(os.path.join(restored, 'save', 'World', 'maps', '1.map'), 'rb') as f:
+            self.assertEqual(f.read(), self.read(os.path.join('save', 'World', 'maps', '1.map')))
+
+    def test_prune_keeps_newest_and_one_per_day_then_gc(self):
+        day = 86400
+        now = save_snapshots.time.mktime((2023, 11, 15, 12, 0, 0, 0, 0, -1))  # Local noon
+        ids = []
+        for index, created in enumerate([now - 3 * day, now - 1 * day - 60, now - 1 * day, now - 60, now]):
+            self.write('save/World/player.sav', f"state {index}".encode())
+            ids.append(self.store.take(self.saves)['id'])
+            # Backdate the manifest as if it had been taken then
+            snapshot = self.store.load(ids[-1])
+            snapshot['created'] = created
+            with open(self.store.snapshot_path(ids[-1]), 'w') as f:
+                save_snapshots.json.dump(snapshot, f)
+
+        removed = self.store.prune(keep_last=1, keep_days=2, now=now)
+        # Kept: the newest overall and the newest of yesterday; the 3 day old one is past keep_days
+        self.assertEqual(sorted(removed), sorted([ids[0], ids[1], ids[3]]))
+        self.assertEqual(self.store.gc(), 3 * (1 + len(b'state 0')))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import launcher_core
+from launcher_core import ViewDispatcher
+from test_paths import cdda_launcher  # Imports the window module with a fake customtkinter
+
+
+class ViewDispatcherTests(unittest.TestCase):
+    def test_drain_returns_only_changed_values(self):
+        view = ViewDispatcher(lambda state: {'label': state.get('text', ''), 'count': len(state)})
+        self.assertEqual(view.drain(), {})
+        view.post(text="a")
+        self.assertEqual(view.drain(), {'label': "a", 'count': 1})
+        self.assertEqual(view.drain(), {})
+        view.post(text="a")
+        self.assertEqual(view.drain(), {})
+        view.post(other=1)
+        self.assertEqual(view.drain(), {'count': 2})
+
+    def test_coalesces_posts_from_many_threads(self):
+        renders = []
+        view = ViewDispatcher(lambda state: renders.append(dict(state)) or state)
+        threads = [threading.Thread(target=lambda i=i: [view.post(**{f"field{i}": n}) for n in range(200)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(view.drain(), {f"field{i}": 199 for i in range(4)})
+        self.assertEqual(len(renders), 1)
+
+    def test_unchanged_refresh_touches_no_widgets(self):
+        with tempfile.TemporaryDirectory() as base_path:
+            core = launcher_core.LauncherCore(base_path)
+            core.latest_bn_tag = 'bn-1'
+            view = ViewDispatcher(cdda_launcher.render_view)
+            view.post(**core.release_state())
+            first = view.drain()
+            self.assertIn('bn_latest_label', first)
+            self.assertIn('patch_notes', first)
+            view.post(**core.release_state())
+            self.assertEqual(view.drain(), {})
+            core.latest_bn_tag = 'bn-2'
+            view.post(**core.release_state())
+            # Only the label whose text changed; nothing is installed either way
+            self.assertEqual(set(view.drain()), {'bn_latest_label'})
+
+    def test_render_follows_visible_channel(self):
+        state = {'notes_experimental': "exp notes", 'notes_stable': "stable notes", 'notes_bn': "bn notes",
+                 'latest_bn': 'bn-1', 'installed_bn': 'bn-1', 'job_stable': True}
+        widgets = cdda_launcher.render_view(state)
+        self.assertEqual(widgets['patch_notes'], "exp notes")
+        self.assertEqual(widgets['stable_download_button'], "Cancel")
+        self.assertEqual(widgets['bn_installed_label'], ("Installed:     bn-1 ✓", "green"))
+        widgets = cdda_launcher.render_view(dict(state, notes="stable"))
+        self.assertEqual(widgets['patch_notes'], "stable notes")
+        self.assertEqual(widgets['toggle_button'], "View Experimental Notes")
+        widgets = cdda_launcher.render_view(dict(state, notes="stable", game="bn"))
+        self.assertEqual(widgets['patch_notes'], "bn notes")
+        self.assertEqual(widgets['patch_notes_label'], "Latest Patch Notes:")
+
+if __name__ == '__main__':
+    unittest.main()